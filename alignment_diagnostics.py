@@ -0,0 +1,162 @@
+# alignment_diagnostics.py
+#
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import os
+import logging
+
+import numpy as np
+
+import utilsLib
+import distance_metrics as dm
+
+
+# One record per diagnosed cell of the alignment: the origin_point (row), the estimate_point (col)
+# and their distance under the alignment's metric
+diagnostic_record_dtype = np.dtype([('row', np.int32), ('col', np.int32), ('distance', np.float32)])
+
+
+class calignment_diagnostics(object):
+	'''
+	An instance of the calignment_diagnostics class collects a bounded set of (origin_point, estimate_point)
+	distances for looking into an alignment, in place of logging all N x M of them. The mode picks the cells:
+		sample    - a random sample of sample_rate of the cells (seeded, so reruns pick the same cells)
+		top_k     - the top_k closest estimate_points of every origin_point
+		near_path - the cells within path_band columns of the alignment path, in every row it visits
+	The distances are computed with the metric's NumPy implementation a block of rows at a time, so
+	memory stays bounded by block_rows x M. The records are written to a binary sidecar file (a .npy
+	file of diagnostic_record_dtype records) rather than to the log; see load_diagnostics.
+	'''
+	modes = ['off', 'sample', 'top_k', 'near_path']
+
+	def __init__(self, mode='off', sample_rate=0.01, top_k=3, path_band=2, seed=0, block_rows=256):
+		'''
+		'''
+		self._mode = mode
+		self._sample_rate = sample_rate
+		self._top_k = top_k
+		self._path_band = path_band
+		self._seed = seed
+		self._block_rows = block_rows
+
+	@property
+	def mode(self):
+		return self._mode
+
+	def collect(self, xorigin_points, xestimate_points, metric, path_rows=None, path_cols=None):
+		'''
+		Returns (through a Result object) the array of diagnostic records for the specified sequences.
+		The near_path mode needs the path of the alignment (the rows and cols arrays of get_backtrace).
+		'''
+		if self._mode not in self.modes:
+			smsg = 'Unknown diagnostics mode: %s. Available modes: %s' % (self._mode, ', '.join(self.modes))
+			return utilsLib.Result(False, message=smsg, item=None)
+
+		num_rows = len(xorigin_points)
+		num_cols = len(xestimate_points)
+		if self._mode == 'off' or num_rows == 0 or num_cols == 0:
+			return utilsLib.Result(True, message='', item=np.empty(0, dtype=diagnostic_record_dtype))
+
+		qx, qy = dm.get_coordinates(xorigin_points)
+		px, py = dm.get_coordinates(xestimate_points)
+
+		if self._mode == 'sample':
+			rs = np.random.RandomState(self._seed)
+			num_samples = int(round(self._sample_rate * num_rows * num_cols))
+			cells = np.unique(rs.randint(0, num_rows * num_cols, size=num_samples))
+			rows = cells // num_cols
+			cols = cells % num_cols
+			distances = metric.distance_pairs(qx[rows], qy[rows], px[cols], py[cols])
+
+		elif self._mode == 'top_k':
+			k = min(self._top_k, num_cols)
+			xrows = []
+			xcols = []
+			xdistances = []
+			for start in range(0, num_rows, self._block_rows):
+				end = min(num_rows, start + self._block_rows)
+				block = metric.distance_matrix(qx[start:end], qy[start:end], px, py)
+				block_rows = np.arange(end-start)[:, np.newaxis]
+				block_cols = np.argpartition(block, k-1, axis=1)[:, :k]
+				block_distances = block[block_rows, block_cols]
+
+				# Closest first within each row
+				order = np.argsort(block_distances, axis=1, kind='mergesort')
+				xrows.append(np.repeat(np.arange(start, end), k))
+				xcols.append(block_cols[block_rows, order].ravel())
+				xdistances.append(block_distances[block_rows, order].ravel())
+			rows = np.concatenate(xrows)
+			cols = np.concatenate(xcols)
+			distances = np.concatenate(xdistances)
+
+		else:
+			if path_rows is None or path_cols is None:
+				return utilsLib.Result(False, message='The near_path mode needs the path of the alignment', item=None)
+			offsets = np.arange(-self._path_band, self._path_band + 1)
+			rows = np.repeat(np.asarray(path_rows), len(offsets))
+			cols = (np.asarray(path_cols)[:, np.newaxis] + offsets[np.newaxis, :]).ravel()
+			bkeep = (cols >= 0) & (cols < num_cols)
+			cells = np.unique(rows[bkeep] * num_cols + cols[bkeep])
+			rows = cells // num_cols
+			cols = cells % num_cols
+			distances = metric.distance_pairs(qx[rows], qy[rows], px[cols], py[cols])
+
+		records = np.empty(len(rows), dtype=diagnostic_record_dtype)
+		records['row'] = rows
+		records['col'] = cols
+		records['distance'] = distances
+		return utilsLib.Result(True, message='', item=records)
+
+	def write(self, filename, records):
+		'''
+		Writes the records to the specified sidecar file. Returns (through a Result object) the number of records written.
+		'''
+		try:
+			directory = os.path.dirname(filename)
+			if directory and not os.path.isdir(directory):
+				os.makedirs(directory)
+			with open(filename, 'wb') as f:
+				np.save(f, records)
+		except:
+			smsg = 'Exception thrown writing the diagnostics to %s. Details: %s' % (filename, utilsLib.getExceptionDetails())
+			return utilsLib.Result(False, message=smsg, item=None)
+
+		logging.debug('%d diagnostic records (%s) written to %s' % (len(records), self._mode, filename))
+		return utilsLib.Result(True, message='', item=len(records))
+
+
+def load_diagnostics(filename):
+	'''
+	Returns (through a Result object) the array of diagnostic records in the specified sidecar file.
+	'''
+	try:
+		records = np.load(filename)
+	except:
+		smsg = 'Exception thrown loading the diagnostics in %s. Details: %s' % (filename, utilsLib.getExceptionDetails())
+		return utilsLib.Result(False, message=smsg, item=None)
+	return utilsLib.Result(True, message='', item=records)
+
+
+if __name__ == "__main__":
+
+	import origin_point as op
+	import estimate_point as ep
+
+	xorig = [op.corigin_point(100, 50*i, str(i), i) for i in range(6)]
+	xest = [ep.cestimate_point(102 + i, 50*i + 3, str(i), i) for i in range(6)]
+	metric = dm.ceuclidean_metric()
+
+	for mode in ['sample', 'top_k', 'near_path']:
+		diagnostics = calignment_diagnostics(mode, sample_rate=0.25, top_k=2, path_band=1)
+		result = diagnostics.collect(xorig, xest, metric, np.arange(6), np.arange(6))
+		if result.success:
+			print('%s: %d records' % (mode, len(result.item)))
+			for record in result.item[:4]:
+				print('   Q%d P%d %5.2f' % (record['row'], record['col'], record['distance']))
+		else:
+			print(result.message)
+
+	print('Done ...')
@@ -0,0 +1,169 @@
+# assignment.py
+#
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import numpy as np
+
+import utilsLib
+
+
+class cassigned_estimate_points(object):
+	'''
+	An instance of this class is a read-only view of the estimate_points assigned to one origin_point.
+	It holds a reference to the full estimate_point sequence and a slice of the assignment's index
+	array, so no per-origin_point container is built. It can be iterated, indexed and measured with len.
+	'''
+	def __init__(self, xestimate_points, estimate_indices):
+		'''
+		'''
+		self._xestimate_points = xestimate_points
+		self._estimate_indices = estimate_indices
+
+	def __len__(self):
+		return len(self._estimate_indices)
+
+	def __iter__(self):
+		for idx in self._estimate_indices.tolist():
+			yield self._xestimate_points[idx]
+
+	def __getitem__(self, position):
+		return self._xestimate_points[self._estimate_indices[position]]
+
+	@property
+	def estimate_indices(self):
+		return self._estimate_indices
+
+
+class cassignment(object):
+	'''
+	An instance of the cassignment class holds the result of an alignment -- which estimate_points are
+	associated with which origin_point -- in compressed sparse row (CSR) form: for origin_point (row) i,
+	the indices into the estimate_point sequence are
+
+		estimate_indices[offsets[i]:offsets[i+1]]
+
+	One pair of integer arrays replaces a dictionary on every origin_point and a list on every
+	estimate_point. Each corigin_point is told its row (see attach) and reads its estimate_points
+	through a cassigned_estimate_points view.
+	'''
+	def __init__(self, xestimate_points, offsets, estimate_indices):
+		'''
+		offsets must have one more element than there are origin_points; its last element is len(estimate_indices).
+		'''
+		self._xestimate_points = xestimate_points
+		self._offsets = offsets
+		self._estimate_indices = estimate_indices
+
+	@property
+	def num_rows(self):
+		return len(self._offsets) - 1
+
+	@property
+	def offsets(self):
+		return self._offsets
+
+	@property
+	def estimate_indices(self):
+		return self._estimate_indices
+
+	@property
+	def estimate_points(self):
+		return self._xestimate_points
+
+	def num_estimate_points(self, row):
+		'''
+		Returns the number of estimate_points assigned to the origin_point in the specified row.
+		'''
+		return int(self._offsets[row+1] - self._offsets[row])
+
+	def get_estimate_indices(self, row):
+		'''
+		Returns the (view of the) array of indices of the estimate_points assigned to the origin_point in the specified row.
+		'''
+		return self._estimate_indices[self._offsets[row]:self._offsets[row+1]]
+
+	def get_estimate_points(self, row):
+		'''
+		Returns a cassigned_estimate_points view of the estimate_points assigned to the origin_point in the specified row.
+		'''
+		return cassigned_estimate_points(self._xestimate_points, self.get_estimate_indices(row))
+
+	def get_rows(self):
+		'''
+		Returns an array with, for each estimate_point, the row of the origin_point it is assigned to (-1 if none).
+		'''
+		rows = np.empty(len(self._xestimate_points), dtype=np.intp)
+		rows.fill(-1)
+		rows[self._estimate_indices] = np.repeat(np.arange(self.num_rows), np.diff(self._offsets))
+		return rows
+
+	def attach(self, xorigin_points):
+		'''
+		Tells each origin_point in the specified list (whose order defines the rows) to read its estimate_points from this assignment.
+		'''
+		for row in range(len(xorigin_points)):
+			xorigin_points[row].set_assignment(self, row)
+		return utilsLib.Result(True, message='', item=None)
+
+
+def create_assignment(xestimate_points, rows, cols, num_rows):
+	'''
+	Returns (through a Result object) a cassignment built from pairs of (row, col) indices, where row
+	is an index into the origin_point sequence and col an index into xestimate_points. Pairs with a
+	negative row are left out. Within each row the estimate_points keep the order in which the pairs are given.
+	'''
+	rows = np.asarray(rows, dtype=np.intp)
+	cols = np.asarray(cols, dtype=np.intp)
+	bkeep = rows >= 0
+	if not bkeep.all():
+		rows = rows[bkeep]
+		cols = cols[bkeep]
+
+	if len(rows) and rows.max() >= num_rows:
+		smsg = 'Row index %d is out of range for %d origin_points' % (rows.max(), num_rows)
+		return utilsLib.Result(False, message=smsg, item=None)
+
+	# A stable sort on the rows keeps the given order within each row
+	order = np.argsort(rows, kind='mergesort')
+	offsets = np.searchsorted(rows[order], np.arange(num_rows + 1))
+	return utilsLib.Result(True, message='', item=cassignment(xestimate_points, offsets, cols[order]))
+
+def create_assignment_from_rows(xestimate_points, final_rows, num_rows):
+	'''
+	Returns (through a Result object) a cassignment from an array holding, for each estimate_point, the
+	row of the origin_point it is assigned to (-1 if none). Within each row the estimate_points are in
+	descending order, which is the order in which the DTW path visits them.
+	'''
+	cols = np.arange(len(final_rows) - 1, -1, -1)
+	return create_assignment(xestimate_points, np.asarray(final_rows)[::-1], cols, num_rows)
+
+def create_assignment_from_lists(xxestimate_points):
+	'''
+	Returns (through a Result object) a cassignment from a list with, for each origin_point, the list of
+	its estimate_points. This is meant for small, hand-built assignments.
+	'''
+	xestimate_points = []
+	xrows = []
+	for row in range(len(xxestimate_points)):
+		for est_pt in xxestimate_points[row]:
+			xestimate_points.append(est_pt)
+			xrows.append(row)
+	return create_assignment(xestimate_points, xrows, np.arange(len(xestimate_points)), len(xxestimate_points))
+
+
+if __name__ == "__main__":
+
+	import estimate_point as ep
+
+	xest = [ep.cestimate_point(10*i, 10*i, str(i), i) for i in range(5)]
+	result = create_assignment_from_rows(xest, np.array([0, 0, 2, -1, 2]), 3)
+	if result.success:
+		assignment = result.item
+		for row in range(assignment.num_rows):
+			print('Row %d: %s' % (row, ' '.join(est_pt.name for est_pt in assignment.get_estimate_points(row))))
+		print(assignment.get_rows())
+
+	print('Done ...')
@@ -0,0 +1,83 @@
+# benchmark_points.py
+#
+# Measures the memory and construction cost of the classes there are many instances of in a batch:
+# the bytes of one instance (the object itself plus its __dict__, if it has one) and the number of
+# instances constructed per second.
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import sys
+import getopt
+import timeit
+import logging
+
+import point as pt
+import origin_point as op
+import estimate_point as ep
+import text_line as tl
+import cost_info as ci
+import origin_point_costs as opc
+import error_parameters as err_params
+
+
+def get_instance_size(instance):
+	'''
+	Returns the size in bytes of the specified instance and of its __dict__ (if it has one); the values
+	its fields refer to are not counted, as they are the same whatever the layout of the class.
+	'''
+	size = sys.getsizeof(instance)
+	if hasattr(instance, '__dict__'):
+		size += sys.getsizeof(instance.__dict__)
+	return size
+
+
+def get_benchmarks():
+	'''
+	Returns the list of the [class_name, constructor] pairs to benchmark; each constructor creates one instance.
+	'''
+	error_params = err_params.cerror_parameters()
+	return [
+		['cpoint', lambda: pt.cpoint(13, 42, 'ID', 0)],
+		['corigin_point', lambda: op.corigin_point(13, 42, 'ID', 0)],
+		['cestimate_point', lambda: ep.cestimate_point(13, 42, 'ID', 0)],
+		['ctext_line_data', lambda: tl.ctext_line_data(13, 42, 'ID', 0)],
+		['cost_info', lambda: ci.cost_info(1, 2, 3.0, 4.0, 5.0)],
+		['corigin_point_costs', lambda: opc.corigin_point_costs(error_params)],
+	]
+
+
+def main(argv):
+	'''
+	Command-line entry point. Prints the bytes per instance and the construction rate of every benchmarked class.
+	'''
+	usage = 'benchmark_points.py [-n <num_instances>]'
+	num_instances = 200000
+	try:
+		opts, args = getopt.getopt(argv, "n:h", ["num_instances=", "help"])
+	except getopt.GetoptError:
+		print(usage)
+		return 2
+
+	for opt, arg in opts:
+		if opt in ("-h", "--help"):
+			print(usage)
+			return 0
+		elif opt in ("-n", "--num_instances"):
+			num_instances = int(arg)
+
+	# corigin_point logs every construction; keep the logging calls cheap
+	logging.disable(logging.CRITICAL)
+
+	print('%-22s %16s %22s' % ('class', 'bytes/instance', 'instances/second'))
+	for class_name, constructor in get_benchmarks():
+		size = get_instance_size(constructor())
+		seconds = min(timeit.repeat(constructor, number=num_instances, repeat=3))
+		print('%-22s %16d %22.0f' % (class_name, size, num_instances / seconds))
+	return 0
+
+
+if __name__ == "__main__":
+
+	sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,302 @@
+# bipartite_assigner.py
+#
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import math
+import logging
+
+import numpy as np
+
+import utilsLib
+import assignment as asg
+
+
+def _solve_min_cost_matching(cost):
+	'''
+	Solves the square assignment problem for the specified (n x n) list of lists of costs with the
+	Hungarian (Kuhn-Munkres) method, in O(n^3). Returns a list with, for each row, its column.
+	'''
+	n = len(cost)
+	INF = float('inf')
+	u = [0.0] * (n + 1)
+	v = [0.0] * (n + 1)
+	p = [0] * (n + 1)
+	way = [0] * (n + 1)
+	for i in range(1, n + 1):
+		p[0] = i
+		j0 = 0
+		minv = [INF] * (n + 1)
+		used = [False] * (n + 1)
+		while True:
+			used[j0] = True
+			i0 = p[j0]
+			delta = INF
+			j1 = 0
+			cost_row = cost[i0-1]
+			for j in range(1, n + 1):
+				if not used[j]:
+					cur = cost_row[j-1] - u[i0] - v[j]
+					if cur < minv[j]:
+						minv[j] = cur
+						way[j] = j0
+					if minv[j] < delta:
+						delta = minv[j]
+						j1 = j
+			for j in range(n + 1):
+				if used[j]:
+					u[p[j]] += delta
+					v[j] -= delta
+				else:
+					minv[j] -= delta
+			j0 = j1
+			if p[j0] == 0:
+				break
+		while True:
+			j1 = way[j0]
+			p[j0] = p[j1]
+			j0 = j1
+			if j0 == 0:
+				break
+
+	xcolumns = [0] * n
+	for j in range(1, n + 1):
+		xcolumns[p[j]-1] = j - 1
+	return xcolumns
+
+
+class cbipartite_assigner(object):
+	'''
+	An instance of the cbipartite_assigner class is an alternative to the dtw_aligner for pages without a
+	reliable reading order. It pairs origin_points with estimate_points one-to-one, with the smallest total
+	distance, without looking at the order of either sequence.
+
+	Only pairs in which the estimate_point lies inside the R2 extent of the origin_point (the rectangle
+	that cregion would build from the region_parameters and the origin_point's line heights) are considered.
+	The estimate_points are bucketed on a uniform grid whose cells are as large as the largest R2 extent,
+	so each origin_point only looks at the few cells its extent overlaps. The resulting sparse candidate graph
+	falls apart into small connected components, and each of these is solved on its own with the Hungarian
+	method. Leaving a point of a component unmatched costs a little more than the largest candidate distance
+	in that component, so any candidate pair is worth matching unless it stands in the way of a better one.
+
+	The result is a cassignment, just like the one dtw_aligner.post_process_origin_points builds: each origin_point
+	has its matched estimate_point (if any), and every estimate_point that was not matched goes to its nearest
+	origin_point, where it is scored as a false alarm. Each origin_point's local_cost is the distance to its
+	matched estimate_point (-1.0 if there is none).
+
+	Public Methods:
+		assign()
+		get_assignment()
+	'''
+	def __init__(self, xorigin_points, xestimate_points, region_params, bverbose_mode=False, xcolumn_offsets=None):
+		'''
+		The line heights of the origin_points are found from their neighbors in the given order, as ccost_calculator
+		does; xcolumn_offsets (see ccost_calculator) keeps the neighbors within a column.
+		'''
+		self._xorigin_points = xorigin_points
+		self._xestimate_points = xestimate_points
+		self._region_params = region_params
+		self._bverbose_mode = bverbose_mode
+
+		if xcolumn_offsets is None:
+			xcolumn_offsets = [0, len(xorigin_points)]
+		self._xcolumn_offsets = xcolumn_offsets
+
+		self._assignment = None
+
+	def _get_r2_extents(self, ox, oy):
+		'''
+		Private method that returns the arrays [left, right, top, bottom] of the R2 rectangle of every
+		origin_point, computed the way cregion computes them.
+		'''
+		top_heights = np.empty(len(oy))
+		bottom_heights = np.empty(len(oy))
+		for column in range(len(self._xcolumn_offsets)-1):
+			start = self._xcolumn_offsets[column]
+			end = self._xcolumn_offsets[column+1]
+			if end - start < 2:
+				smsg = 'Column %d has %d origin_points; at least 2 are needed to find the line heights' % (column, end - start)
+				return utilsLib.Result(False, message=smsg, item=None)
+
+			# The first line uses its bottom height for its top height, the last line the other way round
+			distances = np.diff(oy[start:end])
+			top_heights[start+1:end] = distances
+			top_heights[start] = distances[0]
+			bottom_heights[start:end-1] = distances
+			bottom_heights[end-1] = distances[-1]
+
+		r2_top = self._region_params.r2_top_height_percent * top_heights
+		r2_bottom = self._region_params.r2_bottom_height_percent * bottom_heights
+		r2_width = np.minimum(r2_top, r2_bottom) * self._region_params.r2_width_multiplier
+		return utilsLib.Result(True, message='', item=[ox - r2_width, ox + r2_width, oy - r2_top, oy + r2_bottom])
+
+	def _get_candidate_pairs(self, ox, oy, ex, ey, extents):
+		'''
+		Private method that returns the arrays [rows, cols, distances] of all (origin_point, estimate_point)
+		pairs in which the estimate_point lies inside the origin_point's R2 extent.
+		'''
+		left, right, top, bottom = extents
+		cell_size = max(float(np.max(np.maximum(right - left, bottom - top))), 1.0)
+
+		# Bucket the estimate_points on the grid
+		zcells = {}
+		for col, cell in enumerate(zip(np.floor(ex / cell_size).astype(int).tolist(), np.floor(ey / cell_size).astype(int).tolist())):
+			zcells.setdefault(cell, []).append(col)
+
+		xrows = []
+		xcols = []
+		for row in range(len(ox)):
+			for cx in range(int(math.floor(left[row] / cell_size)), int(math.floor(right[row] / cell_size)) + 1):
+				for cy in range(int(math.floor(top[row] / cell_size)), int(math.floor(bottom[row] / cell_size)) + 1):
+					for col in zcells.get((cx, cy), []):
+						if left[row] <= ex[col] <= right[row] and top[row] <= ey[col] <= bottom[row]:
+							xrows.append(row)
+							xcols.append(col)
+
+		rows = np.array(xrows, dtype=np.intp)
+		cols = np.array(xcols, dtype=np.intp)
+		distances = np.hypot(ox[rows] - ex[cols], oy[rows] - ey[cols])
+		return [rows, cols, distances]
+
+	def _get_components(self, rows, cols, num_rows):
+		'''
+		Private method that labels the connected components of the candidate graph (whose nodes are the
+		origin_points, followed by the estimate_points). Returns the array with the component of each edge.
+		'''
+		xparents = list(range(num_rows + len(self._xestimate_points)))
+
+		def find(node):
+			while xparents[node] != node:
+				xparents[node] = xparents[xparents[node]]
+				node = xparents[node]
+			return node
+
+		for row, col in zip(rows.tolist(), cols.tolist()):
+			root_a = find(row)
+			root_b = find(num_rows + col)
+			if root_a != root_b:
+				xparents[root_a] = root_b
+
+		return np.array([find(row) for row in rows.tolist()], dtype=np.intp)
+
+	def _match_component(self, rows, cols, distances):
+		'''
+		Private method that solves the minimum-cost matching for the candidate edges of one component.
+		Returns the list of [row, col, distance] items of the matched pairs.
+		'''
+		xcomponent_rows = sorted(set(rows.tolist()))
+		xcomponent_cols = sorted(set(cols.tolist()))
+		if len(rows) == 1:
+			return [[int(rows[0]), int(cols[0]), float(distances[0])]]
+
+		zrow_positions = dict((row, idx) for idx, row in enumerate(xcomponent_rows))
+		zcol_positions = dict((col, idx) for idx, col in enumerate(xcomponent_cols))
+		n = len(xcomponent_rows)
+		m = len(xcomponent_cols)
+
+		# Square problem of size n+m: real rows and cols first, then one "unmatched" slot for each of them
+		unmatched_cost = float(distances.max()) + 1.0
+		forbidden = (unmatched_cost + 1.0) * (n + m) * 4.0
+		cost = [[forbidden] * (n + m) for i in range(n + m)]
+		for row, col, distance in zip(rows.tolist(), cols.tolist(), distances.tolist()):
+			cost[zrow_positions[row]][zcol_positions[col]] = distance
+		for i in range(n):
+			cost[i][m + i] = unmatched_cost
+		for j in range(m):
+			cost[n + j][j] = unmatched_cost
+			for k in range(n):
+				cost[n + j][m + k] = 0.0
+
+		zdistances = dict(((row, col), distance) for row, col, distance in zip(rows.tolist(), cols.tolist(), distances.tolist()))
+		xmatches = []
+		xcolumns = _solve_min_cost_matching(cost)
+		for i in range(n):
+			j = xcolumns[i]
+			if j < m:
+				row = xcomponent_rows[i]
+				col = xcomponent_cols[j]
+				xmatches.append([row, col, zdistances[(row, col)]])
+		return xmatches
+
+	def assign(self):
+		'''
+		Pairs the origin_points with the estimate_points and attaches the resulting cassignment to the
+		origin_points. Returns (through a Result object) the cassignment.
+		'''
+		num_rows = len(self._xorigin_points)
+		num_cols = len(self._xestimate_points)
+		ox = np.array([orig_pt.x for orig_pt in self._xorigin_points], dtype=np.float64)
+		oy = np.array([orig_pt.y for orig_pt in self._xorigin_points], dtype=np.float64)
+		ex = np.array([est_pt.x for est_pt in self._xestimate_points], dtype=np.float64)
+		ey = np.array([est_pt.y for est_pt in self._xestimate_points], dtype=np.float64)
+
+		final_rows = np.empty(num_cols, dtype=np.intp)
+		final_rows.fill(-1)
+		local_costs = np.empty(num_rows)
+		local_costs.fill(-1.0)
+
+		if num_rows and num_cols:
+			result = self._get_r2_extents(ox, oy)
+			if not result.success:
+				return result
+			rows, cols, distances = self._get_candidate_pairs(ox, oy, ex, ey, result.item)
+
+			if len(rows):
+				components = self._get_components(rows, cols, num_rows)
+				order = np.argsort(components, kind='mergesort')
+				boundaries = np.flatnonzero(np.diff(components[order])) + 1
+				for edges in np.split(order, boundaries):
+					for row, col, distance in self._match_component(rows[edges], cols[edges], distances[edges]):
+						final_rows[col] = row
+						local_costs[row] = distance
+
+			if self._bverbose_mode:
+				logging.debug('Bipartite assignment: %d candidate pairs, %d matched estimate_points' % (len(rows), np.count_nonzero(final_rows >= 0)))
+
+			# The estimate_points left over go to their nearest origin_point
+			xunmatched = np.flatnonzero(final_rows < 0)
+			for col in xunmatched.tolist():
+				final_rows[col] = int(np.argmin(np.hypot(ox - ex[col], oy - ey[col])))
+
+		for row in range(num_rows):
+			self._xorigin_points[row].local_cost = float(local_costs[row])
+
+		result = asg.create_assignment_from_rows(self._xestimate_points, final_rows, num_rows)
+		if not result.success:
+			return result
+		self._assignment = result.item
+		self._assignment.attach(self._xorigin_points)
+
+		return utilsLib.Result(True, message='', item=self._assignment)
+
+	def get_assignment(self):
+		'''
+		Returns (through a Result object) the cassignment built by assign.
+		'''
+		return utilsLib.Result(True, message='', item=self._assignment)
+
+
+if __name__ == "__main__":
+
+	import origin_point as op
+	import estimate_point as ep
+	import region_parameters as rp
+
+	# Five lines; two estimates compete for line 2, and line 4 has none
+	xorig = [op.corigin_point(100, 50*i, str(i), i) for i in range(5)]
+	xest = [ep.cestimate_point(102, 1, '0', 0), ep.cestimate_point(98, 52, '1', 1), ep.cestimate_point(101, 99, '2a', 2),
+			ep.cestimate_point(104, 103, '2b', 3), ep.cestimate_point(100, 148, '3', 4)]
+
+	# The region parameters of config1.ini
+	region_params = rp.cregion_parameters(0.25, 0.25, 1.0, 0.50, 0.50, 1.0)
+	assigner = cbipartite_assigner(xorig, xest, region_params)
+	result = assigner.assign()
+	if result.success:
+		for orig_pt in xorig:
+			print('%s (local_cost: %5.2f)' % (orig_pt.get_estimate_points_string(), orig_pt.local_cost))
+	else:
+		print(result.message)
+
+	print('Done ...')
@@ -36,9 +36,33 @@ class cconfig_reader(object):
 
 		# Defaults in case config file is not used
 		self._verbose_mode = False
+		self._export_matrices = False
+		self._matrix_export_dir = ''
+		self._diagnostics_mode = 'off'
+		self._diagnostics_sample_rate = 0.01
+		self._diagnostics_top_k = 3
+		self._diagnostics_path_band = 2
+		self._diagnostics_dir = ''
 		self._sort_estimate_points = False
 		self._sort_origin_points = False
 		self._results_filename = 'results.txt'
+		self._collapse_duplicate_estimate_points = False
+		self._duplicate_estimate_point_radius = 0.0
+		self._mdat_cache = False
+		self._mdat_cache_dir = ''
+		self._alignment_method = 'dtw'
+		self._alignment_engine = 'reference'
+		self._nearest_check_rate = 0.0
+		self._distance_metric = 'euclidean'
+		self._metric_x_weight = None
+		self._metric_y_weight = None
+		self._verify_alignment_engine = False
+		self._diagonal_fast_path = False
+		self._split_columns = False
+		self._num_columns = 0
+		self._min_column_gap = 0.0
+		self._worker_pool = 'none'
+		self._num_workers = 0
 
 		# Read the Process section
 		result = self._read_item('Process', 'sort_estimate_points')
@@ -53,11 +77,110 @@ class cconfig_reader(object):
 		if result.success:
 			self._results_filename = result.item
 
+		result = self._read_bool_item('Process', 'collapse_duplicate_estimate_points')
+		if result.success:
+			self._collapse_duplicate_estimate_points = result.item
+
+		result = self._read_item('Process', 'duplicate_estimate_point_radius')
+		if result.success:
+			self._duplicate_estimate_point_radius = float(result.item)
+
+		result = self._read_bool_item('Process', 'mdat_cache')
+		if result.success:
+			self._mdat_cache = result.item
+
+		result = self._read_item('Process', 'mdat_cache_dir')
+		if result.success:
+			self._mdat_cache_dir = result.item
+
+		# Read the items in the Alignment section
+		result = self._read_item('Alignment', 'method')
+		if result.success:
+			self._alignment_method = result.item
+
+		result = self._read_item('Alignment', 'nearest_check_rate')
+		if result.success:
+			self._nearest_check_rate = float(result.item)
+
+		result = self._read_item('Alignment', 'distance_metric')
+		if result.success:
+			self._distance_metric = result.item
+
+		result = self._read_item('Alignment', 'metric_x_weight')
+		if result.success:
+			self._metric_x_weight = float(result.item)
+
+		result = self._read_item('Alignment', 'metric_y_weight')
+		if result.success:
+			self._metric_y_weight = float(result.item)
+
+		result = self._read_item('Alignment', 'engine')
+		if result.success:
+			self._alignment_engine = result.item
+
+		result = self._read_bool_item('Alignment', 'verify_engine')
+		if result.success:
+			self._verify_alignment_engine = result.item
+
+		result = self._read_bool_item('Alignment', 'diagonal_fast_path')
+		if result.success:
+			self._diagonal_fast_path = result.item
+
+		# Read the items in the Layout section
+		result = self._read_bool_item('Layout', 'split_columns')
+		if result.success:
+			self._split_columns = result.item
+
+		result = self._read_item('Layout', 'num_columns')
+		if result.success:
+			self._num_columns = int(result.item)
+
+		result = self._read_item('Layout', 'min_column_gap')
+		if result.success:
+			self._min_column_gap = float(result.item)
+
+		result = self._read_item('Layout', 'worker_pool')
+		if result.success:
+			self._worker_pool = result.item
+
+		result = self._read_item('Layout', 'num_workers')
+		if result.success:
+			self._num_workers = int(result.item)
+
 		# Read the items in the Logging section
 		result = self._read_item('Logging', 'verbose_mode')
 		if result.success:
 			self._verbose_mode = bool(result.item)
 
+		result = self._read_bool_item('Logging', 'export_matrices')
+		if result.success:
+			self._export_matrices = result.item
+
+		result = self._read_item('Logging', 'matrix_export_dir')
+		if result.success:
+			self._matrix_export_dir = result.item
+
+		# Read the items in the Diagnostics section
+		result = self._read_item('Diagnostics', 'mode')
+		if result.success:
+			self._diagnostics_mode = result.item
+
+		result = self._read_item('Diagnostics', 'sample_rate')
+		if result.success:
+			self._diagnostics_sample_rate = float(result.item)
+
+		result = self._read_item('Diagnostics', 'top_k')
+		if result.success:
+			self._diagnostics_top_k = int(result.item)
+
+		result = self._read_item('Diagnostics', 'path_band')
+		if result.success:
+			self._diagnostics_path_band = int(result.item)
+
+		result = self._read_item('Diagnostics', 'sidecar_dir')
+		if result.success:
+			self._diagnostics_dir = result.item
+
 		# Read the items in the Error-Parameters section
 		result = self._read_item('Error-Parameters', 'cost_for_miss')
 		if result.success:
@@ -103,12 +226,30 @@ class cconfig_reader(object):
 			self._region_parameters.r2_width_multiplier = float(result.item)
 
 	def _read_item(self, section_name, item_name):
-		val = self._config[section_name][item_name]
+		try:
+			val = self._config[section_name][item_name]
+		except KeyError:
+			return utilsLib.Result(False,message='Requested item not found', item=None)
 		if val:
 			return utilsLib.Result(True,message='', item=val)
 		else:
 			return utilsLib.Result(False,message='Requested item not found', item=None)
 
+	def _read_bool_item(self, section_name, item_name):
+		'''
+		Reads an item that holds a boolean. ConfigObj hands us strings, and bool('False') is True,
+		so the usual spellings are interpreted here.
+		'''
+		result = self._read_item(section_name, item_name)
+		if not result.success:
+			return result
+		sval = str(result.item).strip().lower()
+		if sval in ('true', 'yes', 'on', '1'):
+			return utilsLib.Result(True,message='', item=True)
+		if sval in ('false', 'no', 'off', '0'):
+			return utilsLib.Result(True,message='', item=False)
+		return utilsLib.Result(False,message='Item is not a boolean: ' + sval, item=None)
+
 	@property
 	def error_parameters(self):
 		return self._error_parameters
@@ -121,6 +262,40 @@ class cconfig_reader(object):
 	def verbose_mode(self):
 		return self._verbose_mode
 
+	@property
+	def export_matrices(self):
+		return self._export_matrices
+
+	@property
+	def matrix_export_dir(self):
+		'''
+		The directory the matrices are written to; the directory of the results file if it is empty
+		'''
+		return self._matrix_export_dir
+
+	@property
+	def diagnostics_mode(self):
+		return self._diagnostics_mode
+
+	@property
+	def diagnostics_sample_rate(self):
+		return self._diagnostics_sample_rate
+
+	@property
+	def diagnostics_top_k(self):
+		return self._diagnostics_top_k
+
+	@property
+	def diagnostics_path_band(self):
+		return self._diagnostics_path_band
+
+	@property
+	def diagnostics_dir(self):
+		'''
+		The directory the diagnostics sidecar files are written to; the directory of the results file if it is empty
+		'''
+		return self._diagnostics_dir
+
 	@property
 	def sort_estimate_points(self):
 		return self._sort_estimate_points
@@ -133,6 +308,83 @@ class cconfig_reader(object):
 	def results_filename(self):
 		return self._results_filename
 
+	@property
+	def collapse_duplicate_estimate_points(self):
+		return self._collapse_duplicate_estimate_points
+
+	@property
+	def duplicate_estimate_point_radius(self):
+		return self._duplicate_estimate_point_radius
+
+	@property
+	def mdat_cache(self):
+		'''
+		True if the MDAT files are read through their binary sidecar files (see text_line.read_text_line_array); off by default
+		'''
+		return self._mdat_cache
+
+	@property
+	def mdat_cache_dir(self):
+		'''
+		The directory the MDAT sidecar files are written to; next to each MDAT file if it is empty
+		'''
+		return self._mdat_cache_dir
+
+	@property
+	def alignment_method(self):
+		return self._alignment_method
+
+	@property
+	def nearest_check_rate(self):
+		return self._nearest_check_rate
+
+	@property
+	def distance_metric(self):
+		return self._distance_metric
+
+	@property
+	def metric_x_weight(self):
+		'''
+		None unless it is given in the config file, in which case the metric keeps its default weight
+		'''
+		return self._metric_x_weight
+
+	@property
+	def metric_y_weight(self):
+		return self._metric_y_weight
+
+	@property
+	def alignment_engine(self):
+		return self._alignment_engine
+
+	@property
+	def verify_alignment_engine(self):
+		return self._verify_alignment_engine
+
+	@property
+	def diagonal_fast_path(self):
+		return self._diagonal_fast_path
+
+	@property
+	def split_columns(self):
+		return self._split_columns
+
+	@property
+	def num_columns(self):
+		return self._num_columns
+
+	@property
+	def min_column_gap(self):
+		return self._min_column_gap
+
+	@property
+	def worker_pool(self):
+		return self._worker_pool
+
+	@property
+	def num_workers(self):
+		return self._num_workers
+
 
 if __name__ == "__main__":
 
@@ -146,11 +398,44 @@ if __name__ == "__main__":
 	print('Process Section:')
 	print('%s'    % reader.sort_estimate_points)
 	print('%s'    % reader.sort_origin_points)
-
+	print('%s'    % reader.collapse_duplicate_estimate_points)
+	print('%5.2f' % reader.duplicate_estimate_point_radius)
+	print('%s'    % reader.mdat_cache)
+	print('%s'    % reader.mdat_cache_dir)
+
+
+	# Alignment Section
+	print('Alignment Section:')
+	print('%s'    % reader.alignment_method)
+	print('%5.2f' % reader.nearest_check_rate)
+	print('%s'    % reader.distance_metric)
+	print('%s'    % reader.metric_x_weight)
+	print('%s'    % reader.metric_y_weight)
+	print('%s'    % reader.alignment_engine)
+	print('%s'    % reader.verify_alignment_engine)
+	print('%s'    % reader.diagonal_fast_path)
+
+	# Layout Section
+	print('Layout Section:')
+	print('%s'    % reader.split_columns)
+	print('%d'    % reader.num_columns)
+	print('%5.2f' % reader.min_column_gap)
+	print('%s'    % reader.worker_pool)
+	print('%d'    % reader.num_workers)
 
 	# Logging Section
 	print('Logging Section:')
 	print('%s'    % reader.verbose_mode)
+	print('%s'    % reader.export_matrices)
+	print('%s'    % reader.matrix_export_dir)
+
+	# Diagnostics Section
+	print('Diagnostics Section:')
+	print('%s'    % reader.diagnostics_mode)
+	print('%5.2f' % reader.diagnostics_sample_rate)
+	print('%d'    % reader.diagnostics_top_k)
+	print('%d'    % reader.diagnostics_path_band)
+	print('%s'    % reader.diagnostics_dir)
 
 	# Error-Parameters Section
 	print('Error-Parameters Section:')
@@ -0,0 +1,383 @@
+# corpus_store.py
+#
+# A corpus store packs the text lines of many MDAT files (pages) into a few contiguous column files,
+# so an evaluation opens a handful of memory-mapped files instead of one MDAT file per page.
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import os
+import sys
+import getopt
+import shutil
+import logging
+
+import numpy as np
+
+import utilsLib
+import text_line as tl
+import origin_points
+import estimate_points
+
+
+# The column files of a store. All of them are raw little-endian arrays; the page offsets have one
+# more entry than there are pages, as do the string offsets.
+_zcolumn_dtypes = {
+	'x': '<i4',                 # x coordinate of every text line, page after page
+	'y': '<i4',                 # y coordinate of every text line
+	'name_id': '<i4',           # name of every text line, as an id in the string table
+	'page_offsets': '<i8',      # first text line of every page
+	'page_name_id': '<i4',      # name of every page (its MDAT file name without the extension), as an id in the string table
+	'string_offsets': '<i8',    # first byte of every string in strings.bin
+	'strings': 'u1',            # the string table: every distinct name, UTF-8 encoded, back to back
+}
+
+def _get_column_filename(store_directory, column):
+	return os.path.join(store_directory, column + '.bin')
+
+def _is_store_directory(store_directory):
+	'''
+	Private function that returns True if the specified directory is empty or holds the column files of a store.
+	'''
+	xfilenames = os.listdir(store_directory)
+	return not xfilenames or all(os.path.basename(_get_column_filename(store_directory, column)) in xfilenames for column in _zcolumn_dtypes)
+
+
+class ccorpus_store_writer(object):
+	'''
+	An instance of the ccorpus_store_writer class builds a corpus store one page at a time, appending to
+	the column files as it goes, so only the string table's index (one entry per distinct name) is kept in memory.
+	The store is built in a temporary directory next to the store directory, which close renames into place
+	(replacing the store that was there) and abort removes: a store that could not be completed is never seen.
+	'''
+	def __init__(self, store_directory):
+		'''
+		'''
+		self._store_directory = os.path.normpath(store_directory)
+		self._temp_directory = '%s.%d.tmp' % (self._store_directory, os.getpid())
+		self._zfiles = {}
+		self._zstring_ids = {}
+		self._num_lines = 0
+		self._num_string_bytes = 0
+		self._zpage_names = set()
+
+	def open(self):
+		'''
+		Creates the column files of the store in the temporary directory. An existing store directory must be
+		empty or hold a store (which close replaces).
+		'''
+		if os.path.exists(self._store_directory) and not (os.path.isdir(self._store_directory) and _is_store_directory(self._store_directory)):
+			smsg = '%s is not a corpus store; it is not replaced' % self._store_directory
+			return utilsLib.Result(False, message=smsg, item=None)
+
+		try:
+			if os.path.isdir(self._temp_directory):
+				shutil.rmtree(self._temp_directory)
+			os.makedirs(self._temp_directory)
+			for column in _zcolumn_dtypes:
+				self._zfiles[column] = open(_get_column_filename(self._temp_directory, column), 'wb')
+		except:
+			smsg = 'Exception thrown creating the corpus store in %s. Details: %s' % (self._store_directory, utilsLib.getExceptionDetails())
+			return utilsLib.Result(False, message=smsg, item=None)
+
+		self._write('page_offsets', np.zeros(1, dtype='<i8'))
+		self._write('string_offsets', np.zeros(1, dtype='<i8'))
+		return utilsLib.Result(True, message='', item=None)
+
+	def _write(self, column, values):
+		np.asarray(values, dtype=_zcolumn_dtypes[column]).tofile(self._zfiles[column])
+
+	def _get_string_id(self, sname):
+		'''
+		Private method that returns the id of the specified string in the string table, adding it if it is new.
+		'''
+		string_id = self._zstring_ids.get(sname)
+		if string_id is None:
+			string_id = len(self._zstring_ids)
+			self._zstring_ids[sname] = string_id
+			data = sname.encode('utf-8') if not isinstance(sname, bytes) else sname
+			self._zfiles['strings'].write(data)
+			self._num_string_bytes += len(data)
+			self._write('string_offsets', [self._num_string_bytes])
+		return string_id
+
+	def add_page(self, page_name, records):
+		'''
+		Appends a page, given as a structured array of text lines (see text_line.text_line_dtype), to the store.
+		'''
+		if page_name in self._zpage_names:
+			return utilsLib.Result(False, message='The corpus store already has a page named ' + page_name, item=None)
+		self._zpage_names.add(page_name)
+
+		name_ids = [self._get_string_id(sname) for sname in records['name'].tolist()]
+		self._write('x', records['x'])
+		self._write('y', records['y'])
+		self._write('name_id', name_ids)
+		self._write('page_name_id', [self._get_string_id(page_name)])
+		self._num_lines += len(records)
+		self._write('page_offsets', [self._num_lines])
+		return utilsLib.Result(True, message='', item=None)
+
+	def close(self):
+		'''
+		Closes the column files and renames the temporary directory into place, replacing the store that was
+		there. Returns (through a Result object) the pair [num_pages, num_lines].
+		'''
+		old_directory = '%s.%d.old' % (self._store_directory, os.getpid())
+		try:
+			for f in self._zfiles.values():
+				f.close()
+			self._zfiles = {}
+			if os.path.exists(self._store_directory):
+				os.rename(self._store_directory, old_directory)
+			os.rename(self._temp_directory, self._store_directory)
+		except:
+			smsg = 'Exception thrown completing the corpus store in %s. Details: %s' % (self._store_directory, utilsLib.getExceptionDetails())
+			# Put the store that was there back
+			if os.path.exists(old_directory) and not os.path.exists(self._store_directory):
+				os.rename(old_directory, self._store_directory)
+			self.abort()
+			return utilsLib.Result(False, message=smsg, item=None)
+		shutil.rmtree(old_directory, ignore_errors=True)
+		return utilsLib.Result(True, message='', item=[len(self._zpage_names), self._num_lines])
+
+	def abort(self):
+		'''
+		Closes the column files and removes the temporary directory; the store directory is left as it was.
+		'''
+		for f in self._zfiles.values():
+			f.close()
+		self._zfiles = {}
+		shutil.rmtree(self._temp_directory, ignore_errors=True)
+
+
+class ccorpus_store(object):
+	'''
+	An instance of the ccorpus_store class gives read access to a corpus store. The column files are
+	memory-mapped, so opening a store reads nothing but the page names, and the coordinates of a page
+	are slices of the mapped columns (no copy is made until they are used).
+
+	Public Methods:
+		open()
+		get_page_names()
+		get_page_records(page_name)
+		create_origin_points(page_name, verbose_mode)
+		create_estimate_points(page_name)
+	'''
+	def __init__(self, store_directory):
+		'''
+		'''
+		self._store_directory = store_directory
+		self._zcolumns = {}
+		self._xpage_names = []
+		self._zpage_indices = {}
+
+	def open(self):
+		'''
+		Memory-maps the column files of the store and reads its page names.
+		'''
+		try:
+			for column, dtype in _zcolumn_dtypes.items():
+				filename = _get_column_filename(self._store_directory, column)
+				if os.path.getsize(filename) == 0:
+					self._zcolumns[column] = np.zeros(0, dtype=dtype)
+				else:
+					self._zcolumns[column] = np.memmap(filename, dtype=dtype, mode='r')
+		except:
+			smsg = 'Exception thrown opening the corpus store in %s. Details: %s' % (self._store_directory, utilsLib.getExceptionDetails())
+			return utilsLib.Result(False, message=smsg, item=None)
+
+		self._xpage_names = self.get_strings(self._zcolumns['page_name_id'])
+		self._zpage_indices = dict((page_name, page) for page, page_name in enumerate(self._xpage_names))
+		return utilsLib.Result(True, message='', item=None)
+
+	@property
+	def num_pages(self):
+		return len(self._xpage_names)
+
+	@property
+	def num_lines(self):
+		return len(self._zcolumns['x'])
+
+	def get_page_names(self):
+		'''
+		Returns (through a Result object) the list of the names of the pages, in the order they were added.
+		'''
+		return utilsLib.Result(True, message='', item=self._xpage_names)
+
+	def get_strings(self, string_ids):
+		'''
+		Returns the list of the strings of the string table with the specified ids.
+		'''
+		offsets = self._zcolumns['string_offsets']
+		strings = self._zcolumns['strings']
+		xstrings = []
+		for string_id in np.asarray(string_ids).tolist():
+			data = strings[offsets[string_id]:offsets[string_id+1]].tobytes()
+			xstrings.append(data if str is bytes else data.decode('utf-8'))
+		return xstrings
+
+	def get_page_slice(self, page_name):
+		'''
+		Returns (through a Result object) the pair [start, end] of the page's text lines in the columns.
+		'''
+		page = self._zpage_indices.get(page_name)
+		if page is None:
+			return utilsLib.Result(False, message='The corpus store has no page named ' + page_name, item=None)
+		offsets = self._zcolumns['page_offsets']
+		return utilsLib.Result(True, message='', item=[int(offsets[page]), int(offsets[page+1])])
+
+	def get_page_records(self, page_name):
+		'''
+		Returns (through a Result object) the text lines of the specified page as a dictionary of columns
+		with the fields of text_line.text_line_dtype: x and y are views of the mapped columns, name is
+		an array of the text lines' names (looked up in the string table) and index is their position in the page.
+		'''
+		result = self.get_page_slice(page_name)
+		if not result.success:
+			return result
+		start, end = result.item
+
+		zrecords = {}
+		zrecords['name'] = np.array(self.get_strings(self._zcolumns['name_id'][start:end]))
+		zrecords['x'] = self._zcolumns['x'][start:end]
+		zrecords['y'] = self._zcolumns['y'][start:end]
+		zrecords['index'] = np.arange(end - start, dtype=np.int32)
+		return utilsLib.Result(True, message='', item=zrecords)
+
+	def create_origin_points(self, page_name, verbose_mode=False):
+		'''
+		Returns (through a Result object) a corigin_points instance holding the text lines of the specified page.
+		'''
+		result = self.get_page_records(page_name)
+		if not result.success:
+			return result
+		orig_points = origin_points.corigin_points(verbose_mode)
+		result = orig_points.add_text_line_array(result.item)
+		if not result.success:
+			return result
+		return utilsLib.Result(True, message='', item=orig_points)
+
+	def create_estimate_points(self, page_name):
+		'''
+		Returns (through a Result object) a cestimate_points instance holding the text lines of the specified page.
+		'''
+		result = self.get_page_records(page_name)
+		if not result.success:
+			return result
+		est_points = estimate_points.cestimate_points()
+		result = est_points.add_text_line_array(result.item)
+		if not result.success:
+			return result
+		return utilsLib.Result(True, message='', item=est_points)
+
+
+def import_mdat_directory(mdat_directory, store_directory):
+	'''
+	Builds a corpus store from every MDAT file in the specified directory; each file becomes a page named
+	after the file (without its MDAT extension, see text_line.get_page_id). Returns (through a Result object) the pair [num_pages, num_lines].
+	If a file cannot be read the import stops and the store directory is left as it was (see ccorpus_store_writer).
+	'''
+	writer = ccorpus_store_writer(store_directory)
+	result = writer.open()
+	if not result.success:
+		return result
+
+	for filename in sorted(os.listdir(mdat_directory)):
+		if not tl.is_mdat_filename(filename):
+			continue
+		result = tl.read_text_line_array(os.path.join(mdat_directory, filename))
+		if result.success:
+			result = writer.add_page(tl.get_page_id(filename), result.item)
+		if not result.success:
+			writer.abort()
+			return result
+
+	result = writer.close()
+	if not result.success:
+		return result
+	logging.debug('Corpus store %s: %d pages, %d text lines' % (store_directory, result.item[0], result.item[1]))
+	return result
+
+def export_mdat_directory(store_directory, mdat_directory):
+	'''
+	Writes every page of the specified corpus store back to an MDAT file (name, x, y per line) in mdat_directory.
+	Returns (through a Result object) the number of files written.
+	'''
+	store = ccorpus_store(store_directory)
+	result = store.open()
+	if not result.success:
+		return result
+
+	try:
+		if not os.path.isdir(mdat_directory):
+			os.makedirs(mdat_directory)
+		for page_name in store.get_page_names().item:
+			zrecords = store.get_page_records(page_name).item
+			with open(os.path.join(mdat_directory, page_name + '.mdat'), 'w') as f:
+				for sname, x, y in zip(zrecords['name'].tolist(), zrecords['x'].tolist(), zrecords['y'].tolist()):
+					f.write('%s, %d, %d\n' % (sname, x, y))
+	except:
+		smsg = 'Exception thrown exporting the corpus store to %s. Details: %s' % (mdat_directory, utilsLib.getExceptionDetails())
+		return utilsLib.Result(False, message=smsg, item=None)
+
+	return utilsLib.Result(True, message='', item=store.num_pages)
+
+
+def main(argv):
+	'''
+	Command-line entry point: corpus_store.py import|export|info ...
+	'''
+	usage = ('corpus_store.py import -d <mdat_directory> -s <store_directory>\n'
+			 'corpus_store.py export -s <store_directory> -d <mdat_directory>\n'
+			 'corpus_store.py info -s <store_directory>')
+	if not argv or argv[0] not in ('import', 'export', 'info'):
+		print(usage)
+		return 2
+	command = argv[0]
+
+	mdat_directory = ''
+	store_directory = ''
+	try:
+		opts, args = getopt.getopt(argv[1:], "d:s:h", ["dir=", "store=", "help"])
+	except getopt.GetoptError:
+		print(usage)
+		return 2
+
+	for opt, arg in opts:
+		if opt in ("-h", "--help"):
+			print(usage)
+			return 0
+		elif opt in ("-d", "--dir"):
+			mdat_directory = arg
+		elif opt in ("-s", "--store"):
+			store_directory = arg
+
+	if not store_directory or (command != 'info' and not mdat_directory):
+		print(usage)
+		return 2
+
+	if command == 'import':
+		result = import_mdat_directory(mdat_directory, store_directory)
+		if result.success:
+			print('%d pages, %d text lines imported' % (result.item[0], result.item[1]))
+	elif command == 'export':
+		result = export_mdat_directory(store_directory, mdat_directory)
+		if result.success:
+			print('%d pages exported' % result.item)
+	else:
+		store = ccorpus_store(store_directory)
+		result = store.open()
+		if result.success:
+			print('%d pages, %d text lines' % (store.num_pages, store.num_lines))
+
+	if not result.success:
+		print(result.message)
+		return 2
+	return 0
+
+
+if __name__ == "__main__":
+
+	sys.exit(main(sys.argv[1:]))
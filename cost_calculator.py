@@ -22,10 +22,12 @@ class ccost_calculator(object):
 	create_regions_for_origin_points()
 	calculate_costs_for_origin_points()
 
-
+	If the origin_points come from several columns of a page (see page_layout), xcolumn_offsets gives the
+	start of each column in xorigin_points (plus a final len(xorigin_points)), so that neighbors are only
+	introduced within a column. Each column must have at least two origin_points.
 
 	'''
-	def __init__(self, xorigin_points, error_params, region_params, bverbose_mode):
+	def __init__(self, xorigin_points, error_params, region_params, bverbose_mode, xcolumn_offsets=None):
 		'''
 		'''
 		self._xorigin_points = xorigin_points
@@ -33,6 +35,10 @@ class ccost_calculator(object):
 		self._region_params = region_params
 		self._bverbose_mode = bverbose_mode
 
+		if xcolumn_offsets is None:
+			xcolumn_offsets = [0, len(xorigin_points)]
+		self._xcolumn_offsets = xcolumn_offsets
+
 
 		result = self._introduce_origin_point_neighbors()
 		if not result.success:
@@ -72,32 +78,37 @@ class ccost_calculator(object):
 	def _introduce_origin_point_neighbors(self):
 		'''
 		'''
+		for column in range(len(self._xcolumn_offsets)-1):
+			xcolumn_origin_points = self._xorigin_points[self._xcolumn_offsets[column]:self._xcolumn_offsets[column+1]]
+			if len(xcolumn_origin_points) < 2:
+				smsg = 'Column %d has %d origin_points; at least 2 are needed to find the line heights' % (column, len(xcolumn_origin_points))
+				return utilsLib.Result(False, message=smsg, item=None)
 
-		# Iterator through our list of origin_points and tell each op the y-coordinate of its
-		# above and below neighbor
+			# Iterator through our list of origin_points and tell each op the y-coordinate of its
+			# above and below neighbor
 
-		# Do Q0	- Only set its bottom neighbor	
-		curr_op = self._xorigin_points[0]
-		bottom_op = self._xorigin_points[1]
-		curr_op.set_top_neighbor_y(None)
-		curr_op.set_bottom_neighbor_y(bottom_op.y)
+			# Do Q0	- Only set its bottom neighbor	
+			curr_op = xcolumn_origin_points[0]
+			bottom_op = xcolumn_origin_points[1]
+			curr_op.set_top_neighbor_y(None)
+			curr_op.set_bottom_neighbor_y(bottom_op.y)
 
-		for idx in range(1, len(self._xorigin_points)-1):
+			for idx in range(1, len(xcolumn_origin_points)-1):
 
-			# Get the top, current, and bottom origin_points
-			top_op = self._xorigin_points[idx-1]
-			curr_op = self._xorigin_points[idx]
-			bottom_op = self._xorigin_points[idx+1]
+				# Get the top, current, and bottom origin_points
+				top_op = xcolumn_origin_points[idx-1]
+				curr_op = xcolumn_origin_points[idx]
+				bottom_op = xcolumn_origin_points[idx+1]
 		
-			# Tell the current origin_point about the top and bottom y coordinates
+				# Tell the current origin_point about the top and bottom y coordinates
+				curr_op.set_top_neighbor_y(top_op.y)
+				curr_op.set_bottom_neighbor_y(bottom_op.y)
+
+			# Do Last Q - Only set its top neighbor
+			idx = len(xcolumn_origin_points)-1
+			curr_op = xcolumn_origin_points[idx]
+			top_op = xcolumn_origin_points[idx-1]
 			curr_op.set_top_neighbor_y(top_op.y)
-			curr_op.set_bottom_neighbor_y(bottom_op.y)
-
-		# Do Last Q - Only set its top neighbor
-		idx = len(self._xorigin_points)-1
-		curr_op = self._xorigin_points[idx]
-		top_op = self._xorigin_points[idx-1]
-		curr_op.set_top_neighbor_y(top_op.y)
 
 		return utilsLib.Result(True,message='', item=None)
 
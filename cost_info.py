@@ -17,6 +17,8 @@ class cost_info(object):
 	position, the local and accumulated costs in the previous position and the 
 	location (row, col) of that previous position. 
 	'''
+	__slots__ = ('_row', '_col', '_accum_cost', '_local_cost', '_prev_row', '_prev_col', '_prev_accum_cost', '_prev_local_cost')
+
 	def __init__(self, row, col, local_cost = 0.0, accum_cost=0.0, prev_accum_cost = 0.0):
 		'''
 		The constructor requires the client call it with the location (row and column 
@@ -0,0 +1,230 @@
+# distance_metrics.py
+#
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import math
+
+import numpy as np
+
+import utilsLib
+
+
+# Registry of the available distance metrics, keyed on the name used in the config file
+# (see register_distance_metric and create_distance_metric at the bottom of this module)
+_zdistance_metrics = {}
+
+
+def get_coordinates(xpoints):
+	'''
+	Returns the pair of float arrays [x, y] holding the coordinates of the specified points.
+	'''
+	x = np.array([point.x for point in xpoints], dtype=np.float64)
+	y = np.array([point.y for point in xpoints], dtype=np.float64)
+	return [x, y]
+
+
+class cdistance_metric(object):
+	'''
+	Base class of the distance metrics used as the local cost of the alignment. A metric gives the
+	distance between two points (distance) and, with NumPy, the distances between whole arrays of
+	coordinates: distance_pairs works element by element with broadcasting, so it computes a band
+	of cells as easily as distance_matrix computes the full N x M matrix.
+
+	Where only the order of the distances matters (e.g. to find the nearest point), rank_pairs and
+	rank_value give values that sort the same way as the distances but may be cheaper to compute;
+	the Euclidean metrics skip the square root there.
+
+	The base class itself gives the Euclidean distance (ranked by the distance itself). Derived
+	classes override distance, distance_pairs and max_vertical_offset, and optionally rank_pairs
+	and rank_value.
+	'''
+	metric_name = ''
+
+	def __init__(self, x_weight=1.0, y_weight=1.0):
+		'''
+		The weights are only used by the metrics that scale the axes (see canisotropic_metric).
+		'''
+		self._x_weight = x_weight
+		self._y_weight = y_weight
+
+	@property
+	def name(self):
+		return self.metric_name
+
+	def distance(self, p1, p2):
+		'''
+		Returns the distance between the two points.
+		'''
+		return math.sqrt(math.pow((p1.x - p2.x), 2.0) + math.pow((p1.y - p2.y), 2.0))
+
+	def distance_pairs(self, x1, y1, x2, y2):
+		'''
+		Returns the array of distances between the points (x1, y1) and (x2, y2), element by element.
+		'''
+		dx = x1 - x2
+		dy = y1 - y2
+		return np.sqrt(dx*dx + dy*dy)
+
+	def distance_matrix(self, x1, y1, x2, y2):
+		'''
+		Returns the len(x1) x len(x2) array of the distances between every point (x1, y1) and every point (x2, y2).
+		'''
+		return self.distance_pairs(x1[:, np.newaxis], y1[:, np.newaxis], x2[np.newaxis, :], y2[np.newaxis, :])
+
+	def rank_pairs(self, x1, y1, x2, y2):
+		'''
+		Returns, element by element, values that increase with the distance between (x1, y1) and (x2, y2).
+		'''
+		return self.distance_pairs(x1, y1, x2, y2)
+
+	def rank_value(self, distance):
+		'''
+		Maps a distance to the scale of rank_pairs.
+		'''
+		return distance
+
+	def max_vertical_offset(self, distance):
+		'''
+		Returns the largest vertical offset |y1 - y2| that two points within the specified distance can have.
+		'''
+		return distance
+
+
+class ceuclidean_metric(cdistance_metric):
+	'''
+	The (isotropic) Euclidean distance. This is the metric the aligner has always used. The distances
+	are those of the base class; the ranks are the squared distances, so no square root is taken.
+	'''
+	metric_name = 'euclidean'
+
+	def rank_pairs(self, x1, y1, x2, y2):
+		dx = x1 - x2
+		dy = y1 - y2
+		return dx*dx + dy*dy
+
+	def rank_value(self, distance):
+		return distance * distance
+
+
+class csquared_euclidean_metric(cdistance_metric):
+	'''
+	The squared Euclidean distance. It never takes a square root, and it penalizes large offsets
+	much more than small ones.
+	'''
+	metric_name = 'squared_euclidean'
+
+	def distance(self, p1, p2):
+		return float((p1.x - p2.x)**2 + (p1.y - p2.y)**2)
+
+	def distance_pairs(self, x1, y1, x2, y2):
+		dx = x1 - x2
+		dy = y1 - y2
+		return dx*dx + dy*dy
+
+	def max_vertical_offset(self, distance):
+		return math.sqrt(distance)
+
+
+class canisotropic_metric(cdistance_metric):
+	'''
+	The Euclidean distance with each axis scaled by its weight: sqrt((x_weight*dx)^2 + (y_weight*dy)^2).
+	Assigning an estimate to a line is mostly a matter of its vertical position, so by default an
+	offset in y counts twice as much as one in x.
+	'''
+	metric_name = 'anisotropic'
+
+	def __init__(self, x_weight=1.0, y_weight=2.0):
+		cdistance_metric.__init__(self, x_weight, y_weight)
+
+	def distance(self, p1, p2):
+		return math.sqrt(math.pow(self._x_weight*(p1.x - p2.x), 2.0) + math.pow(self._y_weight*(p1.y - p2.y), 2.0))
+
+	def distance_pairs(self, x1, y1, x2, y2):
+		return np.sqrt(self.rank_pairs(x1, y1, x2, y2))
+
+	def rank_pairs(self, x1, y1, x2, y2):
+		dx = self._x_weight * (x1 - x2)
+		dy = self._y_weight * (y1 - y2)
+		return dx*dx + dy*dy
+
+	def rank_value(self, distance):
+		return distance * distance
+
+	def max_vertical_offset(self, distance):
+		return distance / self._y_weight
+
+
+class cmanhattan_metric(cdistance_metric):
+	'''
+	The Manhattan (city block) distance: |dx| + |dy|.
+	'''
+	metric_name = 'manhattan'
+
+	def distance(self, p1, p2):
+		return float(abs(p1.x - p2.x) + abs(p1.y - p2.y))
+
+	def distance_pairs(self, x1, y1, x2, y2):
+		return np.abs(x1 - x2) + np.abs(y1 - y2)
+
+	def max_vertical_offset(self, distance):
+		return distance
+
+
+def register_distance_metric(name, metric_class):
+	'''
+	Adds a distance metric to the registry so it can be selected by name (the distance_metric
+	key in the Alignment section of the config file). metric_class must be derived from cdistance_metric.
+	'''
+	if not issubclass(metric_class, cdistance_metric):
+		smsg = 'Distance metric %s must be derived from cdistance_metric' % name
+		return utilsLib.Result(False, message=smsg, item=None)
+	_zdistance_metrics[name] = metric_class
+	return utilsLib.Result(True, message='', item=None)
+
+def get_distance_metric_names():
+	'''
+	Returns the (sorted) list of the names of the registered distance metrics.
+	'''
+	return sorted(_zdistance_metrics.keys())
+
+def create_distance_metric(metric_name, x_weight=None, y_weight=None):
+	'''
+	Returns (through a Result object) an instance of the distance metric registered under metric_name.
+	Weights that are not given keep the metric's defaults.
+	'''
+	if metric_name not in _zdistance_metrics:
+		smsg = 'Unknown distance metric: %s. Registered metrics: %s' % (metric_name, ', '.join(get_distance_metric_names()))
+		return utilsLib.Result(False, message=smsg, item=None)
+
+	zweights = {}
+	if x_weight is not None:
+		zweights['x_weight'] = x_weight
+	if y_weight is not None:
+		zweights['y_weight'] = y_weight
+	return utilsLib.Result(True, message='', item=_zdistance_metrics[metric_name](**zweights))
+
+
+register_distance_metric(ceuclidean_metric.metric_name, ceuclidean_metric)
+register_distance_metric(csquared_euclidean_metric.metric_name, csquared_euclidean_metric)
+register_distance_metric(canisotropic_metric.metric_name, canisotropic_metric)
+register_distance_metric(cmanhattan_metric.metric_name, cmanhattan_metric)
+
+
+if __name__ == "__main__":
+
+	import point as pt
+
+	xq = [pt.cpoint(0, 1), pt.cpoint(1, 3), pt.cpoint(1, 6)]
+	xp = [pt.cpoint(2, 3), pt.cpoint(3, 6)]
+	qx, qy = get_coordinates(xq)
+	px, py = get_coordinates(xp)
+
+	for metric_name in get_distance_metric_names():
+		metric = create_distance_metric(metric_name).item
+		print('%s: d(Q0, P0) = %5.2f' % (metric_name, metric.distance(xq[0], xp[0])))
+		print(metric.distance_matrix(qx, qy, px, py))
+
+	print('Done ...')
@@ -5,32 +5,58 @@
 
 
 from __future__ import print_function
+import os
 import math
 import sys
 import logging
 
+import numpy as np
+
 
 import utilsLib
 import cost_info as ci
-import origin_points
+import assignment as asg
+import distance_metrics as dm
 
 
 bVerbose_mode = True
 
+# Registry of the available alignment engines, keyed on the name used in the config file
+# (see register_alignment_engine and create_aligner at the bottom of this module)
+_zalignment_engines = {}
+
+# The moves of the DTW recurrence, as recorded for a block of columns (see dtw_aligner._fill_column_block)
+_START, _UP, _LEFT, _DIAG = range(4)
+
 class dtw_aligner(object):
 	'''
 	An instance of this class is used to align two sequences of COriginPoint objects. 
 	For convenience we use the COriginPointsList class to hold each sequence, since this class encapsulates the MDAT reading functionality.
+
+	This class is also the reference alignment engine, registered as 'reference'. Alternative engines
+	derive from it and override compute_cost and get_backtrace, and they are checked against this one
+	with the dtw_verifier module.
 	'''
-	def __init__(self, xorigin_points, xestimate_points, bverbose_mode, bprint_to_screen):
+	engine_name = 'reference'
+
+	# A run of collapsed duplicate estimate_points (see cestimate_points.collapse_duplicate_estimate_points)
+	# is aligned as one block of columns. Engines that override compute_cost and get_backtrace set this to False.
+	bcolumn_blocks = True
+
+	def __init__(self, xorigin_points, xestimate_points, bverbose_mode, bprint_to_screen, metric=None):
 		'''
 		Original Code:
 		Constructor requires two sequences, the first is a list of corigin_point instances,
 		the second is a list of cestimate_point instances.
+		metric is the cdistance_metric instance that gives the local costs (Euclidean if None).
 		'''
 		self._bverbose_mode = bverbose_mode
 		self._bprint_to_screen = bprint_to_screen
 
+		if metric is None:
+			metric = dm.ceuclidean_metric()
+		self._metric = metric
+
 		self._Q = xorigin_points
 		self._P = xestimate_points
 
@@ -38,9 +64,124 @@ class dtw_aligner(object):
 		self._numRows = len(self._Q)
 		self._numCols = len(self._P)
 
+		# Set by try_diagonal_fast_path when the page can be aligned without the N x M cost matrix
+		self._bdiagonal_fast_path = False
+		self._xdiagonal_local_costs = []
+		self._xdiagonal_accum_costs = []
+
+		# Set by compute_cost, kept for export_matrices
+		self._local_cost_matrix = None
+
+		# The [start, end) columns of every block: a weighted estimate_point and its collapsed duplicates
+		self._xcolumn_blocks = self._get_column_blocks()
+		self._bcolumn_blocks = self.bcolumn_blocks and len(self._xcolumn_blocks) < self._numCols
+
+		# Set by compute_cost when there are blocks: the accumulated costs of the last column of each block
+		self._xblock_accum_costs = None
+
+		# Set by post_process_origin_points
+		self._assignment = None
+
+	def try_diagonal_fast_path(self):
+		'''
+		Linear-time pre-check for pages that are trivially alignable: Q and P have the same length 
+		and every P[i] is strictly closer to Q[i] than any other estimate_point is. Every path through 
+		the cost matrix visits each row at least once, so under this condition the diagonal is the 
+		unique minimum-cost path and the full DP would return exactly the diagonal backtrace.
+
+		The estimate_points must be sorted on y so that, for each row, only the estimate_points whose 
+		y coordinate is within the diagonal distance need to be looked at. If that neighborhood is not 
+		small (more than a few points per row on average) we give up and use the full DTW.
+
+		Returns (through a Result object) True if the fast path was taken, in which case the calls to
+		create_empty_cost_matrix, create_empty_cost_info_matrix and compute_cost do nothing and
+		get_backtrace returns the diagonal.
+		'''
+		self._bdiagonal_fast_path = False
+		if self._numRows != self._numCols or self._numRows < 2:
+			return utilsLib.Result(True, message='', item=False)
+
+		for j in xrange(1, self._numCols):
+			if self._P[j].y < self._P[j-1].y:
+				return utilsLib.Result(True, message='', item=False)
+
+		# Upper bound on the total number of off-diagonal distances we are prepared to compute
+		max_comparisons = 4 * self._numRows
+		num_comparisons = 0
+
+		# The diagonal costs are computed as one band. Only the order of the distances matters for the
+		# comparisons, so these are done on the metric's rank scale (no square roots for Euclidean).
+		qx, qy = dm.get_coordinates(self._Q)
+		px, py = dm.get_coordinates(self._P)
+		xlocal_costs = self._metric.distance_pairs(qx, qy, px, py).tolist()
+		xdiagonal_ranks = self._metric.rank_pairs(qx, qy, px, py).tolist()
+		xmax_offsets = [self._metric.max_vertical_offset(d) for d in xlocal_costs]
+		xqx = qx.tolist()
+		xqy = qy.tolist()
+		xpx = px.tolist()
+		xpy = py.tolist()
+
+		for i in xrange(self._numRows):
+			# Walk up and down P from the diagonal until the y distance alone rules out a tie
+			for step in (-1, 1):
+				j = i + step
+				while 0 <= j < self._numCols and abs(xpy[j] - xqy[i]) <= xmax_offsets[i]:
+					num_comparisons += 1
+					if num_comparisons > max_comparisons:
+						return utilsLib.Result(True, message='', item=False)
+					if self._metric.rank_pairs(xqx[i], xqy[i], xpx[j], xpy[j]) <= xdiagonal_ranks[i]:
+						return utilsLib.Result(True, message='', item=False)
+					j += step
+
+		# Accumulate the costs in the same order as compute_cost does along the diagonal
+		xaccum_costs = [xlocal_costs[0]]
+		for i in xrange(1, self._numRows):
+			xaccum_costs.append(xaccum_costs[i-1] + xlocal_costs[i])
+
+		self._bdiagonal_fast_path = True
+		self._xdiagonal_local_costs = xlocal_costs
+		self._xdiagonal_accum_costs = xaccum_costs
+
+		if self._bverbose_mode:
+			logging.debug('Diagonal fast path taken for %d x %d alignment.' % (self._numRows, self._numCols))
+
+		return utilsLib.Result(True, message='', item=True)
+
+	@property
+	def diagonal_fast_path(self):
+		return self._bdiagonal_fast_path
+
+	@property
+	def column_blocks(self):
+		return self._bcolumn_blocks
+
+	def _get_column_blocks(self):
+		'''
+		Private method that returns the list of the [start, end) columns of the blocks of P. A block is an
+		estimate_point followed by the duplicates collapsed into it (its weight is the size of the block);
+		every other estimate_point is a block of its own.
+		'''
+		xblocks = []
+		j = 0
+		while j < self._numCols:
+			end = j + 1
+			get_collapsed_estimate_points = getattr(self._P[j], 'get_collapsed_estimate_points', None)
+			if get_collapsed_estimate_points is not None:
+				xcollapsed = get_collapsed_estimate_points()
+				# The duplicates are only a block if they follow their representative in P
+				if xcollapsed and j + self._P[j].weight <= self._numCols and \
+						all(est_pt is self._P[j+1+k] for k, est_pt in enumerate(xcollapsed)):
+					end = j + self._P[j].weight
+			xblocks.append([j, end])
+			j = end
+		return xblocks
+
 	def create_empty_cost_matrix(self):
 		'''
 		'''
+		if self._bdiagonal_fast_path or self._bcolumn_blocks:
+			return utilsLib.Result(True,message='', item=None)
+
 		# create the cost matrix, all with zero costs
 		self._cost = [[0 for _ in range(self._numCols)] for _ in range(self._numRows)]
 		return utilsLib.Result(True,message='', item=None)
@@ -48,6 +189,9 @@ class dtw_aligner(object):
 	def create_empty_cost_info_matrix(self):
 		'''
 		'''
+		if self._bdiagonal_fast_path or self._bcolumn_blocks:
+			return utilsLib.Result(True,message='', item=None)
+
 		# create the cost_info_matrix, all with placeholder cost_info objects
 		self._cost_info_matrix = [[ci.cost_info(row, col) for col in range(self._numCols)] for row in range(self._numRows)]
 		return utilsLib.Result(True,message='', item=None)
@@ -56,20 +200,89 @@ class dtw_aligner(object):
 	def _distance(self, p1, p2):
 		'''
 		Private method that takes two CPoint instances, which are (x, y) coordinates, 
-		p1 and p2, and returns the (Euclidean) distance.
+		p1 and p2, and returns their distance under our metric.
+		'''
+		return self._metric.distance(p1, p2)
+
+	def _compute_local_costs(self):
+		'''
+		Private method that computes the whole N x M matrix of local costs at once with the metric's
+		NumPy implementation. Returns it as a list of lists, which is quicker to index cell by cell.
+		'''
+		qx, qy = dm.get_coordinates(self._Q)
+		px, py = dm.get_coordinates(self._P)
+		self._local_cost_matrix = self._metric.distance_matrix(qx, qy, px, py)
+		return self._local_cost_matrix.tolist()
+
+	def _fill_column_block(self, start, end, xprev_accum_costs):
 		'''
-		d = math.sqrt(math.pow((p1.x - p2.x), 2.0) + math.pow((p1.y - p2.y), 2.0))
-		return d
+		Private method that runs the DTW recurrence of compute_cost (with the same order of the moves, so ties
+		are broken the same way) through the columns [start, end) of a block, from the accumulated costs of
+		the column before it (None for the first column). Returns the list [xxaccum_costs, xxmoves, xxlocal_costs],
+		each holding one list of numRows values per column of the block.
+		'''
+		xxlocal_costs = self._metric.distance_matrix(self._qx, self._qy, self._px[start:end], self._py[start:end]).T.tolist()
+		xxaccum_costs = []
+		xxmoves = []
+		for xlocal_costs in xxlocal_costs:
+			xaccum_costs = [0.0] * self._numRows
+			xmoves = [_UP] * self._numRows
+			if xprev_accum_costs is None:
+				xaccum_costs[0] = xlocal_costs[0]
+				xmoves[0] = _START
+				for i in xrange(1, self._numRows):
+					xaccum_costs[i] = xaccum_costs[i-1] + xlocal_costs[i]
+			else:
+				xaccum_costs[0] = xprev_accum_costs[0] + xlocal_costs[0]
+				xmoves[0] = _LEFT
+				for i in xrange(1, self._numRows):
+					# Up, left, then diagonal, as they are added to the Chooser
+					best_accum_cost = xaccum_costs[i-1]
+					if xprev_accum_costs[i] < best_accum_cost:
+						best_accum_cost = xprev_accum_costs[i]
+						xmoves[i] = _LEFT
+					if xprev_accum_costs[i-1] < best_accum_cost:
+						best_accum_cost = xprev_accum_costs[i-1]
+						xmoves[i] = _DIAG
+					xaccum_costs[i] = best_accum_cost + xlocal_costs[i]
+			xxaccum_costs.append(xaccum_costs)
+			xxmoves.append(xmoves)
+			xprev_accum_costs = xaccum_costs
+		return [xxaccum_costs, xxmoves, xxlocal_costs]
+
+	def _compute_block_costs(self):
+		'''
+		Private method that computes the costs for P's blocks of columns. Only the accumulated costs of the
+		last column of each block are kept (get_backtrace recomputes the rest of a block from the one before it),
+		so the numRows x numCols matrices are never built.
+		'''
+		self._qx, self._qy = dm.get_coordinates(self._Q)
+		self._px, self._py = dm.get_coordinates(self._P)
+		self._xblock_accum_costs = []
+		xprev_accum_costs = None
+		for start, end in self._xcolumn_blocks:
+			xxaccum_costs, xxmoves, xxlocal_costs = self._fill_column_block(start, end, xprev_accum_costs)
+			xprev_accum_costs = xxaccum_costs[-1]
+			self._xblock_accum_costs.append(xprev_accum_costs)
+		return utilsLib.Result(True,message='', item=None)
 
 
 	def compute_cost(self):
 		'''
 		Calling this method causes the full alignment cost matrix to be computed.
 		Before this method can be called, the client must first call th ecreate_empty_cost_matrix() and create_empty_choices_matrix() methods.
+		If P holds collapsed duplicate estimate_points their runs are computed as blocks of columns instead (see
+		_compute_block_costs); the costs, and so the path, are the same.
 		'''
+		if self._bdiagonal_fast_path:
+			return utilsLib.Result(True,message='', item=None)
+		if self._bcolumn_blocks:
+			return self._compute_block_costs()
+
+		xxlocal_costs = self._compute_local_costs()
 
 		# compute the cost for [0][0] for the _cost matrix and the _cost_info_matrix
-		local_cost = self._distance(self._Q[0], self._P[0])
+		local_cost = xxlocal_costs[0][0]
 		self._cost[0][0] = local_cost
 		self._cost_info_matrix[0][0].accum_cost = local_cost
 
@@ -79,7 +292,7 @@ class dtw_aligner(object):
 
 			# Everything related to the _cost object
 			prev_accum_cost = self._cost[i-1][0]
-			curr_local_cost = self._distance(self._Q[i], self._P[0])
+			curr_local_cost = xxlocal_costs[i][0]
 			self._cost[i][0] = prev_accum_cost + curr_local_cost
 			
 			# Everything related to the _cost_info_matrix
@@ -104,7 +317,7 @@ class dtw_aligner(object):
 
 			# Everything related to the _cost object
 			prev_accum_cost = self._cost[0][j-1]
-			curr_local_cost = self._distance(self._Q[0], self._P[j])
+			curr_local_cost = xxlocal_costs[0][j]
 			self._cost[0][j] = prev_accum_cost + curr_local_cost
 
 			# Everything related to the _cost_info_matrix
@@ -144,7 +357,7 @@ class dtw_aligner(object):
 				result = chooser.get_minimum_accum_cost_item()
 				if result.success:
 					best_prev_cost_item = result.item
-					curr_local_cost = self._distance(self._Q[i], self._P[j])
+					curr_local_cost = xxlocal_costs[i][j]
 					cost_info = ci.cost_info(i, j, local_cost=curr_local_cost)
 					cost_info.add_info_from_prev_cost_info_instance(best_prev_cost_item.row, 
 																	best_prev_cost_item.col, 
@@ -165,6 +378,10 @@ class dtw_aligner(object):
 		'''
 		Returns the accumulated minimal-cost path for alignment.
 		'''
+		if self._bdiagonal_fast_path:
+			return self._xdiagonal_accum_costs[-1]
+		if self._bcolumn_blocks:
+			return self._xblock_accum_costs[-1][-1]
 		return self._cost[-1][-1]
 
 
@@ -172,6 +389,9 @@ class dtw_aligner(object):
 		'''
 		Prints the cost matrix
 		'''
+		if self._bdiagonal_fast_path or self._bcolumn_blocks:
+			return
+
 		if self._bverbose_mode and self._bprint_to_screen:
 			print('\n\nThe _cost matrix: ',end="")	
 			for row in self._cost:
@@ -184,6 +404,9 @@ class dtw_aligner(object):
 		'''
 		Prints the cost_info matrix
 		'''
+		if self._bdiagonal_fast_path or self._bcolumn_blocks:
+			return
+
 		if self._bverbose_mode and self._bprint_to_screen:
 			print('\n\n_cost_info_matrix[][].accum_cost: ',end="")	
 			for row in xrange(self._numRows):
@@ -192,6 +415,55 @@ class dtw_aligner(object):
 					print('%5.2f\t' % (self._cost_info_matrix[row][col].accum_cost),end="")
 
 
+	def get_matrices(self):
+		'''
+		Returns (through a Result object) a dictionary of NumPy arrays built from the matrices of compute_cost:
+			accum_cost - the accumulated cost of each cell
+			local_cost - the distance between the origin_point and estimate_point of each cell
+			prev_row, prev_col - the cell each cell was reached from (the backpointers), -1 for [0][0]
+		'''
+		if self._bdiagonal_fast_path:
+			return utilsLib.Result(False, message='There are no matrices when the diagonal fast path is taken', item=None)
+		if self._bcolumn_blocks:
+			return utilsLib.Result(False, message='There are no matrices when collapsed estimate_points are aligned as blocks', item=None)
+
+		prev_rows = np.empty((self._numRows, self._numCols), dtype=np.int32)
+		prev_cols = np.empty((self._numRows, self._numCols), dtype=np.int32)
+		for row in xrange(self._numRows):
+			xcost_infos = self._cost_info_matrix[row]
+			prev_rows[row] = [cost_info.prev_row for cost_info in xcost_infos]
+			prev_cols[row] = [cost_info.prev_col for cost_info in xcost_infos]
+		prev_rows[0, 0] = -1
+		prev_cols[0, 0] = -1
+
+		zmatrices = {'accum_cost': np.array(self._cost, dtype=np.float64),
+					 'local_cost': self._local_cost_matrix,
+					 'prev_row': prev_rows,
+					 'prev_col': prev_cols}
+		return utilsLib.Result(True, message='', item=zmatrices)
+
+	def export_matrices(self, directory):
+		'''
+		Writes the matrices of get_matrices to the specified directory, one .npy file each (accum_cost.npy, 
+		local_cost.npy, prev_row.npy and prev_col.npy), so that they can be memory-mapped and looked at a 
+		slice at a time with the matrix_viewer module. This replaces print_cost_matrix and 
+		print_cost_info_matrix, which format every cell, for pages of any size.
+		'''
+		result = self.get_matrices()
+		if not result.success:
+			return result
+		zmatrices = result.item
+
+		try:
+			if not os.path.isdir(directory):
+				os.makedirs(directory)
+			for name in sorted(zmatrices.keys()):
+				np.save(os.path.join(directory, name + '.npy'), zmatrices[name])
+		except:
+			smsg = 'Exception thrown writing the matrices to %s. Details: %s' % (directory, utilsLib.getExceptionDetails())
+			return utilsLib.Result(False, message=smsg, item=None)
+
+		return utilsLib.Result(True, message='', item=directory)
 			
 	def print_backtrace_info(self, q_index, p_index, info_string):
 		if self._bverbose_mode:
@@ -200,13 +472,17 @@ class dtw_aligner(object):
 
 	def get_backtrace(self):
 		'''
-		Returns a list of cost_info objects starting from the end of the alignment and progress backwards towards the 
-		start. This list of cost_info objects tells us the minimum-cost path and the row (Q) and column (P) indices tell 
-		us which COriginPoint objects in the P sequence are associated (because of this alignment) with which COriginPoint 
-		objects in the Q sequence.
+		Returns (through a Result object) the minimum-cost path as a three-item list of NumPy arrays: 
+		[rows, cols, local_costs]. The path starts at the end of the alignment and progresses backwards 
+		to the start, [0][0], which is the last element. The row (Q) and column (P) indices tell us which 
+		COriginPoint objects in the P sequence are associated (because of this alignment) with which 
+		COriginPoint objects in the Q sequence, and local_costs holds the distance for each of those pairs.
 		'''
-		self._xBackTrace = []
-		
+		if self._bdiagonal_fast_path:
+			return self._get_diagonal_backtrace()
+		if self._bcolumn_blocks:
+			return self._get_block_backtrace()
+
 		# Note: This is how the back-trace works:
 		# The index of the current position is used to pull from the _cost_info_matrix a cost_info object which 
 		# encodes the previous position. We use the coordinates of that previous position to pull out a the 
@@ -220,93 +496,150 @@ class dtw_aligner(object):
 			logging.debug('---------------- Start of get_backtrace() --------------------')
 			logging.debug('\n')
 
+		# A monotonic path can't be longer than this, so the arrays are allocated once and trimmed at the end
+		max_length = self._numRows + self._numCols - 1
+		rows = np.empty(max_length, dtype=np.intp)
+		cols = np.empty(max_length, dtype=np.intp)
+		local_costs = np.empty(max_length, dtype=np.float64)
+
 		q_index = self._numRows-1
 		p_index = self._numCols-1
-		
-		# Step 0. We assume we have a current_choice object (that was already appended to our list)
-		current_position = self._cost_info_matrix[q_index][p_index]
-		self._xBackTrace.append(current_position)
-		self.print_backtrace_info(q_index, p_index, current_position.info_string)
-
+		length = 0
 		while True:
+			current_position = self._cost_info_matrix[q_index][p_index]
+			rows[length] = q_index
+			cols[length] = p_index
+			local_costs[length] = current_position.local_cost
+			length += 1
 
-			# Step 1. Use the current_choice object to get previous indices
-			prev_q_index = current_position.prev_row
-			prev_p_index = current_position.prev_col
+			if self._bverbose_mode:
+				self.print_backtrace_info(q_index, p_index, current_position.info_string)
 
-			# Step 2. If the previous indices are 0, then we know we're at the start and we're done
-			if prev_q_index == 0 and prev_p_index == 0:
-				#self.print_backtrace_info(prev_q_index, prev_p_index, current_position.info_string)
-				self.print_backtrace_info(prev_q_index, prev_p_index, self._cost_info_matrix[0][0].info_string)
-				return utilsLib.Result(True,message='', item=self._xBackTrace) 
+			# If we're at the start we're done, otherwise the current cost_info object tells us where we came from
+			if q_index == 0 and p_index == 0:
+				break
+			q_index = current_position.prev_row
+			p_index = current_position.prev_col
 
-			# Step 3. If the previous indices are NOT 0, then use the previous indices to pull the cost_info
-			# object from matrix; call this current_position object, add it to our list and repeat
-			else:
-				current_position = self._cost_info_matrix[prev_q_index][prev_p_index]
+		# The cost_info object at [0][0] only carries the accumulated cost, which is also its local cost
+		local_costs[length-1] = self._cost[0][0]
 
-			# Step 4. Add this Choice object to the end of our list
-			self._xBackTrace.append(current_position)
+		return self._set_backtrace(rows[:length], cols[:length], local_costs[:length])
 
-			if self._bverbose_mode:
-				self.print_backtrace_info(prev_q_index, prev_p_index, current_position.info_string)
+	def _get_diagonal_backtrace(self):
+		'''
+		Private method that builds the backtrace for the diagonal fast path in the same form as
+		get_backtrace does from the cost_info matrix.
+		'''
+		rows = np.arange(self._numRows-1, -1, -1, dtype=np.intp)
+		local_costs = np.array(self._xdiagonal_local_costs, dtype=np.float64)[::-1]
+
+		if self._bverbose_mode:
+			for i in xrange(self._numRows-1, -1, -1):
+				self.print_backtrace_info(i, i, 'Local Cost: %5.2f, Accum Cost: %5.2f' % (self._xdiagonal_local_costs[i], self._xdiagonal_accum_costs[i]))
+
+		return self._set_backtrace(rows, rows.copy(), local_costs)
+
+	def _get_block_backtrace(self):
+		'''
+		Private method that builds the backtrace when P's columns were computed as blocks, in the same form as
+		get_backtrace does from the cost_info matrix. Each block's moves are recomputed from the accumulated
+		costs kept for the block before it, so the path splits a block's duplicates across the rows exactly
+		as the full matrices would.
+		'''
+		max_length = self._numRows + self._numCols - 1
+		rows = np.empty(max_length, dtype=np.intp)
+		cols = np.empty(max_length, dtype=np.intp)
+		local_costs = np.empty(max_length, dtype=np.float64)
 
+		q_index = self._numRows-1
+		p_index = self._numCols-1
+		length = 0
+		for block in xrange(len(self._xcolumn_blocks)-1, -1, -1):
+			start, end = self._xcolumn_blocks[block]
+			xprev_accum_costs = self._xblock_accum_costs[block-1] if block > 0 else None
+			xxaccum_costs, xxmoves, xxlocal_costs = self._fill_column_block(start, end, xprev_accum_costs)
+
+			# Follow the moves until the path leaves the block (or reaches [0][0])
+			move = _START
+			while p_index >= start:
+				rows[length] = q_index
+				cols[length] = p_index
+				local_costs[length] = xxlocal_costs[p_index-start][q_index]
+				length += 1
+
+				if self._bverbose_mode:
+					self.print_backtrace_info(q_index, p_index, 'Local Cost: %5.2f, Accum Cost: %5.2f' %
+											  (xxlocal_costs[p_index-start][q_index], xxaccum_costs[p_index-start][q_index]))
+
+				move = xxmoves[p_index-start][q_index]
+				if move == _START:
+					break
+				if move != _LEFT:
+					q_index -= 1
+				if move != _UP:
+					p_index -= 1
+			if move == _START:
+				break
+
+		return self._set_backtrace(rows[:length], cols[:length], local_costs[:length])
+
+	def _set_backtrace(self, rows, cols, local_costs):
+		'''
+		Private method that saves away the backtrace arrays for process_backtrace and returns them through a Result object.
+		'''
+		self._backtrace_rows = rows
+		self._backtrace_cols = cols
+		self._backtrace_local_costs = local_costs
+		return utilsLib.Result(True,message='', item=[rows, cols, local_costs])
+
+	def _get_runs(self, indices):
+		'''
+		Private method that splits a non-increasing array of indices (the rows or the cols of the backtrace)
+		into runs of equal values. Returns the list of [index, start, end] items, one per run.
+		'''
+		boundaries = np.flatnonzero(indices[1:] != indices[:-1]) + 1
+		starts = np.concatenate(([0], boundaries))
+		ends = np.concatenate((boundaries, [len(indices)]))
+		return [[indices[start], start, end] for start, end in zip(starts.tolist(), ends.tolist())]
 
 	def process_backtrace(self):
 		'''
 		Prior to calling this method the client must first call compute_cost() to create the cost matrix and then it
-		must next call get_backtrace() to create the _xBackTrace list from the cost matrix.
-		This method iterates throught the _xBackTrace list to do the following for each ccost_info instance in this list:
+		must next call get_backtrace() to create the backtrace arrays from the cost matrix.
+		This method uses the rows, cols and local_costs arrays of the backtrace to do the following:
 		Note: An origin_point can have multiple estimate_points. But an estimate_point can only be assigned to one origin_point.
-			- It gets the cost_info's column property, which it uses to get the estimate_point from the _P list
-			- It gets the cost_info's row property, which it uses to get the origin_point from the _Q list
-			- It sets the error and region parameters for the origin_point
-			= It adds the estimate_point to the origin_point
-			- It tells the estimate_point which origin_point it just got associated with. At the end if an estimate_point has
-			  been associated with multiple origin_points, say, A, B and C, then we know we have to look at the local_cost for
-			  each of these possible associations and only assign this estimate_point to the origin_point with the lowest local_cost.
-
-		them to the appropriate origin_point instance as prescribed by the DTW alignment. It does this by calling the add_estimate_point()
-		method
+			- The path cells, grouped by row, become a cassignment (CSR) that every origin_point reads its 
+			  estimate_points from
+			- Each origin_point gets the local_cost of its cell nearest the start of the path, [0][0] excepted
+		At this point an estimate_point may be associated with multiple origin_points, say, A, B and C. 
+		post_process_origin_points looks at the local_cost for each of these possible associations and only 
+		assigns this estimate_point to the origin_point with the lowest local_cost.
+
+		Rows are non-increasing along the path, so each origin_point's cells are contiguous in the arrays 
+		and are handled as a single slice.
 		'''
 		if self._bverbose_mode:
 			logging.debug('\n')
 			logging.debug('---------------- Start of process_backtrace ----------------------')
 			logging.debug('\n')
 
-		# We iterate through the _xBackTrace list that we created in the get_BackTrace method to update the _Q and _P points.
-		for cost_info_item in self._xBackTrace:
-
-			row_in_backtrace = cost_info_item.row
-			col_in_backtrace = cost_info_item.col
-			local_cost = cost_info_item.local_cost
-
+		rows = self._backtrace_rows
+		cols = self._backtrace_cols
+		local_costs = self._backtrace_local_costs
 
-			# Get the cestimate_point instance corresponding to this column
-			ep = self._P[col_in_backtrace]
-
-			# Get the corigin_point instance corresponding to this row, set the rgion and error parameters
-			# and then add the estimate_point to this origin_point (that it was associated with by the DTW alignment)
-			op = self._Q[row_in_backtrace]
-			op.add_estimate_point(ep)
-			op.local_cost = local_cost
-
-			# Now we tell this estimate_point about the origin_point it was assigned to. If we end up
-			# assigning this estimate_point to multiple origin_points, then we will later have to go back 
-			# and choose between them (and the origin_points not chosen run the risk of having a miss).
-			ep.add_candidate_origin_point(op)
-
-		# Manually fill in the 0th item:
-		row_in_backtrace = 0
-		col_in_backtrace = 0
-		ep = self._P[col_in_backtrace]
-		op = self._Q[row_in_backtrace]
-		op.add_estimate_point(ep)
-		
-		# I don't know how to get the local cost since I don't have a real cost_info object for 0,0
-		#op.local_cost = local_cost
-		ep.add_candidate_origin_point(op)
+		# The path, grouped by row, is the (candidate) assignment of estimate_points to origin_points
+		result = asg.create_assignment(self._P, rows, cols, self._numRows)
+		if not result.success:
+			return result
+		result.item.attach(self._Q)
 
+		# The local_cost of an origin_point comes from the last of its cells along the path. The [0][0]
+		# cell is left out, as it always has been.
+		num_cells = len(rows) - 1
+		if num_cells > 0:
+			for row, start, end in self._get_runs(rows[:num_cells]):
+				self._Q[row].local_cost = float(local_costs[end-1])
 
 		# Return the Result object
 		return utilsLib.Result(True,message='', item=None)
@@ -314,9 +647,16 @@ class dtw_aligner(object):
 	def post_process_origin_points(self):
 		'''
 		Prior to calling this method the client must first call compute_cost() to create the cost matrix. 
-		Then it must call get_backtrace() to create the _xBackTrace list from the cost matrix.
+		Then it must call get_backtrace() to create the backtrace arrays from the cost matrix.
 		Then it must call process_backtrace() to add the estimate_points to their appropriate origin_points.
-		
+
+		An estimate_point that the path pairs with several origin_points has to settle down with just one 
+		of them: the candidate origin_point with the lowest local_cost, and on a tie the one that comes 
+		first along the path (which is what cpoint_chooser picks). Rather than choosing between the 
+		candidates one estimate_point at a time, the cells of the path are sorted (with a single lexsort) 
+		on col, then on the local_cost of their row's origin_point, then on their position along the path, 
+		so the winner for each col is the first cell of its group. The final assignment is then given to 
+		all of the origin_points as one cassignment (see get_assignment).
 		'''
 
 		if self._bverbose_mode:
@@ -324,91 +664,107 @@ class dtw_aligner(object):
 			logging.debug('---------------- Start of post_process_origin_points ----------------------')
 			logging.debug('\n')
 
-		# Get the dictionary of promiscuous estimate_points
-		result = self._find_estimate_points_assigned_to_multiple_origin_points()
-		if result.success:
-			zest_pts_to_be_reconsidered = result.item 
-			if self._bverbose_mode:
-				logging.debug('\n\nPost-processing %d estimate_points which were assigned to multiple origin_points ...' % len(zest_pts_to_be_reconsidered))
-
-			for name in zest_pts_to_be_reconsidered.keys():
-				ep = zest_pts_to_be_reconsidered[name]
-				
-
-				chooser = origin_points.cpoint_chooser()
-
-				# Get the list of this (promiscuous) ep's partners
-				xorig_points = ep.get_candidate_origin_points()
-
-				if self._bverbose_mode:
-					logging.debug('estimate_point %s has %d candidate origin_points' % (ep.name, len(xorig_points)))
+		rows = self._backtrace_rows
+		cols = self._backtrace_cols
+		row_local_costs = np.array([orig_pt.local_cost for orig_pt in self._Q], dtype=np.float64)
+
+		# Pick the winning row for every col (every col and every row is visited by the path)
+		order = np.lexsort((np.arange(len(rows)), row_local_costs[rows], cols))
+		sorted_cols = cols[order]
+		bwinner = np.ones(len(order), dtype=bool)
+		bwinner[1:] = sorted_cols[1:] != sorted_cols[:-1]
+		final_rows = np.empty(self._numCols, dtype=np.intp)
+		final_rows[sorted_cols[bwinner]] = rows[order][bwinner]
+
+		# The estimate_points that had to choose are told which origin_point they settled down with
+		num_candidates = np.bincount(cols, minlength=self._numCols)
+		xconflicted_cols = np.flatnonzero(num_candidates > 1).tolist()
+		if self._bverbose_mode:
+			logging.debug('\n\nPost-processing %d estimate_points which were assigned to multiple origin_points ...' % len(xconflicted_cols))
 
-				# Add these partners (origin_points) to the chooser so we can decide which one is the winner
-				for op in xorig_points:
-					chooser.add_point(op)
+		for col in xconflicted_cols:
+			est_pt = self._P[col]
+			op_winner = self._Q[final_rows[col]]
+			if self._bverbose_mode:
+				logging.debug('estimate_point %s has %d candidate origin_points' % (est_pt.name, num_candidates[col]))
+				logging.debug('Winning origin_point: %s' % op_winner.name)
+			est_pt.set_final_origin_point(op_winner)
 
-				# Pick the winner partner (op)
-				result = chooser.find_lowest_cost_origin_point()
-				if result.success:
-					result = chooser.get_lowest_cost_origin_point()
-					if result.success:
-
-						# Get the winner and tell the promiscuous ep which op it needs to settle down with
-						op_winner = result.item
-						ep.set_final_origin_point(op_winner)
-
-						if self._bverbose_mode:
-							logging.debug('Winning origin_point: %s' % op_winner.name)
-
-						# Get the loser origin_points and then tell each of them to remove 
-						# this promiscuous ep from its little black book - This ep has settled down
-						# with another (lowest-cost) op.
-						result = chooser.get_loser_origin_points()
-						if result.success:
-							xop_losers = result.item
-							for op in xop_losers:
-								result=op.remove_estimate_point(ep)
-								if result.success:
-									if self._bverbose_mode:
-										logging.debug('estimate_point: %s removed from origin_point: %s' % (ep.name, op.name))
-								else:
-									if self._bverbose_mode:
-										logging.debug('Failed to remove estimate_point: %s from origin_point: %s' % (ep.name, op.name))
+		# The final assignment (CSR, in path order within each row) replaces the candidate one on every origin_point
+		result = asg.create_assignment_from_rows(self._P, final_rows, self._numRows)
+		if not result.success:
+			return result
+		self._assignment = result.item
+		self._assignment.attach(self._Q)
 
 		# Return the Result object
 		return utilsLib.Result(True,message='', item=None)
 
-	def _find_estimate_points_assigned_to_multiple_origin_points(self):
-		'''
-		In the process_backtrace method, an estimate_point could be associated by the DTW alignment to multiple 
-		origin_points. When we calculate costs at each orgin_point, we can't have estimate_points associated 
-		with multiple origin_points.
 
-		This private method returns (through a Result object) a dictionary of estimate_points that each have 
-		multiple (candidate) origin_points. The estimate_points in this dictionary need to be processed to 
-		idenitfy among the candidates the lowest-cost origin point and associate the estimate_point with only 
-		that origin_point.
+	def get_assignment(self):
 		'''
-		zest_pts_to_be_reconsidered = {}
+		Returns (through a Result object) the final cassignment built by post_process_origin_points.
+		'''
+		return utilsLib.Result(True,message='', item=self._assignment)
 
-		# Iterate through all of our origin_points
-		for op in self._Q:
 
-			# Get the estimate_points associated with this origin_point
-			zestimate_points = op.get_estimate_points()
+def register_alignment_engine(name, engine_class):
+	'''
+	Adds an alignment engine to the registry so it can be selected by name (the engine
+	key in the Alignment section of the config file). engine_class must be dtw_aligner or
+	a class derived from it.
+	'''
+	if not issubclass(engine_class, dtw_aligner):
+		smsg = 'Alignment engine %s must be derived from dtw_aligner' % name
+		return utilsLib.Result(False, message=smsg, item=None)
+	_zalignment_engines[name] = engine_class
+	return utilsLib.Result(True, message='', item=None)
 
-			# Iterate through the estimate_points assigned to this origin_point
-			for key in zestimate_points.keys():
-				ep = zestimate_points[key]
-			
-				# Identify the estimate_points that have multiple candidate origin_points
-				if ep.num_candidate_origin_points > 1:
+def get_alignment_engine_names():
+	'''
+	Returns the (sorted) list of the names of the registered alignment engines.
+	'''
+	return sorted(_zalignment_engines.keys())
+
+def create_aligner(engine_name, xorigin_points, xestimate_points, bverbose_mode, bprint_to_screen, metric=None):
+	'''
+	Returns (through a Result object) an instance of the alignment engine registered under engine_name,
+	constructed with the same arguments as the dtw_aligner constructor.
+	'''
+	if engine_name not in _zalignment_engines:
+		smsg = 'Unknown alignment engine: %s. Registered engines: %s' % (engine_name, ', '.join(get_alignment_engine_names()))
+		return utilsLib.Result(False, message=smsg, item=None)
+	aligner = _zalignment_engines[engine_name](xorigin_points, xestimate_points, bverbose_mode, bprint_to_screen, metric)
+	return utilsLib.Result(True, message='', item=aligner)
+
+def align(engine_name, xorigin_points, xestimate_points, bverbose_mode=False, buse_fast_path=False, metric=None):
+	'''
+	Runs a complete alignment with the named engine: the diagonal fast path (if buse_fast_path is True),
+	the cost matrices, compute_cost, get_backtrace, process_backtrace and post_process_origin_points.
+	Returns (through a Result object) the aligner instance, whose get_assignment and get_global_cost
+	methods give the results.
+	'''
+	result = create_aligner(engine_name, xorigin_points, xestimate_points, bverbose_mode, False, metric)
+	if not result.success:
+		return result
+	aligner = result.item
+
+	xsteps = []
+	if buse_fast_path:
+		xsteps.append(aligner.try_diagonal_fast_path)
+	xsteps.extend([aligner.create_empty_cost_matrix, aligner.create_empty_cost_info_matrix, aligner.compute_cost,
+				   aligner.get_backtrace, aligner.process_backtrace, aligner.post_process_origin_points])
+
+	for step in xsteps:
+		result = step()
+		if not result.success:
+			smsg = 'Error returned from %s of engine %s. Details: %s' % (step.__name__, engine_name, result.message)
+			return utilsLib.Result(False, message=smsg, item=None)
 
-					# Build a dictionary of estimate_points that have multiple candidate origin_points
-					zest_pts_to_be_reconsidered[ep.name] = ep
+	return utilsLib.Result(True, message='', item=aligner)
 
-		return utilsLib.Result(True,message='', item=zest_pts_to_be_reconsidered)
 
+register_alignment_engine(dtw_aligner.engine_name, dtw_aligner)
 
 			
 if __name__ == "__main__":
@@ -494,11 +850,11 @@ if __name__ == "__main__":
 		result = aligner.get_backtrace()
 		if result.success:
 			# We get the backtrace, but we ignore it if everthing is working
-			xBackTrace = result.item
+			rows, cols, local_costs = result.item
 
-			# Iterate through the backTrace list
-			for cost_info_item in xBackTrace:
-				print(cost_info_item.info_string)
+			# Iterate through the backtrace arrays
+			for idx in xrange(len(rows)):
+				print('Row: %d, Col: %d, Local Cost: %5.2f' % (rows[idx], cols[idx], local_costs[idx]))
 
 			# Process the backtrace to associate estimate_points with origin_points
 			result = aligner.process_backtrace()
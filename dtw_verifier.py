@@ -0,0 +1,297 @@
+# dtw_verifier.py
+#
+# Differential verification of the alignment engines: the reference engine (dtw_aligner) is run
+# alongside another registered engine on the same inputs and any cost or path mismatch is reported.
+from __future__ import print_function
+
+import sys
+import getopt
+import random
+import logging
+
+import utilsLib
+import origin_point as op
+import estimate_point as ep
+import origin_points
+import estimate_points
+import dtw_aligner
+
+
+class cverification_report(object):
+	'''
+	An instance of this class holds the outcome of running one engine against the reference
+	engine on a single pair of origin_point and estimate_point sequences.
+	'''
+	def __init__(self, engine_name, input_name, num_rows, num_cols):
+		'''
+		'''
+		self._engine_name = engine_name
+		self._input_name = input_name
+		self._num_rows = num_rows
+		self._num_cols = num_cols
+
+		self._reference_cost = None
+		self._engine_cost = None
+		self._reference_path_length = 0
+		self._engine_path_length = 0
+
+		# Index (counted from the end of the alignment) of the first step where the paths differ, -1 if they agree
+		self._first_path_mismatch = -1
+		self._bcost_mismatch = False
+
+	def set_costs(self, reference_cost, engine_cost, tolerance):
+		self._reference_cost = reference_cost
+		self._engine_cost = engine_cost
+		self._bcost_mismatch = abs(reference_cost - engine_cost) > tolerance
+
+	def set_paths(self, xreference_path, xengine_path):
+		'''
+		Each path is a list of (row, col) tuples built from the engine's backtrace arrays.
+		'''
+		self._reference_path_length = len(xreference_path)
+		self._engine_path_length = len(xengine_path)
+		self._first_path_mismatch = -1
+		for idx in range(min(len(xreference_path), len(xengine_path))):
+			if xreference_path[idx] != xengine_path[idx]:
+				self._first_path_mismatch = idx
+				return
+		if len(xreference_path) != len(xengine_path):
+			self._first_path_mismatch = min(len(xreference_path), len(xengine_path))
+
+	@property
+	def cost_mismatch(self):
+		return self._bcost_mismatch
+
+	@property
+	def path_mismatch(self):
+		return self._first_path_mismatch >= 0
+
+	@property
+	def success(self):
+		return not (self.cost_mismatch or self.path_mismatch)
+
+	@property
+	def info_string(self):
+		s = 'Engine: %s, Input: %s (%d x %d), Reference cost: %f, Engine cost: %f' % (self._engine_name, self._input_name,
+																				   self._num_rows, self._num_cols,
+																				   self._reference_cost, self._engine_cost)
+		if self.cost_mismatch:
+			s += ', COST MISMATCH'
+		if self.path_mismatch:
+			s += ', PATH MISMATCH at step %d (path lengths: %d, %d)' % (self._first_path_mismatch,
+																		self._reference_path_length,
+																		self._engine_path_length)
+		if self.success:
+			s += ', OK'
+		return s
+
+
+class cdtw_verifier(object):
+	'''
+	An instance of this class runs the reference engine and the named engine on the same
+	inputs and compares their global costs and backtrace paths. Neither compute_cost nor
+	get_backtrace modifies the points, so the verifier can be run on the production sequences
+	before they are handed to process_backtrace.
+
+	If buse_fast_path is True, the engine under test first tries the diagonal fast path 
+	(the reference engine never does), so the fast path can be verified as well. Both engines
+	use the specified cdistance_metric instance (Euclidean if None).
+	'''
+	def __init__(self, engine_name, cost_tolerance=1e-9, bverbose_mode=False, buse_fast_path=False, metric=None):
+		'''
+		'''
+		self._engine_name = engine_name
+		self._metric = metric
+		self._cost_tolerance = cost_tolerance
+		self._bverbose_mode = bverbose_mode
+		self._buse_fast_path = buse_fast_path
+
+	def _run_engine(self, engine_name, xorigin_points, xestimate_points, buse_fast_path=False):
+		'''
+		Private method that runs the named engine up to and including get_backtrace. The Result item
+		is a two-item list: [global_cost, list of (row, col) tuples].
+		'''
+		result = dtw_aligner.create_aligner(engine_name, xorigin_points, xestimate_points, False, False, self._metric)
+		if not result.success:
+			return result
+		aligner = result.item
+
+		if buse_fast_path:
+			result = aligner.try_diagonal_fast_path()
+			if not result.success:
+				return result
+
+		for method in (aligner.create_empty_cost_matrix, aligner.create_empty_cost_info_matrix, aligner.compute_cost):
+			result = method()
+			if not result.success:
+				smsg = 'Error returned from engine %s. Details: %s' % (engine_name, result.message)
+				return utilsLib.Result(False, message=smsg, item=None)
+
+		result = aligner.get_backtrace()
+		if not result.success:
+			smsg = 'Error returned from get_backtrace of engine %s. Details: %s' % (engine_name, result.message)
+			return utilsLib.Result(False, message=smsg, item=None)
+
+		rows, cols, local_costs = result.item
+		xpath = list(zip(rows.tolist(), cols.tolist()))
+		return utilsLib.Result(True, message='', item=[aligner.get_global_cost(), xpath])
+
+	def verify(self, xorigin_points, xestimate_points, input_name=''):
+		'''
+		Runs the reference engine and our engine on the given sequences and returns (through a
+		Result object) a cverification_report instance.
+		'''
+		report = cverification_report(self._engine_name, input_name, len(xorigin_points), len(xestimate_points))
+
+		try:
+			result = self._run_engine(dtw_aligner.dtw_aligner.engine_name, xorigin_points, xestimate_points)
+		except:
+			smsg = 'Exception thrown running the reference engine. Details: ' + utilsLib.getExceptionDetails()
+			return utilsLib.Result(False, message=smsg, item=None)
+		if not result.success:
+			return result
+		reference_cost, xreference_path = result.item
+
+		try:
+			result = self._run_engine(self._engine_name, xorigin_points, xestimate_points, self._buse_fast_path)
+		except:
+			smsg = 'Exception thrown running engine %s. Details: %s' % (self._engine_name, utilsLib.getExceptionDetails())
+			return utilsLib.Result(False, message=smsg, item=None)
+		if not result.success:
+			return result
+		engine_cost, xengine_path = result.item
+
+		report.set_costs(reference_cost, engine_cost, self._cost_tolerance)
+		report.set_paths(xreference_path, xengine_path)
+
+		if self._bverbose_mode:
+			logging.debug(report.info_string)
+
+		return utilsLib.Result(True, message='', item=report)
+
+	def verify_random_inputs(self, num_trials, max_points, seed=0):
+		'''
+		Verifies our engine on num_trials randomly generated pages, each with up to max_points
+		origin_points and estimate_points. The points are sorted on y, as they are in production.
+		Returns (through a Result object) the list of cverification_report instances.
+		'''
+		rng = random.Random(seed)
+		xreports = []
+		for trial in range(num_trials):
+			num_rows = rng.randint(2, max(2, max_points))
+			num_cols = rng.randint(2, max(2, max_points))
+
+			# Lines are laid out top to bottom with some jitter, the estimates are scattered around them
+			xorig = [op.corigin_point(rng.randint(0, 100), 40*i + rng.randint(-5, 5), str(i), i) for i in range(num_rows)]
+			xest = [ep.cestimate_point(rng.randint(0, 100), rng.randint(0, 40*num_rows), str(j), j) for j in range(num_cols)]
+			xorig = sorted(xorig, key=lambda x: x.y)
+			xest = sorted(xest, key=lambda x: x.y)
+
+			result = self.verify(xorig, xest, input_name='random trial %d' % trial)
+			if not result.success:
+				return result
+			xreports.append(result.item)
+
+		return utilsLib.Result(True, message='', item=xreports)
+
+	def verify_mdat_files(self, origin_point_file, estimate_point_file, bsort=True):
+		'''
+		Verifies our engine on the points read from the given MDAT files. Returns (through a
+		Result object) a cverification_report instance.
+		'''
+		orig_points = origin_points.corigin_points(False)
+		result = orig_points.read_origin_points(origin_point_file)
+		if not result.success:
+			return result
+
+		est_points = estimate_points.cestimate_points()
+		result = est_points.read_estimate_points(estimate_point_file)
+		if not result.success:
+			return result
+
+		if bsort:
+			orig_points.sort_origin_points()
+			est_points.sort_estimate_points()
+			xorig = orig_points.get_sorted_points()
+			xest = est_points.get_sorted_points()
+		else:
+			xorig = orig_points.get_points()
+			xest = est_points.get_points()
+
+		return self.verify(xorig, xest, input_name=estimate_point_file)
+
+
+def main(argv):
+	'''
+	Command-line entry point. Verifies an engine on random inputs and, if they are given,
+	on a pair of MDAT files.
+	'''
+	usage = 'dtw_verifier.py -a <engine> [-f] [-n <num_trials>] [-m <max_points>] [-s <seed>] [-o <origin_point_file> -e <estimate_point_file>]'
+	engine_name = ''
+	buse_fast_path = False
+	num_trials = 100
+	max_points = 40
+	seed = 0
+	origin_point_file = ''
+	estimate_point_file = ''
+	try:
+		opts, args = getopt.getopt(argv, "a:fn:m:s:o:e:h", ["engine=", "fastpath", "trials=", "maxpoints=", "seed=", "origfile=", "estfile=", "help"])
+	except getopt.GetoptError:
+		print(usage)
+		return 2
+
+	for opt, arg in opts:
+		if opt in ("-h", "--help"):
+			print(usage)
+			return 0
+		elif opt in ("-a", "--engine"):
+			engine_name = arg
+		elif opt in ("-f", "--fastpath"):
+			buse_fast_path = True
+		elif opt in ("-n", "--trials"):
+			num_trials = int(arg)
+		elif opt in ("-m", "--maxpoints"):
+			max_points = int(arg)
+		elif opt in ("-s", "--seed"):
+			seed = int(arg)
+		elif opt in ("-o", "--origfile"):
+			origin_point_file = arg
+		elif opt in ("-e", "--estfile"):
+			estimate_point_file = arg
+
+	if not engine_name:
+		print('Registered engines: ' + ', '.join(dtw_aligner.get_alignment_engine_names()))
+		print(usage)
+		return 2
+
+	verifier = cdtw_verifier(engine_name, buse_fast_path=buse_fast_path)
+	xreports = []
+
+	result = verifier.verify_random_inputs(num_trials, max_points, seed)
+	if not result.success:
+		print('Error verifying random inputs. Details: ' + result.message)
+		return 2
+	xreports.extend(result.item)
+
+	if origin_point_file and estimate_point_file:
+		result = verifier.verify_mdat_files(origin_point_file, estimate_point_file)
+		if not result.success:
+			print('Error verifying the MDAT files. Details: ' + result.message)
+			return 2
+		xreports.append(result.item)
+
+	num_failures = 0
+	for report in xreports:
+		if not report.success:
+			num_failures += 1
+			print(report.info_string)
+
+	print('%d of %d inputs matched the reference engine.' % (len(xreports) - num_failures, len(xreports)))
+	if num_failures:
+		return 1
+	return 0
+
+
+if __name__ == "__main__":
+
+	sys.exit(main(sys.argv[1:]))
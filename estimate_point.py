@@ -18,46 +18,41 @@ class cestimate_point(pt.cpoint):
 	cestimate_point is a class derived from the cpoint class. An instance of cestimate_point is used to hold
 	the data for an estimate for an origin point.
 	'''
-	def __init__(self, x, y, name='', index=-1):
+	_name_prefix = 'P'
+	__slots__ = ('_assigned_origin_point', '_xcollapsed_estimate_points')
+
+	def __init__(self, x, y, name='', index=-1, bvalidate=True, point_id=-1):
 		'''
 		Client code must supply the (x, y) coordinate, which is the column and row of origin point 
 		for the text-line segment. The client can optionally supply a name or ID for this point and 
 		its ordering relative to other instances in its parent container.
+		See cpoint for bvalidate and point_id; the name is given without the 'P' prefix, which is added here.
 		'''
-		assert type(x)			is IntType, "x is not an integer: %s" % str(x)
-		assert type(y)			is IntType, "y is not an integer: %s" % str(y)
-		assert type(name)		is StringType, "name is not a string: %s" % name
-		assert type(index)		is IntType, "index is not an integer: %s" % str(index)
+		if bvalidate:
+			assert type(x)			is IntType, "x is not an integer: %s" % str(x)
+			assert type(y)			is IntType, "y is not an integer: %s" % str(y)
+			assert type(name)		is StringType, "name is not a string: %s" % name
+			assert type(index)		is IntType, "index is not an integer: %s" % str(index)
 		
 		# Invoke the base class constructor
-		pt.cpoint.__init__(self, x, y, 'P' + name, index)
-		self._xcandidate_origin_points = []
+		pt.cpoint.__init__(self, x, y, self._name_prefix + name, index, False, point_id)
 		self._assigned_origin_point = None
 
+		# Duplicates of this estimate_point that were collapsed into it before alignment
+		# (see cestimate_points.collapse_duplicate_estimate_points). The list is only created for representatives.
+		self._xcollapsed_estimate_points = None
+
 	def __repr__(self):
 		return repr((self.x, self.y, self.name, self.index))
 	
 	
-	def add_candidate_origin_point(self, origin_point):
-		'''
-		When the backtrace is being analyzed to create the list of origin_points, each with their
-		associated estimate_points, if this estimate_point is assigned to more than one origin_point, 
-		then we will need to make a determination as to which origin_point this estimate_point
-		belongs (it can't belong to multiple origin_points).
-		'''
-		self._xcandidate_origin_points.append(origin_point)
-
-	def get_candidate_origin_points(self):
-		'''
-		'''
-		return self._xcandidate_origin_points
-
 	def set_final_origin_point(self, origin_point):
 		'''
+		Called by the aligner when this estimate_point was paired with multiple origin_points and 
+		has been given to the one with the lowest local_cost.
 		'''
 		try:
 			self._assigned_origin_point = origin_point
-			self._xcandidate_origin_points = []
 		except:
 			smsg = 'Exception thrown in set_final_origin_point. Details: ' + utilsLib.getExceptionDetails()
 			return utilsLib.Result(False,message=smsg, item=None)
@@ -69,13 +64,39 @@ class cestimate_point(pt.cpoint):
 		return self._y
 
 
+	def add_collapsed_estimate_point(self, estimate_point):
+		'''
+		Makes this estimate_point the representative of the specified (duplicate) estimate_point. The
+		duplicates follow their representative, in the order they were added, in the sequence that is
+		aligned; the reference alignment engine aligns them together as one block of columns.
+		'''
+		if self._xcollapsed_estimate_points is None:
+			self._xcollapsed_estimate_points = []
+		self._xcollapsed_estimate_points.append(estimate_point)
+
+	def clear_collapsed_estimate_points(self):
+		'''
+		'''
+		self._xcollapsed_estimate_points = None
+
+	def get_collapsed_estimate_points(self):
+		'''
+		'''
+		if self._xcollapsed_estimate_points is None:
+			return []
+		return self._xcollapsed_estimate_points
+
 	@property
-	def num_candidate_origin_points(self):
+	def weight(self):
 		'''
-		If this list is greater than 1, then it means we have to choose between them and
-		keep only the one with the lowest local_cost value.
+		The number of estimate_points this instance stands for in the alignment (itself plus its collapsed
+		duplicates), i.e. the number of columns of its block (see dtw_aligner.compute_cost).
 		'''
-		return len(self._xcandidate_origin_points)
+		return 1 + len(self.get_collapsed_estimate_points())
+
+	@property
+	def assigned_origin_point(self):
+		return self._assigned_origin_point
 
 
 
@@ -5,65 +5,163 @@ from __future__ import print_function
 __author__ = "MichaelMurdock"
 __date__ = "$Aug 2, 2010 8:34:58 PM$"
 
+import math
+import logging
+
+import numpy as np
+
 import utilsLib
 import text_line as tl
+import point_set as ps
 import estimate_point as ep
 
 
+# add_text_lines collects this many records before it adds them to the point set
+_text_line_chunk_size = 65536
+
 class cestimate_points(object):
 	'''
 	An instance of the cestimate_points list is used to wrap a list of cestimate_point instances.
+	The points are held as columns in a point_set.cpoint_set; the cestimate_point instances are only
+	created when they are first needed (get_points, get_sorted_points or collapse_duplicate_estimate_points).
 	'''
 	def __init__(self):
 		'''
 		stuff
 		'''
-		self._xestimate_points = []
-		self._zestimate_points = {}
+		self._point_set = ps.cpoint_set()
+
+		# The cestimate_point instances are only created if they are needed (see _get_estimate_point_objects)
+		self._xestimate_points = None
+
+		# sort_estimate_points stores the permutation; the sorted list is built from it on demand
+		self._sort_order = None
+		self._xsorted_estimate_points = None
 
+		# The columns given to add_coordinate_columns
+		self._zcoordinate_columns = None
 
-	def read_estimate_points(self, mdat_filename):
+
+	def read_estimate_points(self, mdat_filename, buse_cache=False, cache_dir=''):
 		'''
-		This method uses a ctext_line instance to read the data from an MDAT file. We then copy
-		that data into our internal _xestimate_points list.
+		This method reads the MDAT file in bulk (see text_line.read_text_line_array) and adds its
+		records to our internal point set. With buse_cache the records come from the file's binary
+		sidecar, in cache_dir if one is given.
 		'''
-		text_lines_container = tl.ctext_lines_container()
-		result = text_lines_container.read(mdat_filename)
-		if result.success:
-			result = text_lines_container.get_text_line_data_list()
-			if result.success:
-				xtext_lines = result.item
-			else:
-				return result
+		result = tl.read_text_line_array(mdat_filename, buse_cache, cache_dir)
+		if not result.success:
+			return result
 
-			for text_line_data_instance in xtext_lines:
-				
-				# corigin_point instance from a ctext_line_data instance
-				est_pt = ep.cestimate_point(text_line_data_instance.x,
-										   text_line_data_instance.y,
-										   text_line_data_instance.name,
-										   text_line_data_instance.index)
+		return self.add_text_line_array(result.item)
 
-				self._xestimate_points.append(est_pt)
-				self._zestimate_points[est_pt.name] = est_pt
-		else:
+	def add_text_line_array(self, records):
+		'''
+		Adds the records of the specified structured array (see text_line.text_line_dtype) to our
+		internal point set, column by column.
+		'''
+		result = ps.create_point_set_from_records(records)
+		if not result.success:
 			return result
+		return self._add_point_set(result.item)
+
+	def _add_point_set(self, point_set):
+		'''
+		Private method that appends the specified cpoint_set to ours. If the cestimate_point instances have
+		already been created, those of the new points are created too.
+		'''
+		first_point_id = len(self._point_set)
+		self._point_set.extend(point_set)
+		if self._xestimate_points is not None:
+			xpoint_ids = np.arange(first_point_id, len(self._point_set))
+			self._xestimate_points.extend(self._point_set.create_points(self._create_estimate_point, xpoint_ids))
+		return utilsLib.Result(True, message='', item=None)
+
+	def _create_estimate_point(self, x, y, name, index, point_id):
+		return ep.cestimate_point(x, y, name, index, False, point_id)
+
+	def _get_estimate_point_objects(self):
+		'''
+		Private method that returns the list of all the cestimate_point instances (representatives or not),
+		creating them the first time it is called.
+		'''
+		if self._xestimate_points is None:
+			self._xestimate_points = self._point_set.create_points(self._create_estimate_point)
+		return self._xestimate_points
+
+	def add_coordinate_columns(self, x, y, names=None):
+		'''
+		Adds a cestimate_point instance for each point of the specified x and y columns (see text_line.wrap_coordinate_columns),
+		e.g. the NumPy arrays a detector produced in-process; no MDAT file is involved. The columns are wrapped
+		and validated without a copy and kept for get_coordinate_columns.
+		'''
+		result = tl.wrap_coordinate_columns(x, y, names)
+		if not result.success:
+			return result
+		self._zcoordinate_columns = result.item
+		return self.add_text_line_array(result.item)
+
+	def get_coordinate_columns(self):
+		'''
+		Returns (through a Result object) the pair [x, y] of the columns given to add_coordinate_columns, as
+		NumPy arrays that share their memory; None if the points came from elsewhere.
+		'''
+		if self._zcoordinate_columns is None:
+			return utilsLib.Result(True, message='', item=None)
+		return utilsLib.Result(True, message='', item=[self._zcoordinate_columns['x'], self._zcoordinate_columns['y']])
+
+	def add_text_lines(self, text_lines, source_name=''):
+		'''
+		Adds the specified text_line.ctext_line_records (e.g. from text_line.iter_text_lines) to our internal
+		point set, consuming them one at a time and adding them in chunks of _text_line_chunk_size records.
+		source_name is only used in error messages.
+		'''
+		try:
+			xxcolumns = [[], [], [], []]
+			for record in text_lines:
+				for xcolumn, value in zip(xxcolumns, record):
+					xcolumn.append(value)
+				if len(xxcolumns[0]) >= _text_line_chunk_size:
+					result = ps.create_point_set_from_lists(*xxcolumns)
+					if not result.success:
+						return result
+					self._add_point_set(result.item)
+					xxcolumns = [[], [], [], []]
+			result = ps.create_point_set_from_lists(*xxcolumns)
+			if not result.success:
+				return result
+			self._add_point_set(result.item)
+		except:
+			sMsg = 'Error creating the estimate_points from: ' + source_name + ' ' + utilsLib.getExceptionDetails()
+			return utilsLib.Result(False, message=sMsg, item=None)
 
 		return utilsLib.Result(True,message='', item=None)
 
+	def get_estimate_point(self, name):
+		'''
+		Returns (through a Result object) the cestimate_point with the specified name (with its 'P' prefix, as
+		the name property gives it). The name is looked up in the string table of our point set.
+		'''
+		sprefix = ep.cestimate_point._name_prefix
+		point_id = self._point_set.find_point(name[len(sprefix):]) if name.startswith(sprefix) else -1
+		if point_id < 0:
+			return utilsLib.Result(False, message='No estimate_point named: ' + name, item=None)
+		return utilsLib.Result(True, message='', item=self._get_estimate_point_objects()[point_id])
+
 
 	def sort_estimate_points(self):
 		'''
-		Sorts the list _xestimate_points (which consists of cestimate_point instances) by the estimate_point's y coordinate.
-		The sorted list is stored in the _xsorted_estimate_points list and is accessed with the get_sorted_points method.
+		Sorts the estimate_points by their y coordinate.
+		Only the permutation is computed (see cpoint_set.argsort_y), stored in _sort_order and accessed with the
+		get_sort_order method; the get_sorted_points method builds the sorted list of cestimate_point instances from it.
 		This method returns the Result object indicating success or failure.
 		'''
 		try:
-			self._xsorted_estimate_points = sorted(self._xestimate_points, key=lambda x: x.y, reverse=False)
+			self._sort_order = self._point_set.argsort_y()
+			self._xsorted_estimate_points = None
 			smsg = ''
 			bsuccess = True
 		except:
-			smsg = 'Exception thrown in sort_estimate_points method calling the sorted function. Details: ' + utilsLib.getExceptionDetails()
+			smsg = 'Exception thrown in sort_estimate_points method calling argsort. Details: ' + utilsLib.getExceptionDetails()
 			bsuccess = False
 		return utilsLib.Result(bsuccess,smsg, item=None)
 
@@ -72,26 +170,122 @@ class cestimate_points(object):
 		'''
 		Returns a list of cestimate_point instances.
 		'''
-		return self._xestimate_points
+		return self._get_estimate_point_objects()
 
 	def get_sorted_points(self):
 		'''
 		Returns a list of cestimate_point instances that are sorted (smallest to largest) by the y value
 		'''
+		if self._xsorted_estimate_points is None and self._sort_order is not None:
+			xestimate_points = self.get_points()
+			self._xsorted_estimate_points = [xestimate_points[i] for i in self._sort_order.tolist()]
 		return self._xsorted_estimate_points
 
+	def get_sort_order(self):
+		'''
+		Returns the permutation computed by sort_estimate_points (None if it has not been called).
+		'''
+		return self._sort_order
+
+	def get_point_set(self):
+		'''
+		Returns the cpoint_set holding the columns of the estimate_points (all of them, collapsed or not).
+		'''
+		return self._point_set
+
+	def collapse_duplicate_estimate_points(self, radius=0.0):
+		'''
+		Detectors often emit the same text-line origin several times, and each duplicate costs a full 
+		column in the DTW matrices. This method collapses every run of estimate_points that follow each
+		other in the order they are aligned in (get_sorted_points if sort_estimate_points has been called,
+		get_points otherwise) and lie within radius pixels of the first one of the run (or exactly on it,
+		for a radius of 0) into that first one, which becomes a weighted representative (see
+		cestimate_point.weight). Returns (through a Result object) the number of estimate_points that
+		were collapsed.
+
+		The lists of points are not changed: the duplicates stay in them, right after their representative.
+		The reference alignment engine aligns such a run as a single block of columns (see
+		dtw_aligner.compute_cost), so the stored matrices get one column per representative, while each
+		duplicate is still placed on the path exactly as the full DTW places it. The assignment, and so
+		the scores, are the same as without collapsing. Duplicates that are not next to each other in
+		the order of alignment can not form a block and are left alone.
+		'''
+		if self._sort_order is not None:
+			xestimate_points = self.get_sorted_points()
+		else:
+			xestimate_points = self.get_points()
+
+		for est_pt in xestimate_points:
+			est_pt.clear_collapsed_estimate_points()
+
+		representative = None
+		num_collapsed = 0
+		num_representatives = 0
+		for est_pt in xestimate_points:
+			if representative is not None and \
+			   math.sqrt(math.pow((representative.x - est_pt.x), 2.0) + math.pow((representative.y - est_pt.y), 2.0)) <= radius:
+				representative.add_collapsed_estimate_point(est_pt)
+				num_collapsed += 1
+			else:
+				representative = est_pt
+				num_representatives += 1
+
+		logging.debug('Collapsed %d duplicate estimate_points into %d representatives.' % (num_collapsed, num_representatives))
+		return utilsLib.Result(True, message='', item=num_collapsed)
+
 	def get_info_list(self):
 		'''
 		Returns a list of strings (suitable for printing). Each list element corresponds to a cestimate_points's info_string property
 		'''
 		xInfo = []
-		for op in self._xestimate_points:
+		for op in self._get_estimate_point_objects():
 			xInfo.append(op.info_string)
 		return utilsLib.Result(True,message='', item=xInfo)
 
 
 
 			
+
+def create_estimate_points(text_lines, source_name=''):
+	'''
+	Returns (through a Result object) a cestimate_points instance built from the specified text_line.ctext_line_records,
+	e.g. text_line.iter_text_lines(mdat_filename) to stream an MDAT file without holding its lines twice.
+	'''
+	est_points = cestimate_points()
+	result = est_points.add_text_lines(text_lines, source_name)
+	if not result.success:
+		return result
+	return utilsLib.Result(True, message='', item=est_points)
+
+def create_estimate_points_from_arrays(x, y, names=None):
+	'''
+	Returns (through a Result object) a cestimate_points instance holding the points of the specified x and y columns
+	(see cestimate_points.add_coordinate_columns).
+	'''
+	est_points = cestimate_points()
+	result = est_points.add_coordinate_columns(x, y, names)
+	if not result.success:
+		return result
+	return utilsLib.Result(True, message='', item=est_points)
+
+def iter_estimate_point_pages(mdat_filename):
+	'''
+	Generator that yields the pair (page_id, cestimate_points) for every page of the specified multi-page MDAT file (see
+	text_line.parse_page_text_line_arrays). The file is parsed and grouped by page up front; the cestimate_point
+	instances are only created for one page at a time. Raises IOError if the file cannot be read or parsed.
+	'''
+	result = tl.read_page_text_line_arrays(mdat_filename)
+	if not result.success:
+		raise IOError(result.message)
+
+	for page_id, records in result.item:
+		est_points = cestimate_points()
+		result = est_points.add_text_line_array(records)
+		if not result.success:
+			raise IOError(result.message)
+		yield (page_id, est_points)
+
+
 if __name__ == "__main__":
 
 	dataFile1 = r'C:\tmp1\doc2.mdat'
@@ -0,0 +1,140 @@
+# matrix_viewer.py
+#
+# Renders slices of the matrices written by dtw_aligner.export_matrices. The .npy files are
+# memory-mapped, so only the cells of the requested slice are read from disk.
+from __future__ import print_function
+
+import os
+import sys
+import getopt
+
+import numpy as np
+
+import utilsLib
+
+
+class cmatrix_viewer(object):
+	'''
+	An instance of this class gives access to the matrices that dtw_aligner.export_matrices wrote
+	to a directory (accum_cost, local_cost, prev_row and prev_col).
+	'''
+	matrix_names = ['accum_cost', 'local_cost', 'prev_row', 'prev_col']
+
+	def __init__(self, directory):
+		'''
+		'''
+		self._directory = directory
+		self._zmatrices = {}
+
+	def get_matrix(self, name):
+		'''
+		Returns (through a Result object) the named matrix as a read-only, memory-mapped NumPy array.
+		'''
+		if name not in self.matrix_names:
+			smsg = 'Unknown matrix: %s. Available matrices: %s' % (name, ', '.join(self.matrix_names))
+			return utilsLib.Result(False, message=smsg, item=None)
+
+		if name not in self._zmatrices:
+			filename = os.path.join(self._directory, name + '.npy')
+			try:
+				self._zmatrices[name] = np.load(filename, mmap_mode='r')
+			except:
+				smsg = 'Exception thrown loading %s. Details: %s' % (filename, utilsLib.getExceptionDetails())
+				return utilsLib.Result(False, message=smsg, item=None)
+
+		return utilsLib.Result(True, message='', item=self._zmatrices[name])
+
+	def get_slice(self, name, row_start, row_end, col_start, col_end):
+		'''
+		Returns (through a Result object) the cells [row_start:row_end, col_start:col_end] of the named matrix.
+		'''
+		result = self.get_matrix(name)
+		if not result.success:
+			return result
+		return utilsLib.Result(True, message='', item=np.array(result.item[row_start:row_end, col_start:col_end]))
+
+	def render_slice(self, name, row_start, row_end, col_start, col_end):
+		'''
+		Returns (through a Result object) the cells [row_start:row_end, col_start:col_end] of the named
+		matrix as text, one line per row, in the format print_cost_matrix used.
+		'''
+		result = self.get_slice(name, row_start, row_end, col_start, col_end)
+		if not result.success:
+			return result
+		cells = result.item
+
+		if cells.dtype.kind == 'f':
+			sformat = '%5.2f'
+		else:
+			sformat = '%5d'
+
+		xlines = ['%s [%d:%d, %d:%d]' % (name, row_start, row_start + cells.shape[0], col_start, col_start + cells.shape[1])]
+		for row in range(cells.shape[0]):
+			xlines.append('%5d: ' % (row_start + row) + '\t'.join(sformat % value for value in cells[row].tolist()))
+		return utilsLib.Result(True, message='', item='\n'.join(xlines))
+
+
+def _parse_range(srange, size):
+	'''
+	Parses a start:end range (either end may be left out) into a [start, end] list clipped to size.
+	'''
+	xparts = srange.split(':')
+	start = int(xparts[0]) if xparts[0] else 0
+	end = int(xparts[1]) if len(xparts) > 1 and xparts[1] else size
+	return [max(0, start), min(size, end)]
+
+
+def main(argv):
+	'''
+	Command-line entry point. Prints a slice of one of the exported matrices.
+	'''
+	usage = 'matrix_viewer.py -d <matrix_directory> [-m <accum_cost|local_cost|prev_row|prev_col>] [-r <row_start:row_end>] [-c <col_start:col_end>]'
+	directory = ''
+	name = 'accum_cost'
+	srows = '0:20'
+	scols = '0:20'
+	try:
+		opts, args = getopt.getopt(argv, "d:m:r:c:h", ["dir=", "matrix=", "rows=", "cols=", "help"])
+	except getopt.GetoptError:
+		print(usage)
+		return 2
+
+	for opt, arg in opts:
+		if opt in ("-h", "--help"):
+			print(usage)
+			return 0
+		elif opt in ("-d", "--dir"):
+			directory = arg
+		elif opt in ("-m", "--matrix"):
+			name = arg
+		elif opt in ("-r", "--rows"):
+			srows = arg
+		elif opt in ("-c", "--cols"):
+			scols = arg
+
+	if not directory:
+		print(usage)
+		return 2
+
+	viewer = cmatrix_viewer(directory)
+	result = viewer.get_matrix(name)
+	if not result.success:
+		print(result.message)
+		return 2
+	num_rows, num_cols = result.item.shape
+
+	row_start, row_end = _parse_range(srows, num_rows)
+	col_start, col_end = _parse_range(scols, num_cols)
+	result = viewer.render_slice(name, row_start, row_end, col_start, col_end)
+	if not result.success:
+		print(result.message)
+		return 2
+
+	print('%s is %d x %d' % (name, num_rows, num_cols))
+	print(result.item)
+	return 0
+
+
+if __name__ == "__main__":
+
+	sys.exit(main(sys.argv[1:]))
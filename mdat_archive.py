@@ -0,0 +1,135 @@
+# mdat_archive.py
+#
+# Access to MDAT files stored in zip and tar archives without extracting them. A member of an archive
+# is named by the archive's file name and the member's name joined by '!/', e.g. bundle.zip!/page001.mdat.
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import os
+import zipfile
+import tarfile
+import threading
+
+import utilsLib
+
+
+member_separator = '!/'
+
+_xzip_extensions = ['.zip']
+_xtar_extensions = ['.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz']
+
+# The most recently used archive is kept open, so reading its members one after the other does not
+# read its index again for every member. ZipFile and TarFile objects are not thread safe, hence the lock.
+_archive_lock = threading.Lock()
+_xopen_archive = [None, None, None]      # [archive_filename, mtime, ZipFile or TarFile]
+
+
+def get_archive_type(filename):
+	'''
+	Returns 'zip' or 'tar' if the specified file name has the extension of one of these archives, '' otherwise.
+	'''
+	slower = filename.lower()
+	if any(slower.endswith(extension) for extension in _xzip_extensions):
+		return 'zip'
+	if any(slower.endswith(extension) for extension in _xtar_extensions):
+		return 'tar'
+	return ''
+
+def split_member_path(path):
+	'''
+	Returns the pair [archive_filename, member_name] of the specified archive member path, or [path, '']
+	if it is a plain file name.
+	'''
+	position = path.find(member_separator)
+	if position < 0 or not get_archive_type(path[:position]):
+		return [path, '']
+	return [path[:position], path[position + len(member_separator):]]
+
+def is_member_path(path):
+	return split_member_path(path)[1] != ''
+
+def get_member_path(archive_filename, member_name):
+	return archive_filename + member_separator + member_name
+
+
+def _open_archive(archive_filename):
+	'''
+	Private function that opens the specified archive, or returns the one that is already open. Must be
+	called with _archive_lock held.
+	'''
+	mtime = os.path.getmtime(archive_filename)
+	if _xopen_archive[0] == archive_filename and _xopen_archive[1] == mtime:
+		return _xopen_archive[2]
+
+	if _xopen_archive[2] is not None:
+		_xopen_archive[2].close()
+		_xopen_archive[:] = [None, None, None]
+
+	if get_archive_type(archive_filename) == 'zip':
+		archive = zipfile.ZipFile(archive_filename, 'r')
+	else:
+		archive = tarfile.open(archive_filename, 'r:*')
+	_xopen_archive[:] = [archive_filename, mtime, archive]
+	return archive
+
+def read_member(path):
+	'''
+	Returns (through a Result object) the raw contents of the specified archive member (see split_member_path).
+	'''
+	archive_filename, member_name = split_member_path(path)
+	if not member_name:
+		return utilsLib.Result(False, message='Not an archive member path: ' + path, item=None)
+
+	try:
+		with _archive_lock:
+			archive = _open_archive(archive_filename)
+			if isinstance(archive, zipfile.ZipFile):
+				data = archive.read(member_name)
+			else:
+				f = archive.extractfile(member_name)
+				if f is None:
+					return utilsLib.Result(False, message='Not a regular file: ' + path, item=None)
+				data = f.read()
+	except:
+		smsg = 'Error reading the archive member: ' + path + ' ' + utilsLib.getExceptionDetails()
+		return utilsLib.Result(False, message=smsg, item=None)
+
+	return utilsLib.Result(True, message='', item=data)
+
+def iter_members(archive_filename, suffix='.mdat'):
+	'''
+	Generator that yields the pair [member_name, data] of every file in the specified archive whose name
+	ends with suffix, in archive order. Tar archives (compressed or not) are read as a stream, one member
+	after the other, so only the current member is held in memory. Raises the exceptions of zipfile and
+	tarfile if the archive cannot be read.
+	'''
+	ssuffix = suffix.lower()
+	if get_archive_type(archive_filename) == 'zip':
+		archive = zipfile.ZipFile(archive_filename, 'r')
+		try:
+			for info in archive.infolist():
+				if info.filename.lower().endswith(ssuffix) and not info.filename.endswith('/'):
+					yield [info.filename, archive.read(info)]
+		finally:
+			archive.close()
+	else:
+		archive = tarfile.open(archive_filename, 'r|*')
+		try:
+			for info in archive:
+				if info.isfile() and info.name.lower().endswith(ssuffix):
+					yield [info.name, archive.extractfile(info).read()]
+		finally:
+			archive.close()
+
+
+if __name__ == "__main__":
+
+	import sys
+
+	for archive_filename in sys.argv[1:]:
+		for member_name, data in iter_members(archive_filename):
+			print('%s: %d bytes' % (get_member_path(archive_filename, member_name), len(data)))
+
+	print('Done ...')
@@ -0,0 +1,173 @@
+# mdat_loader.py
+#
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import os
+import sys
+import glob
+import getopt
+import logging
+import collections
+import multiprocessing
+from multiprocessing.pool import ThreadPool, Pool
+
+import utilsLib
+import text_line as tl
+
+
+def _load_mdat_file(task):
+	'''
+	Parses one MDAT file. This is a module function rather than a method so that it can be handed to a
+	process pool. The task is a list: [page_id, mdat_filename, buse_cache, cache_dir]. Returns the list
+	[page_id, mdat_filename, records, smessage]: records is the structured array of text lines (see
+	text_line.read_text_line_array), or None if the file could not be parsed, in which case smessage says why.
+	'''
+	page_id, mdat_filename, buse_cache, cache_dir = task
+	try:
+		result = tl.read_text_line_array(mdat_filename, buse_cache, cache_dir)
+	except:
+		return [page_id, mdat_filename, None, 'Exception thrown parsing %s. Details: %s' % (mdat_filename, utilsLib.getExceptionDetails())]
+	if not result.success:
+		return [page_id, mdat_filename, None, result.message]
+	return [page_id, mdat_filename, result.item, '']
+
+
+def iter_mdat_files(path):
+	'''
+	Generator that yields the pair [page_id, mdat_filename] of every MDAT file in the specified directory
+	(listed with os.scandir where it is available) or matching the specified glob pattern. The page id is
+	the file name without its MDAT extension (see text_line.get_page_id).
+	'''
+	if os.path.isdir(path):
+		if hasattr(os, 'scandir'):
+			xfilenames = (entry.path for entry in os.scandir(path) if entry.is_file() and tl.is_mdat_filename(entry.name))
+		else:
+			xfilenames = (os.path.join(path, name) for name in os.listdir(path) if tl.is_mdat_filename(name))
+	else:
+		xfilenames = glob.iglob(path)
+
+	for mdat_filename in xfilenames:
+		yield [tl.get_page_id(mdat_filename), mdat_filename]
+
+
+def load_mdat_files(path, worker_pool='thread', num_workers=0, max_in_flight=0, buse_cache=False, cache_dir=''):
+	'''
+	Parses every MDAT file of the specified directory or glob pattern (see iter_mdat_files) on a pool of
+	workers: worker_pool is 'none' (one file after the other), 'thread' or 'process', and num_workers of 0
+	lets the pool pick the number of workers. At most max_in_flight files (4 per worker if it is 0) are
+	queued at any time, so the listing of a huge directory is consumed as the workers keep up. buse_cache
+	and cache_dir are passed on to text_line.read_text_line_array.
+
+	A file that cannot be parsed does not stop the load. Returns (through a Result object) the pair
+	[zpages, zerrors]: zpages maps the page id of every parsed file to its structured array of text lines,
+	and zerrors maps the page id of every other file to the reason it failed. If several files have the
+	same page id, none of them is taken: the page id is only in zerrors, with the names of the files (and
+	the reasons any of them failed).
+	'''
+	zpages = {}
+	zerrors = {}
+
+	# The files seen for every page id, and the failures of the individual files
+	zfilenames = {}
+	zfile_errors = {}
+
+	def collect(page_id, mdat_filename, records, smessage):
+		zfilenames.setdefault(page_id, []).append(mdat_filename)
+		if records is None:
+			zfile_errors.setdefault(page_id, []).append('%s: %s' % (mdat_filename, smessage))
+
+		if len(zfilenames[page_id]) > 1:
+			zpages.pop(page_id, None)
+			xmessages = ['Duplicate page id %s in %s' % (page_id, ', '.join(zfilenames[page_id]))]
+			xmessages.extend(zfile_errors.get(page_id, []))
+			smessage = '; '.join(xmessages)
+			records = None
+
+		if records is None:
+			logging.warning('Failed to load page %s: %s' % (page_id, smessage))
+			zerrors[page_id] = smessage
+		else:
+			zpages[page_id] = records
+
+	xtasks = ([page_id, mdat_filename, buse_cache, cache_dir] for page_id, mdat_filename in iter_mdat_files(path))
+
+	if worker_pool == 'none':
+		for task in xtasks:
+			collect(*_load_mdat_file(task))
+	elif worker_pool in ('thread', 'process'):
+		if worker_pool == 'thread':
+			pool = ThreadPool(num_workers or None)
+		else:
+			pool = Pool(num_workers or None)
+		if not max_in_flight:
+			max_in_flight = 4 * (num_workers or multiprocessing.cpu_count())
+
+		try:
+			xin_flight = collections.deque()
+			for task in xtasks:
+				if len(xin_flight) >= max_in_flight:
+					collect(*xin_flight.popleft().get())
+				xin_flight.append(pool.apply_async(_load_mdat_file, (task,)))
+			while xin_flight:
+				collect(*xin_flight.popleft().get())
+		except:
+			smsg = 'Exception thrown loading the MDAT files of %s. Details: %s' % (path, utilsLib.getExceptionDetails())
+			return utilsLib.Result(False, message=smsg, item=None)
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		smsg = 'Unknown worker_pool: %s' % worker_pool
+		return utilsLib.Result(False, message=smsg, item=None)
+
+	logging.debug('Loaded %d pages from %s (%d failed)' % (len(zpages), path, len(zerrors)))
+	return utilsLib.Result(True, message='', item=[zpages, zerrors])
+
+
+def main(argv):
+	'''
+	Command-line entry point. Loads a directory (or glob) of MDAT files and reports what failed.
+	'''
+	usage = 'mdat_loader.py -d <mdat_directory_or_glob> [-p <none|thread|process>] [-w <num_workers>]'
+	path = ''
+	worker_pool = 'thread'
+	num_workers = 0
+	try:
+		opts, args = getopt.getopt(argv, "d:p:w:h", ["dir=", "pool=", "workers=", "help"])
+	except getopt.GetoptError:
+		print(usage)
+		return 2
+
+	for opt, arg in opts:
+		if opt in ("-h", "--help"):
+			print(usage)
+			return 0
+		elif opt in ("-d", "--dir"):
+			path = arg
+		elif opt in ("-p", "--pool"):
+			worker_pool = arg
+		elif opt in ("-w", "--workers"):
+			num_workers = int(arg)
+
+	if not path:
+		print(usage)
+		return 2
+
+	result = load_mdat_files(path, worker_pool, num_workers)
+	if not result.success:
+		print(result.message)
+		return 2
+	zpages, zerrors = result.item
+
+	print('%d pages, %d text lines loaded' % (len(zpages), sum(len(records) for records in zpages.values())))
+	for page_id in sorted(zerrors):
+		print('%s: %s' % (page_id, zerrors[page_id]))
+	return 0 if not zerrors else 1
+
+
+if __name__ == "__main__":
+
+	sys.exit(main(sys.argv[1:]))
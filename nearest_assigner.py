@@ -0,0 +1,129 @@
+# nearest_assigner.py
+#
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import math
+import logging
+
+import numpy as np
+
+import utilsLib
+import assignment as asg
+
+
+class cnearest_assigner(object):
+	'''
+	An instance of the cnearest_assigner class gives a quick, rough score: instead of running the DTW, it
+	assigns each estimate_point to its nearest origin_point (Euclidean distance) and leaves the scoring to
+	ccost_calculator as usual. The origin_points are sorted on y once, and each estimate_point searches
+	outwards from its y position until the vertical distance alone exceeds the best distance found, so a
+	page takes O((N+M) log N) rather than the O(N*M) of the DTW.
+
+	The result is a cassignment attached to the origin_points, just like the one dtw_aligner.post_process_origin_points
+	builds. Each origin_point's local_cost is the distance to its nearest estimate_point (-1.0 if it has none).
+
+	Public Methods:
+		assign()
+		get_assignment()
+	'''
+	def __init__(self, xorigin_points, xestimate_points, bverbose_mode=False):
+		'''
+		'''
+		self._xorigin_points = xorigin_points
+		self._xestimate_points = xestimate_points
+		self._bverbose_mode = bverbose_mode
+		self._assignment = None
+
+	def assign(self):
+		'''
+		Assigns every estimate_point to its nearest origin_point and attaches the resulting cassignment to
+		the origin_points. On a tie the origin_point found first wins. Returns (through a Result object) the cassignment.
+		'''
+		num_rows = len(self._xorigin_points)
+		num_cols = len(self._xestimate_points)
+		final_rows = np.empty(num_cols, dtype=np.intp)
+		final_rows.fill(-1)
+		local_costs = np.empty(num_rows)
+		local_costs.fill(-1.0)
+
+		if num_rows:
+			ox = np.array([orig_pt.x for orig_pt in self._xorigin_points], dtype=np.float64)
+			oy = np.array([orig_pt.y for orig_pt in self._xorigin_points], dtype=np.float64)
+			order = np.argsort(oy, kind='mergesort')
+			xsorted_x = ox[order].tolist()
+			xsorted_y = oy[order].tolist()
+			xorder = order.tolist()
+
+			ex = [est_pt.x for est_pt in self._xestimate_points]
+			ey = [est_pt.y for est_pt in self._xestimate_points]
+			xstarts = np.searchsorted(oy[order], np.array(ey, dtype=np.float64)).tolist()
+
+			for col in range(num_cols):
+				x = ex[col]
+				y = ey[col]
+				best_distance = float('inf')
+				best_position = -1
+
+				# Sweep upwards (smaller y) and downwards from the estimate_point's position in the sorted origin_points
+				position = xstarts[col] - 1
+				while position >= 0 and y - xsorted_y[position] < best_distance:
+					distance = math.hypot(xsorted_x[position] - x, xsorted_y[position] - y)
+					if distance < best_distance:
+						best_distance = distance
+						best_position = position
+					position -= 1
+				position = xstarts[col]
+				while position < num_rows and xsorted_y[position] - y < best_distance:
+					distance = math.hypot(xsorted_x[position] - x, xsorted_y[position] - y)
+					if distance < best_distance:
+						best_distance = distance
+						best_position = position
+					position += 1
+
+				row = xorder[best_position]
+				final_rows[col] = row
+				if local_costs[row] < 0 or best_distance < local_costs[row]:
+					local_costs[row] = best_distance
+
+		if self._bverbose_mode:
+			logging.debug('Nearest assignment: %d estimate_points, %d origin_points without any' % (num_cols, np.count_nonzero(local_costs < 0)))
+
+		for row in range(num_rows):
+			self._xorigin_points[row].local_cost = float(local_costs[row])
+
+		result = asg.create_assignment_from_rows(self._xestimate_points, final_rows, num_rows)
+		if not result.success:
+			return result
+		self._assignment = result.item
+		self._assignment.attach(self._xorigin_points)
+
+		return utilsLib.Result(True, message='', item=self._assignment)
+
+	def get_assignment(self):
+		'''
+		Returns (through a Result object) the cassignment built by assign.
+		'''
+		return utilsLib.Result(True, message='', item=self._assignment)
+
+
+if __name__ == "__main__":
+
+	import origin_point as op
+	import estimate_point as ep
+
+	xorig = [op.corigin_point(100, 50*i, str(i), i) for i in range(5)]
+	xest = [ep.cestimate_point(102, 1, '0', 0), ep.cestimate_point(98, 52, '1', 1), ep.cestimate_point(101, 99, '2a', 2),
+			ep.cestimate_point(104, 103, '2b', 3), ep.cestimate_point(100, 148, '3', 4)]
+
+	assigner = cnearest_assigner(xorig, xest)
+	result = assigner.assign()
+	if result.success:
+		for orig_pt in xorig:
+			print('%s (local_cost: %5.2f)' % (orig_pt.get_estimate_points_string(), orig_pt.local_cost))
+	else:
+		print(result.message)
+
+	print('Done ...')
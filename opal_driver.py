@@ -2,8 +2,10 @@
 #
 from __future__ import print_function
 
+import os
 import math
 import sys
+import zlib
 import getopt
 import logging
 
@@ -15,7 +17,203 @@ import config_reader as config
 import utilsLib
 import cost_info as ci
 import dtw_aligner
+import dtw_verifier
+import alignment_diagnostics
+import page_layout
+import bipartite_assigner
+import nearest_assigner
 import cost_calculator as cc
+import distance_metrics as dm
+
+
+def align_points(reader, xorig_points, xest_points, estimate_point_file, metric):
+	'''
+	Runs the DTW alignment engine selected in the config file on the (sorted) origin_point and 
+	estimate_point sequences, with the specified cdistance_metric instance, up to and including 
+	post_process_origin_points. Afterwards each origin_point reads its estimate_points from the 
+	aligner's cassignment. Returns (through a Result object) the aligner instance.
+	'''
+	try:
+		bprint_to_screen = True
+		result = dtw_aligner.create_aligner(reader.alignment_engine, xorig_points, xest_points, reader.verbose_mode, bprint_to_screen, metric)
+		if not result.success:
+			return utilsLib.Result(False, message='Error returned from dtw_aligner.create_aligner(). Details: ' + result.message, item=None)
+		aligner = result.item
+	except:
+		return utilsLib.Result(False, message='Exception thrown in dtw_aligner constructor. Details: ' + utilsLib.getExceptionDetails(), item=None)
+
+	# If it's turned on in the config.ini file, check the selected engine against the reference engine on this input
+	if reader.verify_alignment_engine and reader.alignment_engine != dtw_aligner.dtw_aligner.engine_name:
+		verifier = dtw_verifier.cdtw_verifier(reader.alignment_engine, bverbose_mode=reader.verbose_mode, metric=metric)
+		result = verifier.verify(xorig_points, xest_points, input_name=estimate_point_file)
+		if not result.success:
+			logging.error('Error returned from dtw_verifier.verify(). Details: ' + result.message)
+		elif not result.item.success:
+			logging.warning('Alignment engine verification failed: ' + result.item.info_string)
+		
+
+	# If it's turned on in the config.ini file, check whether this page can be aligned without the full DTW.
+	# When the fast path is taken the matrix and compute_cost calls below return immediately.
+	if reader.diagonal_fast_path:
+		result = aligner.try_diagonal_fast_path()
+		if not result.success:
+			return utilsLib.Result(False, message='Error returned from aligner.try_diagonal_fast_path(). Details: ' + result.message, item=None)
+
+	try:
+		result = aligner.create_empty_cost_matrix()
+		if not result.success:
+			logging.error('Error returned from aligner.create_empty_cost_matrix(). Details: ' + result.message)
+	except:
+		return utilsLib.Result(False, message='Exception thrown in dtw_aligner.create_empty_cost_matrix method. Details: ' + utilsLib.getExceptionDetails(), item=None)
+
+	try:
+		result = aligner.create_empty_cost_info_matrix()
+		if not result.success:
+			return utilsLib.Result(False, message='Error returned from aligner.create_empty_choices_matrix(). Details: ' + result.message, item=None)
+	except:
+		return utilsLib.Result(False, message='Exception thrown in dtw_aligner.create_empty_choices_matrix method. Details: ' + utilsLib.getExceptionDetails(), item=None)
+		
+
+	# Compute the cost matrix
+	result = aligner.compute_cost()
+	if not result.success:
+		return utilsLib.Result(False, message='Error returned from aligner.compute_cost(). Details: ' + result.message, item=None)
+
+	# If it's turned on in the config.ini file, the matrices are written as binary files (see matrix_viewer)
+	# rather than printed cell by cell
+	if reader.export_matrices and not aligner.diagonal_fast_path and not aligner.column_blocks:
+		smatrix_dir = reader.matrix_export_dir or os.path.dirname(reader.results_filename)
+		smatrix_dir = os.path.join(smatrix_dir, os.path.splitext(os.path.basename(estimate_point_file))[0] + '_matrices')
+		result = aligner.export_matrices(smatrix_dir)
+		if not result.success:
+			logging.error('Error returned from aligner.export_matrices(). Details: ' + result.message)
+		else:
+			logging.debug('Matrices written to ' + smatrix_dir)
+
+	if reader.verbose_mode:
+		fCost = aligner.get_global_cost()
+		logging.debug("\n\nGlobal Cost: " + str(fCost))
+		if not reader.export_matrices:
+			aligner.print_cost_matrix()
+			aligner.print_cost_info_matrix()
+
+	# Compute the minimum-cost path back through the cost matrix
+	result = aligner.get_backtrace()
+	if not result.success:
+		return utilsLib.Result(False, message='Error returned from aligner.get_backtrace(). Details: ' + result.message, item=None)
+	path_rows, path_cols, path_local_costs = result.item
+
+	# If it's turned on in the config.ini file, write a bounded set of the distances between the points of 
+	# the two sequences to a binary sidecar file (see alignment_diagnostics)
+	if reader.diagnostics_mode != 'off':
+		diagnostics = alignment_diagnostics.calignment_diagnostics(reader.diagnostics_mode, reader.diagnostics_sample_rate,
+																	reader.diagnostics_top_k, reader.diagnostics_path_band)
+		result = diagnostics.collect(xorig_points, xest_points, metric, path_rows, path_cols)
+		if result.success:
+			sdiagnostics_dir = reader.diagnostics_dir or os.path.dirname(reader.results_filename)
+			sdiagnostics_file = os.path.join(sdiagnostics_dir, os.path.splitext(os.path.basename(estimate_point_file))[0] + '.diag.npy')
+			result = diagnostics.write(sdiagnostics_file, result.item)
+		if not result.success:
+			logging.error('Error writing the alignment diagnostics. Details: ' + result.message)
+	
+	# Process the backtrace to associate estimate_points with origin_points
+	result = aligner.process_backtrace()
+	if result.success:
+		result = aligner.post_process_origin_points()
+		if not result.success:
+			return utilsLib.Result(False, message='Error returned from aligner.post_process_origin_points(). Details: ' + result.message, item=None)
+
+	return utilsLib.Result(True, message='', item=aligner)
+
+
+def is_page_sampled(page_name, sample_rate):
+	'''
+	Returns True if the page with the specified name belongs to the given fraction of pages. The choice
+	depends only on the name, so reruns check the same pages.
+	'''
+	if sample_rate <= 0.0:
+		return False
+	return (zlib.crc32(page_name.encode('utf-8')) & 0xffffffff) % 10000 < sample_rate * 10000
+
+
+def assign_points(reader, method, xorig_points, xest_points, est_points, estimate_point_file):
+	'''
+	Assigns the estimate_points to the origin_points with the specified method: 'dtw' (the alignment 
+	engine selected in the config file), 'bipartite' (see bipartite_assigner) or 'nearest' (see 
+	nearest_assigner). If it's turned on in the config file the page is first split into columns, in 
+	which case the points come back in column order. Returns (through a Result object) a list: 
+	[origin_points, column offsets], where the column offsets are None unless the page was split.
+	'''
+	xcolumn_offsets = None
+	if method == 'dtw':
+		result = dm.create_distance_metric(reader.distance_metric, reader.metric_x_weight, reader.metric_y_weight)
+		if not result.success:
+			return result
+		metric = result.item
+
+	if method == 'dtw' and reader.split_columns:
+		# Each column is aligned on its own
+		layout = page_layout.cpage_layout(reader.num_columns, reader.min_column_gap, reader.verbose_mode)
+		result = layout.align_columns(xorig_points, xest_points, reader.alignment_engine, reader.diagonal_fast_path,
+									  reader.worker_pool, reader.num_workers, metric)
+		if not result.success:
+			return utilsLib.Result(False, message='Error returned from layout.align_columns(). Details: ' + result.message, item=None)
+		xorig_points, xest_points, xcolumn_offsets = result.item
+		logging.debug('Page split into %d columns' % (len(xcolumn_offsets) - 1))
+
+	elif method == 'dtw':
+		result = align_points(reader, xorig_points, xest_points, estimate_point_file, metric)
+		if not result.success:
+			return result
+
+	elif method in ('bipartite', 'nearest'):
+		# These methods do not use the order of the points. Splitting the page into columns only keeps 
+		# the line heights of the origin_points within a column.
+		if reader.split_columns:
+			layout = page_layout.cpage_layout(reader.num_columns, reader.min_column_gap, reader.verbose_mode)
+			result = layout.split_page(xorig_points, xest_points)
+			if not result.success:
+				return utilsLib.Result(False, message='Error returned from layout.split_page(). Details: ' + result.message, item=None)
+			xorig_points, xest_points, xcolumn_offsets, xestimate_offsets = result.item
+
+		if method == 'bipartite':
+			assigner = bipartite_assigner.cbipartite_assigner(xorig_points, xest_points, reader.region_parameters,
+															  reader.verbose_mode, xcolumn_offsets)
+		else:
+			assigner = nearest_assigner.cnearest_assigner(xorig_points, xest_points, reader.verbose_mode)
+		result = assigner.assign()
+		if not result.success:
+			return utilsLib.Result(False, message='Error returned from assigner.assign(). Details: ' + result.message, item=None)
+
+	else:
+		return utilsLib.Result(False, message='Unknown alignment method: ' + method, item=None)
+
+	return utilsLib.Result(True, message='', item=[xorig_points, xcolumn_offsets])
+
+
+def score_points(reader, xorig_points, xcolumn_offsets):
+	'''
+	Scores the assigned origin_points with a ccost_calculator. Returns (through a Result object) the total cost.
+	'''
+	# Create the cost_calculator with our aligned and processed list of origin_points
+	try:
+		cost_calculator = cc.ccost_calculator(xorig_points, reader.error_parameters, reader.region_parameters, reader.verbose_mode, xcolumn_offsets)
+	except:
+		return utilsLib.Result(False, message='Exception thrown in cost_calculator constructor. Details: ' + utilsLib.getExceptionDetails(), item=None)
+
+	result = cost_calculator.create_regions_for_origin_points()
+	if not result.success:
+		return utilsLib.Result(False, message='Error returned from cost_calculator.create_regions_for_origin_points(). Details: ' + result.message, item=None)
+
+	result = cost_calculator.calculate_costs_for_origin_points()
+	if not result.success:
+		return utilsLib.Result(False, message='Error returned from cost_calculator.calculate_costs_for_origin_points(). Details: ' + result.message, item=None)
+
+	result = cost_calculator.aggregate_costs_for_origin_points()
+	if not result.success:
+		return utilsLib.Result(False, message='Error returned from cost_calculator.aggregate_costs_for_origin_points(). Details: ' + result.message, item=None)
+
+	return result
 
 
 def main(argv):
@@ -82,7 +280,7 @@ def main(argv):
 
 	# Origin Points (ground truth) are loaded from an MDAT file
 	orig_points = origin_points.corigin_points(reader.verbose_mode)
-	read_result = orig_points.read_origin_points(origin_point_file)
+	read_result = orig_points.read_origin_points(origin_point_file, reader.mdat_cache, reader.mdat_cache_dir)
 	if read_result.success:
 		
 		# If it's turned on in the config.ini file, sort the OPs on their y coordinates
@@ -111,9 +309,9 @@ def main(argv):
 
 	# Estimate Points are loaded from an MDAT file
 	est_points = estimate_points.cestimate_points()
-	read_result = est_points.read_estimate_points(estimate_point_file)
+	read_result = est_points.read_estimate_points(estimate_point_file, reader.mdat_cache, reader.mdat_cache_dir)
 	if read_result.success:
-		
+
 		# If it's turned on in the config.ini file, sort the EPs on their y coordinates
 		if reader.sort_estimate_points:
 			result = est_points.sort_estimate_points()
@@ -126,6 +324,14 @@ def main(argv):
 		else:
 			# Get the _non-sorted_ EP sequence to pass into the dtw_aligner
 			xest_points = est_points.get_points()
+
+		# If it's turned on in the config.ini file, collapse runs of duplicate EPs (in the order they are
+		# aligned in) into weighted representatives, so the DTW aligns each run as one block of columns
+		if reader.collapse_duplicate_estimate_points:
+			result = est_points.collapse_duplicate_estimate_points(reader.duplicate_estimate_point_radius)
+			if not result.success:
+				logging.error('Error in collapse_duplicate_estimate_points(). Details: ' + result.message)
+				sys.exit(2)
 			
 		if reader.verbose_mode:
 			if reader.sort_estimate_points:
@@ -137,109 +343,50 @@ def main(argv):
 		sys.exit(2)
 
 
-	try:
-		bprint_to_screen = True
-		aligner = dtw_aligner.dtw_aligner(xorig_points, xest_points, reader.verbose_mode, bprint_to_screen)
-	except:
-		logging.error('Exception thrown in dtw_aligner constructor. Details: ' + utilsLib.getExceptionDetails())
-		sys.exit(2)
-		
-
-	# Look at distances between points in the two sequences
-	if reader.verbose_mode:
-		for iRow in xrange(0, len(aligner._Q)):
-			logging.debug('\nRow: ' + str(iRow))
-			for iCol in xrange(0, len(aligner._P)):
-				p1 = aligner._Q[iRow]
-				p2 = aligner._P[iCol]
-				d = aligner._distance(p1, p2)
-				logging.debug('Distance between (%d, %d) and (%d, %d): %f' % (p1.x, p1.y, p2.x, p2.y, d))
-
-	try:
-		result = aligner.create_empty_cost_matrix()
-		if not result.success:
-			logging.error('Error returned from aligner.create_empty_cost_matrix(). Details: ' + result.message)
-	except:
-		logging.error('Exception thrown in dtw_aligner.create_empty_cost_matrix method. Details: ' + utilsLib.getExceptionDetails())
-		sys.exit(2)
-
-	try:
-		result = aligner.create_empty_cost_info_matrix()
-		if not result.success:
-			logging.error('Error returned from aligner.create_empty_choices_matrix(). Details: ' + result.message)
-			sys.exit(2)
-	except:
-		logging.error('Exception thrown in dtw_aligner.create_empty_choices_matrix method. Details: ' + utilsLib.getExceptionDetails())
-		sys.exit(2)
-		
-
-	# Compute the cost matrix
-	result = aligner.compute_cost()
+	# Align the estimate_points with the origin_points with the method given in the config.ini file
+	result = assign_points(reader, reader.alignment_method, xorig_points, xest_points, est_points, estimate_point_file)
 	if not result.success:
-		logging.error('Error returned from aligner.compute_cost(). Details: ' + result.message)
+		logging.error(result.message)
 		sys.exit(2)
+	xassigned_orig_points, xcolumn_offsets = result.item
 
-	if reader.verbose_mode:
-		fCost = aligner.get_global_cost()
-		logging.debug("\n\nGlobal Cost: " + str(fCost))
-		aligner.print_cost_matrix()
-		aligner.print_cost_info_matrix()
-
-	# Compute the minimum-cost path back through the cost matrix
-	result = aligner.get_backtrace()
-	if not result.success:
-		logging.error('Error returned from aligner.get_backtrace(). Details: ' + result.message)
-		sys.exit(2)
-	
-	# Process the backtrace to associate estimate_points with origin_points
-	result = aligner.process_backtrace()
-	if result.success:
-		result = aligner.post_process_origin_points()
-		if not result.success:
-			logging.error('Error returned from aligner.post_process_origin_points(). Details: ' + result.message)
-			return
-	
-	# We now have a list of origin_points that each have their _zestimate_points dictionary populated.
+	# We now have a list of origin_points that each read their estimate_points from the assignment.
 	# If there are multiple entries, all but one is a false alarm.
 	# If there are no entries we have a miss.
 	# We now need to tell each origin_point to score itself.
-
-	
 	logging.debug('\n\nestimate_points (P) associated with each origin_point (Q):\n')
-	for op in xorig_points:
+	for op in xassigned_orig_points:
 		logging.debug(op.get_estimate_points_string())
-	
-		
-	# Create the cost_calculator with our dtw-algigned and processed list of origin_points
-	try:
-		cost_calculator = cc.ccost_calculator(xorig_points, reader.error_parameters, reader.region_parameters, reader.verbose_mode)
-	except:
-		logging.error('Exception thrown in cost_calculator constructor. Details: ' + utilsLib.getExceptionDetails())
-		return
 
-	result = cost_calculator.create_regions_for_origin_points()
+	result = score_points(reader, xassigned_orig_points, xcolumn_offsets)
 	if not result.success:
-		logging.error('Error returned from cost_calculator.create_regions_for_origin_points(). Details: ' + result.message)
+		logging.error(result.message)
+		f = open(reader.results_filename, 'a')
+		f.write('Estimates: %s -- Error processing this estimates file. Details: %s\n' % (estimate_point_file, result.message))
+		f.close()
 		return
+	total_cost = result.item
+	logging.debug('Total cost: %5.2f' % (total_cost))
+	sresult = 'Estimates: %s -- Total Calculated Cost: %5.2f' % (estimate_point_file, total_cost)
 
+	# In the quick-score mode, if it's turned on in the config.ini file, a sample of the pages is also
+	# scored with the exact DTW alignment so that the deviation of the quick score can be reported
+	if reader.alignment_method == 'nearest' and is_page_sampled(estimate_point_file, reader.nearest_check_rate):
+		result = assign_points(reader, 'dtw', xorig_points, xest_points, est_points, estimate_point_file)
+		if result.success:
+			result = score_points(reader, result.item[0], result.item[1])
+		if result.success:
+			exact_cost = result.item
+			logging.debug('Exact (dtw) cost: %5.2f, deviation of the quick score: %+5.2f' % (exact_cost, total_cost - exact_cost))
+			sresult += ' -- Exact Cost: %5.2f -- Deviation: %+5.2f' % (exact_cost, total_cost - exact_cost)
+		else:
+			logging.error('Error computing the exact cost for the quick-score check. Details: ' + result.message)
 
 	f = open(reader.results_filename, 'a')
-	
+	f.write(sresult)
+	f.close()
 
-	result = cost_calculator.calculate_costs_for_origin_points()
-	if result.success:
-		result = cost_calculator.aggregate_costs_for_origin_points()
-		if result.success:
-			total_cost = result.item
-			logging.debug('Total cost: %5.2f' % (total_cost))
-			f.write('Estimates: %s -- Total Calculated Cost: %5.2f' % (estimate_point_file, total_cost))
-			f.close()
-		else:
-			logging.debug('Error returned from cost_calculator.aggregate_costs_for_origin_points. Details: ' + result.message)
-			f.write('Estimates: %s -- Error processing this estimates file. Details: %s\n' % (result.message))
-			f.close()
 
-			
 if __name__ == "__main__":
 	
 	main(sys.argv[1:])
@@ -11,39 +11,51 @@ import sys
 from types import *
 
 import logging
+import numpy as np
+
 import point as pt
 import estimate_point as ep
 import utilsLib
 import region_parameters as rp
 import region
 import origin_point_costs as opc
+import assignment as asg
 
 class corigin_point(pt.cpoint):
 	'''
 	corigin_point is a class derived from the cpoint class. An instance of corigin_point is used to hold
 	the data for a ground-truth origin point.
 	'''
+	_name_prefix = 'Q'
+	__slots__ = ('_bverbose_mode', '_local_cost', '_assignment', '_assignment_row', '_origin_point_costs',
+				 '_region_parameters', '_error_parameters', '_region', '_top_neighbor_y', '_top_neighbor_vertical_distance',
+				 '_bottom_neighbor_y', '_bottom_neighbor_vertical_distance')
 
 
-	def __init__(self, x, y, name='', index=-1):
+	def __init__(self, x, y, name='', index=-1, bvalidate=True, point_id=-1):
 		'''
 		Client code must supply the (x, y) coordinate, which is the column and row of origin point 
 		for the text-line segment. The client can optionally supply a name or ID for this point and 
 		its ordering relative to other instances in its parent container.
+		See cpoint for bvalidate and point_id; the name is given without the 'Q' prefix, which is added here.
 		'''
-		assert type(x)			is IntType, "x is not an integer: %s" % str(x)
-		assert type(y)			is IntType, "y is not an integer: %s" % str(y)
-		assert type(name)		is StringType, "name is not a string: %s" % name
-		assert type(index)		is IntType, "index is not an integer: %s" % str(index)
+		if bvalidate:
+			assert type(x)			is IntType, "x is not an integer: %s" % str(x)
+			assert type(y)			is IntType, "y is not an integer: %s" % str(y)
+			assert type(name)		is StringType, "name is not a string: %s" % name
+			assert type(index)		is IntType, "index is not an integer: %s" % str(index)
 		
 		# Invoke the base class constructor
-		pt.cpoint.__init__(self, x, y, 'Q'+ name, index)
+		pt.cpoint.__init__(self, x, y, self._name_prefix + name, index, False, point_id)
 
 
 		# Fields:
 		self._bverbose_mode = False
 		self._local_cost = -1.0
-		self._zestimate_points = {}
+
+		# The estimate_points of this origin_point are row _assignment_row of the (shared) cassignment
+		self._assignment = None
+		self._assignment_row = -1
 
 		self._origin_point_costs = None
 		self._region_parameters = None
@@ -75,7 +87,7 @@ class corigin_point(pt.cpoint):
 
 	@property
 	def alignment_string(self):
-		return self.name + ' Local cost: ' + self.local_cost + ' Num estimate_points: ' + len(self._zestimate_points)
+		return self.name + ' Local cost: ' + str(self.local_cost) + ' Num estimate_points: ' + str(self.num_estimate_points)
 
 	def set_top_neighbor_y(self, top_neighbor_y):
 		if top_neighbor_y:
@@ -105,9 +117,8 @@ class corigin_point(pt.cpoint):
 			smsg = 'Exception thrown calling the cregion constructor. Details. ' + utilsLib.getExceptionDetails()
 			return utilsLib.Result(False, message=smsg, item=None)
 
-		# create a cpoint instance and use it to call the set_center_point method
-		center_point = pt.cpoint(self.x, self.y, self.name, self.index)
-		self._region.set_center_point(center_point)
+		# This origin_point is the center point of its region (the region only reads its x and y)
+		self._region.set_center_point(self)
 		return utilsLib.Result(True, '', None)
 
 
@@ -116,16 +127,13 @@ class corigin_point(pt.cpoint):
 		Calculates the costs associated with this origin_point, which are saved in the origin_point_costs instance.
 		'''
 		if self._bverbose_mode:
-			logging.debug('+++++++Calculating costs for origin_point %s at (%d, %d) with %d estimate_points.' % (self.name, self.x, self.y, len(self._zestimate_points.keys())))
+			logging.debug('+++++++Calculating costs for origin_point %s at (%d, %d) with %d estimate_points.' % (self.name, self.x, self.y, self.num_estimate_points))
 
 		# Create the object that will hold the values for the various costs
 		self._origin_point_costs = opc.corigin_point_costs(self._error_parameters)
 
-		# Create list of estimate_points from our dictionary
-		xestimate_points = []
-		for key in self._zestimate_points.keys():
-			ep = self._zestimate_points[key]
-			xestimate_points.append(ep)
+		# Our estimate_points, read through a view of the assignment
+		xestimate_points = self.get_estimate_points()
 
 		# 1. Is there an estimate_point for this origin_point? Save away the number
 		num_estimate_points = len(xestimate_points)
@@ -221,40 +229,72 @@ class corigin_point(pt.cpoint):
 			return utilsLib.Result(False, smsg, item=None)
 
 
+	def set_assignment(self, assignment, row):
+		'''
+		Tells this origin_point that its estimate_points are the ones in the specified row of the cassignment instance.
+		'''
+		self._assignment = assignment
+		self._assignment_row = row
+
+	@property
+	def assignment(self):
+		return self._assignment
+
+	@property
+	def assignment_row(self):
+		return self._assignment_row
+
+	@property
+	def num_estimate_points(self):
+		if self._assignment is None:
+			return 0
+		return self._assignment.num_estimate_points(self._assignment_row)
+
 	def add_estimate_point(self, estimate_point):
 		'''
 		This origin_point can have multiple estimate_points assigned to it. The closest one
 		is the one we use to compute the region cost and the rest are considered (and scored
 		as) false alarms.
+
+		The aligner assigns estimate_points to all of the origin_points at once through a cassignment;
+		this method (and remove_estimate_point) gives this origin_point an assignment of its own.
 		'''
-		self._zestimate_points[estimate_point.name] = estimate_point
+		xestimate_points = list(self.get_estimate_points())
+		if estimate_point not in xestimate_points:
+			xestimate_points.append(estimate_point)
+		return self.set_estimate_points(xestimate_points)
 
-	def remove_estimate_point(self, estimate_point):
+	def set_estimate_points(self, xestimate_points):
 		'''
-		Removes the specified estimate_point from the dictionary of points associated with this origin_point.
+		Replaces the estimate_points associated with this origin_point with those in the specified list.
 		'''
-		key = estimate_point.name
-		try:
-			if self._zestimate_points.has_key(key):
-				del self._zestimate_points[key]
-		except:
-			smsg = 'Exception thrown trying to remove the estimate_point with the following name: ' + estimate_point.name + ' Details: ' + utilsLib.getExceptionDetails()
-			return utilsLib.Result(False,message=smsg, item=None)
+		result = asg.create_assignment_from_lists([xestimate_points])
+		if result.success:
+			self.set_assignment(result.item, 0)
+		return result
 
-		return utilsLib.Result(True,message='', item=None)
+	def remove_estimate_point(self, estimate_point):
+		'''
+		Removes the specified estimate_point from the estimate_points associated with this origin_point.
+		'''
+		xestimate_points = [ep for ep in self.get_estimate_points() if ep is not estimate_point]
+		return self.set_estimate_points(xestimate_points)
 
 	def get_estimate_points(self):
 		'''
+		Returns a cassigned_estimate_points view (which can be iterated, indexed and measured with len) 
+		of the estimate_points associated with this origin_point.
 		'''
-		return self._zestimate_points
+		if self._assignment is None:
+			return asg.cassigned_estimate_points([], np.empty(0, dtype=np.intp))
+		return self._assignment.get_estimate_points(self._assignment_row)
 
 	def get_estimate_points_string(self):
 		'''
 		Returns a string representation of the estimate_points associated with this origin_point.
 		'''
 		ep_string = 'origin_point ' + self.name + ': '
-		for key in self._zestimate_points.keys():
-			ep = self._zestimate_points[key]
+		for ep in self.get_estimate_points():
 			ep_string += ' ' + ep.name + ' '
 		return ep_string
 
@@ -17,6 +17,9 @@ class corigin_point_costs(object):
 		R1-Hit: An estimate_point that is inside R1
 		R2-Hit: An estimate_point that is inside R2 (but outisde R1)
 	'''
+	__slots__ = ('_error_params', '_bdetection_failure', '_num_estimate_points', '_num_r1_hits', '_xr2_hit_distances',
+				 '_xmiss_distances', '_num_r3_hits')
+
 	def __init__(self, error_params):
 		'''
 		'''
@@ -36,7 +39,8 @@ class corigin_point_costs(object):
 
 		# Values are added to this list by calling register_r2_hit().
 		# The length of this list is used to compute the value returned from the num_r2_hits property.
-		# get_cost uses the zero'th value as the value passed into the _calculate_r2_cost method.
+		# get_cost uses the smallest value (the closest estimate_point) as the value passed into the _calculate_r2_cost
+		# method, so the cost does not depend on the order the values are registered in.
 		self._xr2_hit_distances = []
 
 		# Values are added to this list by calling register_proximity_miss()
@@ -172,9 +176,9 @@ class corigin_point_costs(object):
 				cost = false_positive_cost
 				return utilsLib.Result(True, '', item=cost)
 
-			# If we have at least one R2-Hit, then its cost depends on the distance and all the rest are false positives
+			# If we have at least one R2-Hit, then the cost of the closest one depends on the distance and all the rest are false positives
 			if self.num_r2_hits >= 1:
-				distance = self._xr2_hit_distances[0]
+				distance = min(self._xr2_hit_distances)
 				cost = self._calculate_r2_cost(distance)
 				cost += false_positive_cost
 				return utilsLib.Result(True, '', item=cost)
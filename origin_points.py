@@ -5,67 +5,154 @@ from __future__ import print_function
 __author__ = "MichaelMurdock"
 __date__ = "$Aug 2, 2010 8:34:58 PM$"
 
+import numpy as np
+
 import utilsLib
 import text_line as tl
+import point_set as ps
 import origin_point as op
 import region
 import region_parameters as rp
 
+# add_text_lines collects this many records before it adds them to the point set
+_text_line_chunk_size = 65536
+
 class corigin_points(object):
 	'''
 	An instance of the corigin_points list is used to wrap a list of corigin_point instances.
+	The points are held as columns in a point_set.cpoint_set; the corigin_point instances are only
+	created when get_points or get_sorted_points is first called.
 	'''
 	def __init__(self, verbose_mode):
 		'''
 		stuff
 		'''
 		self._verbose_mode = verbose_mode
-		self._xorigin_points = []
-		self._zorigin_points = {}
+		self._point_set = ps.cpoint_set()
+
+		# The corigin_point instances are only created if get_points is called
+		self._xorigin_points = None
+
+		# sort_origin_points stores the permutation; the sorted list is built from it on demand
+		self._sort_order = None
+		self._xsorted_origin_points = None
 
-	def read_origin_points(self, mdat_filename):
+		# The columns given to add_coordinate_columns
+		self._zcoordinate_columns = None
+
+	def read_origin_points(self, mdat_filename, buse_cache=False, cache_dir=''):
 		'''
-		This method uses a ctext_line instance to read the data from an MDAT file. We then copy
-		that data into our internal _xorigin_points list.
+		This method reads the MDAT file in bulk (see text_line.read_text_line_array) and adds its
+		records to our internal point set. With buse_cache the records come from the file's binary
+		sidecar, in cache_dir if one is given.
 		'''
-		text_lines_container = tl.ctext_lines_container()
-		result = text_lines_container.read(mdat_filename)
-		if result.success:
-			result = text_lines_container.get_text_line_data_list()
-			if result.success:
-				xtext_lines = result.item
-			else:
-				return result
+		result = tl.read_text_line_array(mdat_filename, buse_cache, cache_dir)
+		if not result.success:
+			return result
+
+		return self.add_text_line_array(result.item)
 
-			for text_line_data_instance in xtext_lines:
-				
-				# corigin_point instance from a ctext_line_data instance
-				orig_pt = op.corigin_point(text_line_data_instance.x,
-										   text_line_data_instance.y,
-										   text_line_data_instance.name,
-										   text_line_data_instance.index)
-
-				if self._verbose_mode:
-					orig_pt.verbose_mode = True
-				self._xorigin_points.append(orig_pt)
-				self._zorigin_points[orig_pt.name] = orig_pt
-		else:
+	def add_text_line_array(self, records):
+		'''
+		Adds the records of the specified structured array (see text_line.text_line_dtype) to our
+		internal point set, column by column.
+		'''
+		result = ps.create_point_set_from_records(records)
+		if not result.success:
 			return result
+		return self._add_point_set(result.item)
+
+	def _add_point_set(self, point_set):
+		'''
+		Private method that appends the specified cpoint_set to ours. If the corigin_point instances have
+		already been created, those of the new points are created too.
+		'''
+		first_point_id = len(self._point_set)
+		self._point_set.extend(point_set)
+		if self._xorigin_points is not None:
+			xpoint_ids = np.arange(first_point_id, len(self._point_set))
+			self._xorigin_points.extend(self._point_set.create_points(self._create_origin_point, xpoint_ids))
+		return utilsLib.Result(True, message='', item=None)
+
+	def _create_origin_point(self, x, y, name, index, point_id):
+		orig_pt = op.corigin_point(x, y, name, index, False, point_id)
+		if self._verbose_mode:
+			orig_pt.verbose_mode = True
+		return orig_pt
+
+	def add_coordinate_columns(self, x, y, names=None):
+		'''
+		Adds a corigin_point instance for each point of the specified x and y columns (see text_line.wrap_coordinate_columns),
+		e.g. the NumPy arrays a detector produced in-process; no MDAT file is involved. The columns are wrapped
+		and validated without a copy and kept for get_coordinate_columns.
+		'''
+		result = tl.wrap_coordinate_columns(x, y, names)
+		if not result.success:
+			return result
+		self._zcoordinate_columns = result.item
+		return self.add_text_line_array(result.item)
+
+	def get_coordinate_columns(self):
+		'''
+		Returns (through a Result object) the pair [x, y] of the columns given to add_coordinate_columns, as
+		NumPy arrays that share their memory; None if the points came from elsewhere.
+		'''
+		if self._zcoordinate_columns is None:
+			return utilsLib.Result(True, message='', item=None)
+		return utilsLib.Result(True, message='', item=[self._zcoordinate_columns['x'], self._zcoordinate_columns['y']])
+
+	def add_text_lines(self, text_lines, source_name=''):
+		'''
+		Adds the specified text_line.ctext_line_records (e.g. from text_line.iter_text_lines) to our internal
+		point set, consuming them one at a time and adding them in chunks of _text_line_chunk_size records.
+		source_name is only used in error messages.
+		'''
+		try:
+			xxcolumns = [[], [], [], []]
+			for record in text_lines:
+				for xcolumn, value in zip(xxcolumns, record):
+					xcolumn.append(value)
+				if len(xxcolumns[0]) >= _text_line_chunk_size:
+					result = ps.create_point_set_from_lists(*xxcolumns)
+					if not result.success:
+						return result
+					self._add_point_set(result.item)
+					xxcolumns = [[], [], [], []]
+			result = ps.create_point_set_from_lists(*xxcolumns)
+			if not result.success:
+				return result
+			self._add_point_set(result.item)
+		except:
+			sMsg = 'Error creating the origin_points from: ' + source_name + ' ' + utilsLib.getExceptionDetails()
+			return utilsLib.Result(False, message=sMsg, item=None)
 
 		return utilsLib.Result(True,message='', item=None)
 
+	def get_origin_point(self, name):
+		'''
+		Returns (through a Result object) the corigin_point with the specified name (with its 'Q' prefix, as
+		the name property gives it). The name is looked up in the string table of our point set.
+		'''
+		sprefix = op.corigin_point._name_prefix
+		point_id = self._point_set.find_point(name[len(sprefix):]) if name.startswith(sprefix) else -1
+		if point_id < 0:
+			return utilsLib.Result(False, message='No origin_point named: ' + name, item=None)
+		return utilsLib.Result(True, message='', item=self.get_points()[point_id])
+
 	def sort_origin_points(self):
 		'''
-		Sorts the list _xorigin_points (which consists of corigin_point instances) by the origin_point's y coordinate.
-		The sorted list is stored in the _xsorted_origin_points list and is accessed with the get_sorted_points method.
+		Sorts the origin_points by their y coordinate. Only the permutation is computed (see cpoint_set.argsort_y),
+		stored in _sort_order and accessed with the get_sort_order method; the get_sorted_points method
+		builds the sorted list of corigin_point instances from it.
 		This method returns the Result object indicating success or failure.
 		'''
 		try:
-			self._xsorted_origin_points = sorted(self._xorigin_points, key=lambda x: x.y, reverse=False)
+			self._sort_order = self._point_set.argsort_y()
+			self._xsorted_origin_points = None
 			smsg = ''
 			bsuccess = True
 		except:
-			smsg = 'Exception thrown in sort_origin_points method calling the sorted function. Details: ' + utilsLib.getExceptionDetails()
+			smsg = 'Exception thrown in sort_origin_points method calling argsort_y. Details: ' + utilsLib.getExceptionDetails()
 			bsuccess = False
 		return utilsLib.Result(bsuccess,smsg, item=None)
 
@@ -74,13 +161,30 @@ class corigin_points(object):
 		'''
 		Returns a list of corigin_point instances that are sorted (smallest to largest) by the y value
 		'''
+		if self._xsorted_origin_points is None and self._sort_order is not None:
+			xorigin_points = self.get_points()
+			self._xsorted_origin_points = [xorigin_points[i] for i in self._sort_order.tolist()]
 		return self._xsorted_origin_points
 
+	def get_sort_order(self):
+		'''
+		Returns the permutation computed by sort_origin_points (None if it has not been called).
+		'''
+		return self._sort_order
+
+	def get_point_set(self):
+		'''
+		Returns the cpoint_set holding the columns of the origin_points.
+		'''
+		return self._point_set
+
 
 	def get_points(self):
 		'''
-		Returns a list of corigin_point instances.
+		Returns a list of corigin_point instances, creating them the first time it is called.
 		'''
+		if self._xorigin_points is None:
+			self._xorigin_points = self._point_set.create_points(self._create_origin_point)
 		return self._xorigin_points
 
 	def get_info_list(self):
@@ -88,10 +192,51 @@ class corigin_points(object):
 		Returns a list of strings (suitable for printing). Each list element corresponds to a corigin_points's info_string property
 		'''
 		xInfo = []
-		for op in self._xorigin_points:
+		for op in self.get_points():
 			xInfo.append(op.info_string)
 		return utilsLib.Result(True,message='', item=xInfo)
 
+
+def create_origin_points(text_lines, verbose_mode=False, source_name=''):
+	'''
+	Returns (through a Result object) a corigin_points instance built from the specified text_line.ctext_line_records,
+	e.g. text_line.iter_text_lines(mdat_filename) to stream an MDAT file without holding its lines twice.
+	'''
+	orig_points = corigin_points(verbose_mode)
+	result = orig_points.add_text_lines(text_lines, source_name)
+	if not result.success:
+		return result
+	return utilsLib.Result(True, message='', item=orig_points)
+
+def create_origin_points_from_arrays(x, y, names=None, verbose_mode=False):
+	'''
+	Returns (through a Result object) a corigin_points instance holding the points of the specified x and y columns
+	(see corigin_points.add_coordinate_columns).
+	'''
+	orig_points = corigin_points(verbose_mode)
+	result = orig_points.add_coordinate_columns(x, y, names)
+	if not result.success:
+		return result
+	return utilsLib.Result(True, message='', item=orig_points)
+
+def iter_origin_point_pages(mdat_filename, verbose_mode=False):
+	'''
+	Generator that yields the pair (page_id, corigin_points) for every page of the specified multi-page MDAT file (see
+	text_line.parse_page_text_line_arrays). The file is parsed and grouped by page up front; the corigin_point
+	instances are only created for one page at a time. Raises IOError if the file cannot be read or parsed.
+	'''
+	result = tl.read_page_text_line_arrays(mdat_filename)
+	if not result.success:
+		raise IOError(result.message)
+
+	for page_id, records in result.item:
+		orig_points = corigin_points(verbose_mode)
+		result = orig_points.add_text_line_array(records)
+		if not result.success:
+			raise IOError(result.message)
+		yield (page_id, orig_points)
+
+
 class cpoint_chooser(object):
 	'''
 	'''
@@ -108,7 +253,7 @@ class cpoint_chooser(object):
 		'''
 		self._xpoints = []
 		self._lowest_cost_origin_point = None
-		self._zlosers = {}
+		self._xlosers = []
 
 	def add_point(self, orig_point):
 		'''
@@ -119,14 +264,8 @@ class cpoint_chooser(object):
 		'''
 		Idenitfy the origin_point that was added with add_point that has the lowest local_cost
 		This origin_point is stored in self._lowest_cost_origin_point. All of the loser 
-		origin_points are stored in the self._zlosers dictionary.
+		origin_points are stored in the self._xlosers list, in the order they were added.
 		'''
-		# We start by adding all items to the losers dictionary.
-		# Then when we fiind the winner we will remove it from the losers dictionary.
-		self._zlosers = {}
-		for op in self._xpoints:
-			self._zlosers[op.name] = op
-
 		# We let the first op in the list be the current best choice
 		best_op = self._xpoints[0]
 
@@ -138,8 +277,8 @@ class cpoint_chooser(object):
 		# We save away the winner
 		self._lowest_cost_origin_point = best_op
 
-		# We remove the winner from the loser list
-		del self._zlosers[best_op.name]
+		# The losers are all the others; the points are told apart by identity, not by name
+		self._xlosers = [op for op in self._xpoints if op is not best_op]
 
 		return utilsLib.Result(True,'', item=None)
 
@@ -156,16 +295,7 @@ class cpoint_chooser(object):
 		Creates and returns the list of all the origin_points that were NOT the winner 
 		calculated in get_lowest_cost_origin_point.
 		'''
-		xlosers = []
-		try:
-			for k in self._zlosers.keys():
-				op = self._zlosers[k]
-				xlosers.append(op)
-		except:
-			smsg = 'Exception thrown in get_loser_origin_points. Details: ' + utilsLib.getExceptionDetails()
-			return utilsLib.Result(False,smsg, item=None)
-
-		return utilsLib.Result(True,'', item=xlosers)
+		return utilsLib.Result(True,'', item=list(self._xlosers))
 
 			
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+# page_layout.py
+#
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import logging
+from multiprocessing.pool import ThreadPool, Pool
+
+import numpy as np
+
+import utilsLib
+import assignment as asg
+import dtw_aligner
+
+
+def _align_column(task):
+	'''
+	Aligns the origin_points and estimate_points of one column. This is a module-level function so that
+	it can be handed to a process pool. The task is a list: [column, engine_name, xorigin_points,
+	xestimate_points, buse_fast_path, metric]. Returns (through a Result object) a list: [column, final_rows,
+	origin_point local_costs, conflicted cols], all in the column's own (local) indices, so that the
+	caller can apply them to its own points when the work was done in another process.
+	'''
+	column, engine_name, xorigin_points, xestimate_points, buse_fast_path, metric = task
+	try:
+		result = dtw_aligner.align(engine_name, xorigin_points, xestimate_points, False, buse_fast_path, metric)
+		if not result.success:
+			return utilsLib.Result(False, message='Column %d: %s' % (column, result.message), item=None)
+		aligner = result.item
+
+		final_rows = aligner.get_assignment().item.get_rows()
+		xlocal_costs = [orig_pt.local_cost for orig_pt in xorigin_points]
+		num_candidates = np.bincount(aligner._backtrace_cols, minlength=len(xestimate_points))
+		xconflicted_cols = np.flatnonzero(num_candidates > 1).tolist()
+	except:
+		smsg = 'Exception thrown aligning column %d. Details: %s' % (column, utilsLib.getExceptionDetails())
+		return utilsLib.Result(False, message=smsg, item=None)
+
+	return utilsLib.Result(True, message='', item=[column, final_rows, xlocal_costs, xconflicted_cols])
+
+
+class cpage_layout(object):
+	'''
+	An instance of the cpage_layout class splits a page into columns of text and aligns each column on
+	its own. Sorting only on y interleaves the lines of a two- or three-column page, which gives one large
+	DTW matrix and a meaningless alignment; several small matrices are both faster and more accurate.
+
+	The column boundaries are found from the x coordinates of the origin_points (ground truth) with a
+	1-D gap split: if num_columns is greater than 1, the num_columns-1 widest gaps are used, otherwise
+	every gap wider than min_column_gap (a min_column_gap of 0 means the page is never split). A split
+	that would leave a column with fewer than two origin_points is dropped, since cost_calculator needs
+	two lines per column to find the line heights. Each boundary is the middle of its gap, and the
+	estimate_points are given to columns by the same boundaries.
+	'''
+	def __init__(self, num_columns=0, min_column_gap=0.0, bverbose_mode=False):
+		'''
+		'''
+		self._num_columns = num_columns
+		self._min_column_gap = min_column_gap
+		self._bverbose_mode = bverbose_mode
+
+	def find_column_boundaries(self, xorigin_points):
+		'''
+		Returns (through a Result object) the sorted array of x coordinates that separate the columns.
+		The array is empty for a single-column page.
+		'''
+		xs = np.sort(np.array([orig_pt.x for orig_pt in xorigin_points], dtype=np.float64))
+		if len(xs) < 4:
+			return utilsLib.Result(True, message='', item=np.empty(0, dtype=np.float64))
+
+		gaps = np.diff(xs)
+		if self._num_columns > 1:
+			candidates = np.argsort(-gaps, kind='mergesort')[:self._num_columns-1]
+		elif self._min_column_gap > 0:
+			candidates = np.flatnonzero(gaps > self._min_column_gap)
+			candidates = candidates[np.argsort(-gaps[candidates], kind='mergesort')]
+		else:
+			candidates = np.empty(0, dtype=np.intp)
+
+		# Accept the widest gaps first, as long as every column keeps at least two origin_points.
+		# Gap i lies between xs[i] and xs[i+1], so the column to its left ends at position i+1.
+		xsplits = []
+		for gap_idx in candidates.tolist():
+			ends = np.array(sorted(xsplits + [gap_idx + 1]))
+			sizes = np.diff(np.concatenate(([0], ends, [len(xs)])))
+			if sizes.min() >= 2:
+				xsplits.append(gap_idx + 1)
+
+		ends = np.array(sorted(xsplits), dtype=np.intp)
+		boundaries = (xs[ends-1] + xs[ends]) / 2.0
+		if self._bverbose_mode:
+			logging.debug('Column boundaries: ' + str(boundaries.tolist()))
+		return utilsLib.Result(True, message='', item=boundaries)
+
+	def split_points(self, xpoints, boundaries):
+		'''
+		Returns (through a Result object) a list with, for each column, the list of points whose x
+		coordinate falls in that column. The points keep their order within each column.
+		'''
+		columns = np.searchsorted(boundaries, np.array([point.x for point in xpoints], dtype=np.float64))
+		xxcolumns = [[] for column in range(len(boundaries) + 1)]
+		for point, column in zip(xpoints, columns.tolist()):
+			xxcolumns[column].append(point)
+		return utilsLib.Result(True, message='', item=xxcolumns)
+
+	def split_page(self, xorigin_points, xestimate_points):
+		'''
+		Splits both sequences into columns. Returns (through a Result object) a list: [merged origin_points,
+		merged estimate_points, origin_point column offsets, estimate_point column offsets], where the merged
+		sequences are the columns' sequences one after the other and each list of offsets gives the start of
+		each column (plus a final length).
+		'''
+		result = self.find_column_boundaries(xorigin_points)
+		if not result.success:
+			return result
+		boundaries = result.item
+
+		xxorigin_columns = self.split_points(xorigin_points, boundaries).item
+		xxestimate_columns = self.split_points(xestimate_points, boundaries).item
+
+		xmerged_origin_points = []
+		xmerged_estimate_points = []
+		xorigin_offsets = [0]
+		xestimate_offsets = [0]
+		for column in range(len(xxorigin_columns)):
+			xmerged_origin_points.extend(xxorigin_columns[column])
+			xmerged_estimate_points.extend(xxestimate_columns[column])
+			xorigin_offsets.append(len(xmerged_origin_points))
+			xestimate_offsets.append(len(xmerged_estimate_points))
+
+		return utilsLib.Result(True, message='', item=[xmerged_origin_points, xmerged_estimate_points, xorigin_offsets, xestimate_offsets])
+
+	def align_columns(self, xorigin_points, xestimate_points, engine_name, buse_fast_path=False, worker_pool='none', num_workers=0, metric=None):
+		'''
+		Splits both (sorted) sequences into columns, aligns each column with the named engine and merges
+		the results. worker_pool is 'none' (align the columns one after the other), 'thread' or 'process';
+		num_workers of 0 lets the pool pick the number of workers. metric is the cdistance_metric instance
+		the aligners use (Euclidean if None).
+
+		The merged sequences are the columns' sequences one after the other, and the merged cassignment
+		is attached to the merged origin_points. Returns (through a Result object) a list: [merged
+		origin_points, merged estimate_points, column offsets], where the column offsets give the start of
+		each column in the merged origin_points (plus a final len(merged origin_points)), as taken by
+		ccost_calculator.
+		'''
+		result = self.split_page(xorigin_points, xestimate_points)
+		if not result.success:
+			return result
+		xmerged_origin_points, xmerged_estimate_points, xorigin_offsets, xestimate_offsets = result.item
+
+		xtasks = []
+		for column in range(len(xorigin_offsets)-1):
+			xcolumn_estimate_points = xmerged_estimate_points[xestimate_offsets[column]:xestimate_offsets[column+1]]
+
+			# A column without estimate_points has nothing to align: all of its origin_points are misses
+			if len(xcolumn_estimate_points):
+				xcolumn_origin_points = xmerged_origin_points[xorigin_offsets[column]:xorigin_offsets[column+1]]
+				xtasks.append([column, engine_name, xcolumn_origin_points, xcolumn_estimate_points, buse_fast_path, metric])
+
+		if self._bverbose_mode:
+			logging.debug('Aligning %d columns (%s worker pool)' % (len(xtasks), worker_pool))
+
+		try:
+			if worker_pool == 'none' or len(xtasks) < 2:
+				xresults = [_align_column(task) for task in xtasks]
+			elif worker_pool in ('thread', 'process'):
+				if worker_pool == 'thread':
+					pool = ThreadPool(num_workers or None)
+				else:
+					pool = Pool(num_workers or None)
+				try:
+					xresults = pool.map(_align_column, xtasks)
+				finally:
+					pool.close()
+					pool.join()
+			else:
+				smsg = 'Unknown worker_pool: %s' % worker_pool
+				return utilsLib.Result(False, message=smsg, item=None)
+		except:
+			smsg = 'Exception thrown aligning the columns. Details: ' + utilsLib.getExceptionDetails()
+			return utilsLib.Result(False, message=smsg, item=None)
+
+		# Translate each column's results to the merged sequences. This is done here rather than in
+		# the workers so that it also holds when they ran in other processes.
+		final_rows = np.empty(len(xmerged_estimate_points), dtype=np.intp)
+		final_rows.fill(-1)
+		for result in xresults:
+			if not result.success:
+				return result
+			column, local_final_rows, xlocal_costs, xconflicted_cols = result.item
+			row_offset = xorigin_offsets[column]
+			col_offset = xestimate_offsets[column]
+			final_rows[col_offset:col_offset+len(local_final_rows)] = local_final_rows + row_offset
+
+			for row in range(len(xlocal_costs)):
+				xmerged_origin_points[row_offset + row].local_cost = xlocal_costs[row]
+			for col in xconflicted_cols:
+				est_pt = xmerged_estimate_points[col_offset + col]
+				est_pt.set_final_origin_point(xmerged_origin_points[final_rows[col_offset + col]])
+
+		result = asg.create_assignment_from_rows(xmerged_estimate_points, final_rows, len(xmerged_origin_points))
+		if not result.success:
+			return result
+		result.item.attach(xmerged_origin_points)
+
+		return utilsLib.Result(True, message='', item=[xmerged_origin_points, xmerged_estimate_points, xorigin_offsets])
+
+
+if __name__ == "__main__":
+
+	import origin_point as op
+	import estimate_point as ep
+
+	# Two columns of five lines each; the estimates are a few pixels off
+	xorig = [op.corigin_point(100 + 900*c, 50*i, '%d_%d' % (c, i), 5*c + i) for i in range(5) for c in range(2)]
+	xest = [ep.cestimate_point(103 + 900*c, 50*i + 2, '%d_%d' % (c, i), 5*c + i) for i in range(5) for c in range(2)]
+
+	layout = cpage_layout(min_column_gap=200.0)
+	result = layout.align_columns(xorig, xest, 'reference')
+	if result.success:
+		xmerged_orig, xmerged_est, xoffsets = result.item
+		print('Column offsets: ' + str(xoffsets))
+		for orig_pt in xmerged_orig:
+			print(orig_pt.get_estimate_points_string())
+	else:
+		print(result.message)
+
+	print('Done ...')
@@ -22,31 +22,43 @@ class cpoint(object):
 		y			: integer	:	requried	: default=N/A
 		name		: string	:	optional	: default=N/A
 		index		: integer	:	optional	: default=-1
+		point_id	: integer	:	optional	: default=-1
 
 	Client code calls the constructor with the (x, y) coordinates and the optional name
 	and index values and then can reference these values as instance properties. After calling 
 	the constructor, the client code can set the name and index properties.
+
+	There can be millions of points in a batch, so the point classes use __slots__ rather than a
+	per-instance __dict__.
+
+	The point_id is the dense integer id of the point in its container (its position in the container's
+	point_set.cpoint_set), which is what identifies a point internally. The name is for display and
+	output only. The derived classes add their prefix (_name_prefix) to the name given to their
+	constructor, once; the name is stored with its prefix.
 	'''
+	__slots__ = ('_x', '_y', '_name', '_index', '_point_id')
 
+	_name_prefix = ''
 
-	def __init__(self, x, y, name='', index=-1):
+	def __init__(self, x, y, name='', index=-1, bvalidate=True, point_id=-1):
 		'''
 		Client code must supply the (x, y) coordinate, which is the column and row of origin point 
 		for the text-line segment. The client can optionally supply a name or ID for this point and 
 		its ordering relative to other instances in its parent container.
+		The types are asserted unless bvalidate is False (for values that were already validated, e.g. by
+		text_line.validate_text_line_fields, or by a derived class).
 		'''
-		assert type(x)			is IntType, "x is not an integer: %s" % str(x)
-		assert type(y)			is IntType, "y is not an integer: %s" % str(y)
-		assert type(name)		is StringType, "name is not a string: %s" % name
-		assert type(index)		is IntType, "index is not an integer: %s" % str(index)
+		if bvalidate:
+			assert type(x)			is IntType, "x is not an integer: %s" % str(x)
+			assert type(y)			is IntType, "y is not an integer: %s" % str(y)
+			assert type(name)		is StringType, "name is not a string: %s" % name
+			assert type(index)		is IntType, "index is not an integer: %s" % str(index)
 		
 		self._x = x
 		self._y = y
 		self._name = name
 		self._index = index
-
-		self._vertical_distance_to_top_neighbor = None
-		self._vertical_distance_to_bottom_neighbor = None
+		self._point_id = point_id
 
 
 	@property
@@ -76,7 +88,8 @@ class cpoint(object):
 	@name.setter
 	def name(self, name):
 		'''
-		Set the (string) name value for this Origin Point.
+		Set the (string) name value for this Origin Point. The name is stored as given, prefix included, so
+		the name property returns exactly what was set.
 		'''
 		assert type(name) is StringType, "name is not a string: %s" % name
 		self._name = name
@@ -94,32 +107,8 @@ class cpoint(object):
 		self._index = idx
 
 	@property
-	def vertical_distance_to_top_neighbor(self, top_neighbor_point):
-		'''
-		calculates and saves the vertical distance from the specified cpoint instance to this instance.
-		'''
-		self._vertical_distance_to_top_neighbor = self.y - top_neighbor_point.y
-
-	@vertical_distance_to_top_neighbor.setter
-	def vertical_distance_to_top_neighbor(self):
-		'''
-		returns the vertical distance to the top neighbor
-		'''
-		return self._vertical_distance_to_top_neighbor
-
-	@property
-	def vertical_distance_to_bottom_neighbor(self, bottom_neighbor_point):
-		'''
-		calculates and saves the vertical distance from the specified cpoint instance to this instance.
-		'''
-		self._vertical_distance_to_bottom_neighbor = self.y - bottom_neighbor_point.y
-
-	@vertical_distance_to_bottom_neighbor.setter
-	def vertical_distance_to_bottom_neighbor(self):
-		'''
-		returns the vertical distance to the bottom neighbor
-		'''
-		return self._vertical_distance_to_bottom_neighbor
+	def point_id(self):
+		return self._point_id
 
 if __name__ == "__main__":
 
@@ -0,0 +1,195 @@
+# point_set.py
+#
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import numpy as np
+
+import utilsLib
+
+
+class cpoint_set(object):
+	'''
+	An instance of the cpoint_set class holds a set of points as columns (a struct of arrays) rather than
+	as a list of point objects: x, y, the original index of every point and the id of its name in the
+	set's string table. The columns are NumPy arrays, so the set can be sorted (argsort_y returns a
+	permutation, nothing is moved) and its coordinates handed to the vectorized code without visiting
+	every point. Point objects are only created when they are asked for (see create_points).
+
+	The position of a point in the set is its point id: a dense integer that identifies the point
+	internally. Every distinct name is held once in the string table, which is only used for display,
+	output and find_point.
+
+	Public Methods:
+		extend(point_set)
+		argsort_y()
+		get_coordinates(order)
+		get_name(position)
+		get_names()
+		find_point(name)
+		create_points(create_point, order)
+	'''
+	def __init__(self, x=None, y=None, indices=None, name_ids=None, xnames=None):
+		'''
+		The columns are taken as they are (np.asarray, so arrays are not copied); name_ids are positions in xnames.
+		An empty set is created if no columns are given.
+		'''
+		self._x = np.asarray(x if x is not None else np.zeros(0, dtype=np.int32))
+		self._y = np.asarray(y if y is not None else np.zeros(0, dtype=np.int32))
+		self._indices = np.asarray(indices if indices is not None else np.zeros(0, dtype=np.int32))
+		self._name_ids = np.asarray(name_ids if name_ids is not None else np.zeros(0, dtype=np.int32))
+		self._xnames = list(xnames) if xnames is not None else []
+
+		# The name index of find_point is only built if it is called
+		self._zname_ids = None
+		self._name_positions = None
+
+	def __len__(self):
+		return len(self._x)
+
+	@property
+	def x(self):
+		return self._x
+
+	@property
+	def y(self):
+		return self._y
+
+	@property
+	def indices(self):
+		return self._indices
+
+	@property
+	def name_ids(self):
+		return self._name_ids
+
+	def extend(self, point_set):
+		'''
+		Appends the points of the specified cpoint_set to this one, merging the string tables.
+		'''
+		if not len(point_set):
+			return
+		if not len(self):
+			self.__init__(point_set.x, point_set.y, point_set.indices, point_set.name_ids, point_set.get_names())
+			return
+
+		self._name_positions = None
+		zname_ids = self._get_name_ids()
+		xmapping = []
+		for sname in point_set.get_names():
+			if sname not in zname_ids:
+				zname_ids[sname] = len(self._xnames)
+				self._xnames.append(sname)
+			xmapping.append(zname_ids[sname])
+
+		self._x = np.concatenate([self._x, point_set.x])
+		self._y = np.concatenate([self._y, point_set.y])
+		self._indices = np.concatenate([self._indices, point_set.indices])
+		self._name_ids = np.concatenate([self._name_ids, np.array(xmapping, dtype=np.int32)[point_set.name_ids]])
+
+	def argsort_y(self):
+		'''
+		Returns the permutation that sorts the points on their y coordinate. The sort is stable, so points
+		with the same y keep their order, as they do with sorted().
+		'''
+		return np.argsort(self._y, kind='mergesort')
+
+	def get_coordinates(self, order=None):
+		'''
+		Returns the pair of float arrays [x, y] of the coordinates of the points, in the specified order
+		(a permutation, e.g. from argsort_y) or in their own order.
+		'''
+		if order is None:
+			return [self._x.astype(np.float64), self._y.astype(np.float64)]
+		return [self._x[order].astype(np.float64), self._y[order].astype(np.float64)]
+
+	def get_name(self, position):
+		return self._xnames[self._name_ids[position]]
+
+	def get_names(self):
+		'''
+		Returns the string table of the set (the names, indexed by name id).
+		'''
+		return self._xnames
+
+	def _get_name_ids(self):
+		'''
+		Private method that returns the dictionary mapping every name of the string table to its name id.
+		'''
+		if self._zname_ids is None:
+			self._zname_ids = dict((sname, name_id) for name_id, sname in enumerate(self._xnames))
+		return self._zname_ids
+
+	def find_point(self, name):
+		'''
+		Returns the point id (position) of the point with the specified name, or -1 if there is none.
+		If several points have the name, the last one is returned.
+		'''
+		name_id = self._get_name_ids().get(name, -1)
+		if name_id < 0:
+			return -1
+		if self._name_positions is None:
+			self._name_positions = np.full(len(self._xnames), -1, dtype=np.intp)
+			np.maximum.at(self._name_positions, self._name_ids, np.arange(len(self), dtype=np.intp))
+		return int(self._name_positions[name_id])
+
+	def create_points(self, create_point, order=None):
+		'''
+		Returns the list of the point objects created by calling create_point(x, y, name, index, point_id)
+		for every point, in the specified order (a permutation of point ids) or in their own order.
+		'''
+		if order is None:
+			order = np.arange(len(self))
+		order = np.asarray(order)
+		xnames = self._xnames
+		return [create_point(x, y, xnames[name_id], index, point_id) for x, y, name_id, index, point_id in
+				zip(self._x[order].tolist(), self._y[order].tolist(), self._name_ids[order].tolist(), self._indices[order].tolist(), order.tolist())]
+
+
+def create_point_set_from_records(records):
+	'''
+	Returns (through a Result object) a cpoint_set holding the specified text lines: a structured array of
+	text_line.text_line_dtype, or a dictionary of columns with the same fields. The x and y columns are
+	not copied; the names are interned into the set's string table with a single np.unique.
+	'''
+	try:
+		xnames, name_ids = np.unique(np.asarray(records['name']), return_inverse=True)
+		point_set = cpoint_set(records['x'], records['y'], records['index'], name_ids.astype(np.int32), xnames.tolist())
+	except:
+		smsg = 'Exception thrown creating a cpoint_set. Details: ' + utilsLib.getExceptionDetails()
+		return utilsLib.Result(False, message=smsg, item=None)
+	return utilsLib.Result(True, message='', item=point_set)
+
+def create_point_set_from_lists(xnames, xs, ys, xindices):
+	'''
+	Returns (through a Result object) a cpoint_set holding the points with the specified names, coordinates and indices.
+	The coordinates must fit in an int32; they are checked before the cast, which would wrap them.
+	'''
+	int32_info = np.iinfo(np.int32)
+	for saxis, xvalues in [['x', xs], ['y', ys]]:
+		if xvalues and (min(xvalues) < int32_info.min or max(xvalues) > int32_info.max):
+			smsg = 'The %s coordinates do not fit in an int32: %d to %d' % (saxis, min(xvalues), max(xvalues))
+			return utilsLib.Result(False, message=smsg, item=None)
+
+	zcolumns = {}
+	zcolumns['name'] = np.array(xnames) if xnames else np.zeros(0, dtype='S1')
+	zcolumns['x'] = np.array(xs, dtype=np.int32)
+	zcolumns['y'] = np.array(ys, dtype=np.int32)
+	zcolumns['index'] = np.array(xindices, dtype=np.int32)
+	return create_point_set_from_records(zcolumns)
+
+
+if __name__ == "__main__":
+
+	import estimate_point as ep
+
+	point_set = create_point_set_from_lists(['a', 'b', 'c', 'd'], [10, 20, 30, 40], [300, 100, 200, 100], [0, 1, 2, 3]).item
+	order = point_set.argsort_y()
+	print('Order on y: %s' % order.tolist())
+	print(point_set.get_coordinates(order))
+	for est_pt in point_set.create_points(lambda x, y, name, index, point_id: ep.cestimate_point(x, y, name, index, False, point_id), order):
+		print(est_pt.info_string)
+
+	print('Done ...')
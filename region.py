@@ -7,7 +7,6 @@ __date__ = "$Aug 2, 2010 8:34:58 PM$"
 
 import math
 
-import point as pt
 import utilsLib
 import region_parameters as rp
 
@@ -111,9 +110,10 @@ class cregion(object):
 		'''
 		This method returns True if the specified estimate_point is within r1, False otherwise
 		'''
-		est_pt = pt.cpoint(ep.x, ep.y, ep.name, ep.index)
+		x = ep.x
+		y = ep.y
 		bhit = False
-		if est_pt.x < self._r1_x_rhs and est_pt.x > self._r1_x_lhs and est_pt.y > self._r1_y_top and est_pt.y < self._r1_y_bottom:
+		if x < self._r1_x_rhs and x > self._r1_x_lhs and y > self._r1_y_top and y < self._r1_y_bottom:
 			bhit = True
 		return bhit
 
@@ -122,7 +122,8 @@ class cregion(object):
 		'''
 		This method returns True if the specified estimate_point is within r2, False otherwise
 		'''
-		est_pt = pt.cpoint(ep.x, ep.y, ep.name, ep.index)
+		x = ep.x
+		y = ep.y
 		bhit = False
 
 		left_of_r1 = False
@@ -131,16 +132,16 @@ class cregion(object):
 		below_r1 = False
 
 		# Left of R1
-		if est_pt.x >= self._r2_x_lhs and est_pt.x <= self._r1_x_lhs and est_pt.y >= self._r2_y_top and est_pt.y <= self._r2_y_bottom:
+		if x >= self._r2_x_lhs and x <= self._r1_x_lhs and y >= self._r2_y_top and y <= self._r2_y_bottom:
 			left_of_r1 = True
 		# Right of R1
-		if est_pt.x >= self._r1_x_rhs and est_pt.x <= self._r2_x_rhs and est_pt.y >= self._r2_y_top and est_pt.y <= self._r2_y_bottom:
+		if x >= self._r1_x_rhs and x <= self._r2_x_rhs and y >= self._r2_y_top and y <= self._r2_y_bottom:
 			right_of_r1 = True
 		# Above R1
-		if est_pt.x >= self._r2_x_lhs and est_pt.x <= self._r2_x_rhs and est_pt.y >= self._r2_y_top and est_pt.y <= self._r1_y_top:
+		if x >= self._r2_x_lhs and x <= self._r2_x_rhs and y >= self._r2_y_top and y <= self._r1_y_top:
 			above_r1 = True
 		# Below R1
-		if est_pt.x >= self._r2_x_lhs and est_pt.x <= self._r2_x_rhs and est_pt.y >= self._r1_y_bottom and est_pt.y <= self._r2_y_bottom:
+		if x >= self._r2_x_lhs and x <= self._r2_x_rhs and y >= self._r1_y_bottom and y <= self._r2_y_bottom:
 			below_r1 = True
 
 		if left_of_r1 or right_of_r1 or above_r1 or below_r1:
@@ -160,12 +161,13 @@ class cregion(object):
 		'''
 		This method returns True if the specified estimate_point is outside r2, False otherwise
 		'''
-		est_pt = pt.cpoint(ep.x, ep.y, ep.name, ep.index)
+		x = ep.x
+		y = ep.y
 		bhit = False
-		if  est_pt.x > self._r2_x_rhs or \
-			est_pt.x < self._r2_x_lhs or \
-			est_pt.y < self._r2_y_top or \
-			est_pt.y > self._r2_y_bottom:
+		if  x > self._r2_x_rhs or \
+			x < self._r2_x_lhs or \
+			y < self._r2_y_top or \
+			y > self._r2_y_bottom:
 			bhit = True
 		return bhit
 
@@ -0,0 +1,127 @@
+# sample_totals.py
+#
+# Checks that the sample MDAT files still score the total costs recorded for them: the reference DTW
+# alignment is run on each pair of sample files with the settings of a config file and the origin_points
+# are scored as opal_driver scores them. Changes that are meant to leave the scores alone (refactors of the
+# alignment, the assignment or the cost bookkeeping) must leave these totals unchanged; a change that is
+# meant to alter the scores updates the recorded totals in the same commit.
+from __future__ import print_function
+
+__author__ = "MichaelMurdock"
+__date__ = "$Aug 2, 2010 8:34:58 PM$"
+
+import os
+import sys
+import getopt
+import logging
+
+import utilsLib
+import config_reader as config
+import origin_points
+import estimate_points
+import dtw_aligner
+import distance_metrics as dm
+import opal_driver
+
+
+# The [origin_point file, estimate_point file, total cost] of every sample page, with the settings of config1.ini.
+# ep2.mdat has origin_points with several R2 hits and no R1 hit, so it depends on which R2 hit is charged
+# (it was 1164.09 before the closest one was charged).
+_xsample_totals = [
+	['op1.mdat', 'ep1.mdat', 90.00],
+	['op2.mdat', 'ep2.mdat', 1157.87],
+]
+
+
+def score_sample(reader, origin_point_file, estimate_point_file):
+	'''
+	Returns (through a Result object) the total cost of the specified pair of MDAT files, aligned with the
+	reference DTW engine (sorted, and with the diagonal fast path, as the config file says) and scored with
+	opal_driver.score_points.
+	'''
+	orig_points = origin_points.corigin_points(False)
+	result = orig_points.read_origin_points(origin_point_file)
+	if not result.success:
+		return result
+	est_points = estimate_points.cestimate_points()
+	result = est_points.read_estimate_points(estimate_point_file)
+	if not result.success:
+		return result
+
+	xorig_points = orig_points.get_points()
+	if reader.sort_origin_points:
+		orig_points.sort_origin_points()
+		xorig_points = orig_points.get_sorted_points()
+	xest_points = est_points.get_points()
+	if reader.sort_estimate_points:
+		est_points.sort_estimate_points()
+		xest_points = est_points.get_sorted_points()
+
+	result = dm.create_distance_metric(reader.distance_metric, reader.metric_x_weight, reader.metric_y_weight)
+	if not result.success:
+		return result
+	result = dtw_aligner.align(dtw_aligner.dtw_aligner.engine_name, xorig_points, xest_points, False,
+							   reader.diagonal_fast_path, result.item)
+	if not result.success:
+		return result
+
+	return opal_driver.score_points(reader, xorig_points, None)
+
+def check_sample_totals(reader, sample_dir):
+	'''
+	Scores every sample page in sample_dir (see _xsample_totals) and returns (through a Result object) the list
+	of the [estimate_point file, recorded total, total] items of the pages whose total (to two decimals, as
+	the results file gives it) is not the recorded one.
+	'''
+	xmismatches = []
+	for origin_point_file, estimate_point_file, recorded_total in _xsample_totals:
+		result = score_sample(reader, os.path.join(sample_dir, origin_point_file), os.path.join(sample_dir, estimate_point_file))
+		if not result.success:
+			return utilsLib.Result(False, message='Error scoring %s. Details: %s' % (estimate_point_file, result.message), item=None)
+		if '%5.2f' % result.item != '%5.2f' % recorded_total:
+			xmismatches.append([estimate_point_file, recorded_total, result.item])
+	return utilsLib.Result(True, message='', item=xmismatches)
+
+
+def main(argv):
+	'''
+	Command-line entry point. Prints the pages whose total differs from the recorded one; returns 1 if there are any.
+	'''
+	usage = 'sample_totals.py [-c <config_file>] [-d <sample_dir>]'
+	sample_dir = os.path.dirname(os.path.abspath(__file__))
+	config_file = os.path.join(sample_dir, 'config1.ini')
+	try:
+		opts, args = getopt.getopt(argv, "c:d:h", ["cfile=", "dir=", "help"])
+	except getopt.GetoptError:
+		print(usage)
+		return 2
+
+	for opt, arg in opts:
+		if opt in ("-h", "--help"):
+			print(usage)
+			return 0
+		elif opt in ("-c", "--cfile"):
+			config_file = arg
+		elif opt in ("-d", "--dir"):
+			sample_dir = arg
+
+	logging.disable(logging.CRITICAL)
+	try:
+		reader = config.cconfig_reader(config_file)
+	except:
+		print('Exception thrown calling config.cconfig_reader. Details: ' + utilsLib.getExceptionDetails())
+		return 2
+
+	result = check_sample_totals(reader, sample_dir)
+	if not result.success:
+		print(result.message)
+		return 2
+	for estimate_point_file, recorded_total, total in result.item:
+		print('%s -- Recorded Total: %5.2f -- Total Calculated Cost: %5.2f' % (estimate_point_file, recorded_total, total))
+	print('%d of %d sample pages score their recorded totals' % (len(_xsample_totals) - len(result.item), len(_xsample_totals)))
+	return 1 if result.item else 0
+
+
+if __name__ == "__main__":
+
+	sys.exit(main(sys.argv[1:]))
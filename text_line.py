@@ -8,11 +8,659 @@ __date__ = "$Aug 2, 2010 8:34:58 PM$"
 
 import os
 import sys
+import getopt
+import hashlib
+import logging
 from types import *
 import csv
+import collections
+import zlib
+import bz2
+
+try:
+	import lzma
+except ImportError:
+	# Python 2: xz-compressed MDAT files cannot be read
+	lzma = None
+
+import numpy as np
 
 import point as pt
 import utilsLib
+import mdat_archive
+
+
+def text_line_dtype(name_dtype):
+	'''
+	Returns the NumPy structured dtype of the records of read_text_line_array: name (of the specified
+	string dtype), x, y and index.
+	'''
+	return np.dtype([('name', name_dtype), ('x', np.int32), ('y', np.int32), ('index', np.int32)])
+
+# Reports of bad rows list at most this many of them in their message (the Result item has them all)
+_max_reported_errors = 50
+
+def _split_mdat_text(text):
+	'''
+	Returns the pair [xxfields, xline_numbers]: the list of the lists of fields of the non-blank lines of
+	the specified text, and the (1-based) line number of each of them in the text.
+	'''
+	xlines = text.splitlines()
+	xline_numbers = [line_number + 1 for line_number, line in enumerate(xlines) if line.strip()]
+	xxfields = [xlines[line_number - 1].split(',') for line_number in xline_numbers]
+	return [xxfields, xline_numbers]
+
+def _convert_integers(xstrings):
+	'''
+	Returns the pair [values, bbad]: the int64 array of the specified strings and the mask of the strings
+	that are not integers (whose values are 0). The strings are converted by NumPy all at once; only if that
+	fails are they looked at one by one, to find the bad ones.
+	'''
+	try:
+		return [np.array(xstrings).astype(np.int64), np.zeros(len(xstrings), dtype=bool)]
+	except (ValueError, OverflowError):
+		pass
+
+	values = np.zeros(len(xstrings), dtype=np.int64)
+	bbad = np.zeros(len(xstrings), dtype=bool)
+	for position, sstring in enumerate(xstrings):
+		try:
+			values[position] = int(sstring)
+		except (ValueError, OverflowError):
+			bbad[position] = True
+	return [values, bbad]
+
+def validate_text_line_fields(xxfields, xline_numbers, column=0, source_name='', bcheck_names=True):
+	'''
+	Checks the specified lists of fields (see _split_mdat_text) in one pass: every line must have the name,
+	x and y columns (fields column, column+1 and column+2), x and y must be integers and fit in an int32.
+	All the bad lines are found, not only the first. With bcheck_names, names used by more than one line
+	are logged as warnings (they are not errors: the readers always allowed them).
+
+	Returns (through a Result object) the columns [names, xs, ys] as arrays if every line is good. Otherwise
+	the message reports the bad lines (up to _max_reported_errors of them) and the item is the full list of
+	the pairs [line_number, smessage], in line order.
+	'''
+	num_columns = column + 3
+	line_numbers = np.array(xline_numbers, dtype=np.int64)
+	bshort = np.array([len(xfields) < num_columns for xfields in xxfields], dtype=bool)
+
+	xerrors = []
+	for position in np.flatnonzero(bshort).tolist():
+		xerrors.append([xline_numbers[position], 'has %d columns, at least %d expected' % (len(xxfields[position]), num_columns)])
+
+	# Short lines get placeholder values, so the columns can be converted all at once
+	names = np.array([xfields[column] if len(xfields) >= num_columns else '' for xfields in xxfields])
+	xs, bbad_x = _convert_integers([xfields[column+1] if len(xfields) >= num_columns else '0' for xfields in xxfields])
+	ys, bbad_y = _convert_integers([xfields[column+2] if len(xfields) >= num_columns else '0' for xfields in xxfields])
+
+	int32_info = np.iinfo(np.int32)
+	for values, bbad, saxis in [[xs, bbad_x, 'x'], [ys, bbad_y, 'y']]:
+		for position in np.flatnonzero(bbad).tolist():
+			xerrors.append([xline_numbers[position], '%s is not an integer: %s' % (saxis, xxfields[position][column + (1 if saxis == 'x' else 2)].strip())])
+		bout_of_range = ~bbad & ((values < int32_info.min) | (values > int32_info.max))
+		for position in np.flatnonzero(bout_of_range).tolist():
+			xerrors.append([xline_numbers[position], '%s is out of range: %d' % (saxis, values[position])])
+
+	if bcheck_names and len(names):
+		unique_names, first_positions, inverse = np.unique(names, return_index=True, return_inverse=True)
+		first_positions = first_positions[inverse]
+		bduplicate = ~bshort & (first_positions != np.arange(len(names)))
+		for position in np.flatnonzero(bduplicate).tolist():
+			logging.warning('%s line %d: name %s is already used on line %d' % (source_name, xline_numbers[position], names[position], line_numbers[first_positions[position]]))
+
+	if xerrors:
+		xerrors.sort(key=lambda error: error[0])
+		xmessages = ['line %d: %s' % (line_number, smessage) for line_number, smessage in xerrors[:_max_reported_errors]]
+		if len(xerrors) > _max_reported_errors:
+			xmessages.append('... and %d more' % (len(xerrors) - _max_reported_errors))
+		sMsg = '%d bad lines in file: %s\n\t%s' % (len(xerrors), source_name, '\n\t'.join(xmessages))
+		return utilsLib.Result(False, message=sMsg, item=xerrors)
+
+	return utilsLib.Result(True, message='', item=[names, xs, ys])
+
+def _build_text_line_array(xxfields, xline_numbers, column, source_name, bcheck_names=True):
+	'''
+	Returns (through a Result object) the structured array of the text lines whose name, x and y are the
+	fields column, column+1 and column+2 of the specified lists of fields, after validate_text_line_fields.
+	'''
+	if not xxfields:
+		return utilsLib.Result(True, message='', item=np.empty(0, dtype=text_line_dtype(np.array(['']).dtype)))
+
+	result = validate_text_line_fields(xxfields, xline_numbers, column, source_name, bcheck_names)
+	if not result.success:
+		return result
+	names, xs, ys = result.item
+
+	records = np.empty(len(xxfields), dtype=text_line_dtype(names.dtype))
+	records['name'] = names
+	records['x'] = xs
+	records['y'] = ys
+	records['index'] = np.arange(len(xxfields))
+	return utilsLib.Result(True, message='', item=records)
+
+def parse_text_line_array(text, source_name=''):
+	'''
+	Parses the contents of an MDAT file (see ctext_lines_container.read for the format) in one pass 
+	into a NumPy structured array with one (name, x, y, index) record per text line, where index is the
+	position of the line in the file. Blank lines are skipped and columns after the third are ignored.
+	The coordinates are converted by NumPy for the whole file at once; no per-line objects are built.
+	Every bad line is reported at once (see validate_text_line_fields).
+	Returns the array through a Result object; source_name is only used in error messages.
+	'''
+	xxfields, xline_numbers = _split_mdat_text(text)
+	return _build_text_line_array(xxfields, xline_numbers, 0, source_name)
+
+def parse_page_text_line_arrays(text, source_name=''):
+	'''
+	Parses the contents of a multi-page MDAT file, whose lines have a leading page id column (page_id, name,
+	x, y), and groups its text lines by page. The lines are parsed once, as parse_text_line_array does, then
+	put in page order with a single (stable) argsort and split at the page boundaries, so each page's records
+	are a slice of one array. The page id and name are stripped of surrounding blanks, and the index of a text
+	line is its position among the lines of its page. Returns (through a Result object) the list of the pairs
+	[page_id, records], in the order of the page ids.
+	'''
+	xxfields, xline_numbers = _split_mdat_text(text)
+	if not xxfields:
+		return utilsLib.Result(True, message='', item=[])
+
+	# Names only need to be unique within a page, which the check over the whole file does not know about
+	result = _build_text_line_array(xxfields, xline_numbers, 1, source_name, False)
+	if not result.success:
+		return result
+	page_ids = np.char.strip(np.array([xfields[0] for xfields in xxfields]))
+
+	order = np.argsort(page_ids, kind='mergesort')
+	page_ids = page_ids[order]
+	records = result.item[order]
+	records['name'] = np.char.strip(records['name'])
+
+	starts = np.concatenate([[0], np.flatnonzero(page_ids[1:] != page_ids[:-1]) + 1])
+	counts = np.diff(np.concatenate([starts, [len(records)]]))
+	records['index'] = np.arange(len(records)) - np.repeat(starts, counts)
+
+	xpages = list(zip(page_ids[starts].tolist(), np.split(records, starts[1:])))
+	return utilsLib.Result(True, message='', item=[list(page) for page in xpages])
+
+def wrap_coordinate_columns(x, y, names=None):
+	'''
+	Wraps the specified x and y columns (NumPy arrays, or any array-like or buffer-protocol object such as
+	array.array or a memoryview) as text lines without copying them: x and y must be one-dimensional
+	integer columns of the same length whose values fit in an int32. names is an optional sequence of
+	names; the text lines are named after their position if it is not given.
+
+	Returns (through a Result object) a dictionary of columns with the fields of text_line_dtype (as
+	corpus_store.get_page_records does), which the point containers' add_text_line_array accepts.
+	'''
+	try:
+		xs = np.asarray(x)
+		ys = np.asarray(y)
+	except:
+		return utilsLib.Result(False, message='The coordinates are not array-like: ' + utilsLib.getExceptionDetails(), item=None)
+
+	if xs.ndim != 1 or ys.ndim != 1 or len(xs) != len(ys):
+		smsg = 'x and y must be one-dimensional columns of the same length (shapes %s and %s)' % (str(xs.shape), str(ys.shape))
+		return utilsLib.Result(False, message=smsg, item=None)
+	if xs.dtype.kind not in 'iu' or ys.dtype.kind not in 'iu':
+		smsg = 'x and y must be integer columns (dtypes %s and %s)' % (xs.dtype, ys.dtype)
+		return utilsLib.Result(False, message=smsg, item=None)
+
+	int32_info = np.iinfo(np.int32)
+	if len(xs) and (min(int(xs.min()), int(ys.min())) < int32_info.min or max(int(xs.max()), int(ys.max())) > int32_info.max):
+		return utilsLib.Result(False, message='The coordinates do not fit in an int32', item=None)
+
+	if names is None:
+		names = np.arange(len(xs)).astype(str)
+	else:
+		try:
+			names = np.asarray(names)
+			if names.ndim != 1 or names.shape != xs.shape:
+				smsg = 'There must be a one-dimensional column of one name per point (names of shape %s, %d points)' % (str(names.shape), len(xs))
+				return utilsLib.Result(False, message=smsg, item=None)
+			if names.dtype.kind not in 'SU':
+				names = names.astype(str)
+		except:
+			return utilsLib.Result(False, message='The names are not a column of strings: ' + utilsLib.getExceptionDetails(), item=None)
+
+	zcolumns = {}
+	zcolumns['name'] = names
+	zcolumns['x'] = xs
+	zcolumns['y'] = ys
+	zcolumns['index'] = np.arange(len(xs), dtype=np.int32)
+	return utilsLib.Result(True, message='', item=zcolumns)
+
+# A lightweight, immutable text line: what iter_text_lines and iter_text_line_array yield
+ctext_line_record = collections.namedtuple('ctext_line_record', ['name', 'x', 'y', 'index'])
+
+def iter_text_lines(mdat_filename):
+	'''
+	Generator that reads the specified MDAT file one line at a time and yields a ctext_line_record for each
+	text line, so a file of any size is read in constant memory. Blank lines are skipped and columns after
+	the third are ignored, as in parse_text_line_array. Raises IOError if the file cannot be read and
+	ValueError on a malformed line: as with validate_text_line_fields, x and y must be integers and fit in
+	an int32. Compressed files are decompressed as they are read; an archive member (see
+	mdat_archive.split_member_path) is read whole before its lines are yielded.
+	'''
+	int32_info = np.iinfo(np.int32)
+	index = 0
+	for line_number, line in enumerate(_iter_mdat_lines(mdat_filename)):
+		if not line.strip():
+			continue
+		xfields = line.split(',')
+		if len(xfields) < 3:
+			raise ValueError('Error extracting a row from the file: %s Details: line %d has %d columns' % (mdat_filename, line_number + 1, len(xfields)))
+		xvalues = []
+		for saxis, sfield in [['x', xfields[1]], ['y', xfields[2]]]:
+			try:
+				value = int(sfield)
+			except ValueError:
+				raise ValueError('Error extracting a row from the file: %s Details: line %d: %s is not an integer: %s' % (mdat_filename, line_number + 1, saxis, sfield.strip()))
+			if value < int32_info.min or value > int32_info.max:
+				raise ValueError('Error extracting a row from the file: %s Details: line %d: %s is out of range: %d' % (mdat_filename, line_number + 1, saxis, value))
+			xvalues.append(value)
+		yield ctext_line_record(xfields[0], xvalues[0], xvalues[1], index)
+		index += 1
+
+def iter_text_line_array(records):
+	'''
+	Generator that yields a ctext_line_record for each record of the specified structured array (see text_line_dtype).
+	'''
+	for sname, x, y, index in zip(records['name'].tolist(), records['x'].tolist(), records['y'].tolist(), records['index'].tolist()):
+		yield ctext_line_record(sname, x, y, index)
+
+# Sidecar files (see write_text_line_sidecar): a fixed header followed by the raw records. The header
+# records the size, modification time and MD5 digest of the MDAT file the records were parsed from.
+sidecar_extension = '.mdatc'
+_sidecar_magic = b'OPALMDC1'
+_sidecar_version = 1
+_sidecar_header_dtype = np.dtype([('magic', 'S8'), ('version', '<i4'), ('name_size', '<i4'), ('num_records', '<i8'),
+								  ('source_size', '<i8'), ('source_mtime', '<f8'), ('source_md5', 'u1', (16,))])
+
+def _sidecar_record_dtype(name_size):
+	return np.dtype([('name', 'S%d' % name_size), ('x', '<i4'), ('y', '<i4'), ('index', '<i4')])
+
+def get_sidecar_filename(mdat_filename, cache_dir=''):
+	'''
+	Returns the name of the sidecar file of the specified MDAT file: next to it, or in cache_dir if one is given.
+	In cache_dir the name also holds a digest of the file's absolute path, so MDAT files with the same name in
+	different directories (e.g. gt/page001.mdat and est/page001.mdat) get sidecars of their own.
+	'''
+	if cache_dir:
+		spath = os.path.abspath(mdat_filename)
+		if not isinstance(spath, bytes):
+			spath = spath.encode('utf-8')
+		sdigest = hashlib.md5(spath).hexdigest()[:16]
+		return os.path.join(cache_dir, '%s.%s%s' % (os.path.basename(mdat_filename), sdigest, sidecar_extension))
+	return mdat_filename + sidecar_extension
+
+# MDAT files may be compressed with gzip, bzip2 or xz; the compression is recognized from the first bytes
+# of the file (not its extension) and the file is decompressed as it is read, _read_size bytes at a time.
+mdat_extensions = ['.mdat', '.mdat.gz', '.mdat.bz2', '.mdat.xz']
+_read_size = 1 << 20
+
+def _create_decompressor(head):
+	'''
+	Returns a function that creates a decompressor (with the decompress method and unused_data attribute
+	of the zlib, bz2 and lzma decompressors) for data that starts with the specified bytes, or None if the
+	data is not compressed. The full signature is checked, not only the magic bytes, as a plain MDAT file may
+	well start with a name such as BZh1: gzip is 1f 8b and the deflate method (8); bzip2 is BZh, the block size
+	(1 to 9) and the magic number of the first block (or of the end of the stream, for an empty one).
+	'''
+	if head.startswith(b'\x1f\x8b\x08'):
+		return lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)
+	if head[:3] == b'BZh' and head[3:4] in [b'1', b'2', b'3', b'4', b'5', b'6', b'7', b'8', b'9'] and \
+			head[4:10] in [b'1AY&SY', b'\x17rE8P\x90']:
+		return bz2.BZ2Decompressor
+	if head.startswith(b'\xfd7zXZ\x00'):
+		if lzma is None:
+			raise IOError('xz-compressed MDAT files need the lzma module (Python 3)')
+		return lzma.LZMADecompressor
+	return None
+
+def _iter_decompressed_chunks(xchunks):
+	'''
+	Generator that yields the chunks of data, decompressed if the first chunk shows they are compressed.
+	Concatenated compressed streams (e.g. from cat a.gz b.gz) are decompressed one after the other, wherever
+	the chunks happen to split them; the zero padding some tools write after the last stream is skipped.
+	'''
+	create_decompressor = None
+	decompressor = None
+	for chunk in xchunks:
+		if create_decompressor is None:
+			create_decompressor = _create_decompressor(chunk)
+			if create_decompressor is None:
+				yield chunk
+				for chunk in xchunks:
+					yield chunk
+				return
+
+		while chunk:
+			if decompressor is None:
+				# A new stream starts here. No stream starts with a zero byte, so zeros are padding.
+				chunk = chunk.lstrip(b'\x00')
+				if not chunk:
+					break
+				decompressor = create_decompressor()
+			elif getattr(decompressor, 'eof', False):
+				decompressor = None
+				continue
+
+			try:
+				data = decompressor.decompress(chunk)
+			except EOFError:
+				# The stream ended exactly at the end of the previous chunk (the bz2 decompressor of
+				# Python 2 has no eof attribute, it only refuses more data)
+				decompressor = None
+				continue
+			if data:
+				yield data
+			chunk = decompressor.unused_data
+			if chunk:
+				decompressor = None
+
+def _iter_mdat_chunks(mdat_filename):
+	'''
+	Generator that yields the (decompressed) contents of the specified MDAT file, which may be an archive
+	member path (see mdat_archive.split_member_path), in chunks. Raises IOError if the file cannot be read.
+	'''
+	if mdat_archive.is_member_path(mdat_filename):
+		result = mdat_archive.read_member(mdat_filename)
+		if not result.success:
+			raise IOError(result.message)
+		for data in _iter_decompressed_chunks(iter([result.item])):
+			yield data
+	else:
+		with open(mdat_filename, 'rb') as f:
+			for data in _iter_decompressed_chunks(iter(lambda: f.read(_read_size), b'')):
+				yield data
+
+def _iter_mdat_lines(mdat_filename):
+	'''
+	Generator that yields the lines of the specified MDAT file (see _iter_mdat_chunks) as strings.
+	'''
+	spartial = b''
+	for data in _iter_mdat_chunks(mdat_filename):
+		xlines = (spartial + data).split(b'\n')
+		spartial = xlines.pop()
+		for line in xlines:
+			yield line if str is bytes else line.decode('utf-8')
+	if spartial:
+		yield spartial if str is bytes else spartial.decode('utf-8')
+
+def is_mdat_filename(filename):
+	'''
+	Returns True if the specified file name has one of the mdat_extensions.
+	'''
+	slower = filename.lower()
+	return any(slower.endswith(extension) for extension in mdat_extensions)
+
+def get_page_id(mdat_filename):
+	'''
+	Returns the name of the specified MDAT file without its directory and its MDAT extension (see mdat_extensions).
+	'''
+	basename = os.path.basename(mdat_filename)
+	for extension in sorted(mdat_extensions, key=len, reverse=True):
+		if basename.lower().endswith(extension):
+			return basename[:-len(extension)]
+	return os.path.splitext(basename)[0]
+
+def _read_mdat_bytes(mdat_filename):
+	'''
+	Returns (through a Result object) the raw, decompressed contents of the specified MDAT file, which may be
+	an archive member path (see mdat_archive.split_member_path).
+	'''
+	try:
+		data = b''.join(_iter_mdat_chunks(mdat_filename))
+	except:
+		sMsg = 'Error reading file: ' + mdat_filename + ' ' + utilsLib.getExceptionDetails()
+		return utilsLib.Result(False, message=sMsg, item=None)
+	return utilsLib.Result(True, message='', item=data)
+
+def _parse_mdat_bytes(data, source_name):
+	if not isinstance(data, str):
+		data = data.decode('utf-8')
+	return parse_text_line_array(data, source_name)
+
+def write_text_line_sidecar(mdat_filename, records, data, cache_dir=''):
+	'''
+	Writes the records parsed from the specified MDAT file (whose raw contents are data) to its sidecar file.
+	The file is written under a temporary name and renamed, so a reader never sees half of it.
+	Returns (through a Result object) the name of the sidecar file.
+	'''
+	sidecar_filename = get_sidecar_filename(mdat_filename, cache_dir)
+	names = records['name']
+	if names.dtype.kind == 'U':
+		names = np.char.encode(names, 'utf-8')
+	name_size = max(names.dtype.itemsize, 1)
+
+	header = np.zeros(1, dtype=_sidecar_header_dtype)
+	header['magic'] = _sidecar_magic
+	header['version'] = _sidecar_version
+	header['name_size'] = name_size
+	header['num_records'] = len(records)
+	try:
+		stat = os.stat(mdat_filename)
+		header['source_size'] = stat.st_size
+		header['source_mtime'] = stat.st_mtime
+		header['source_md5'] = np.frombuffer(hashlib.md5(data).digest(), dtype=np.uint8)
+
+		sidecar_records = np.empty(len(records), dtype=_sidecar_record_dtype(name_size))
+		sidecar_records['name'] = names
+		sidecar_records['x'] = records['x']
+		sidecar_records['y'] = records['y']
+		sidecar_records['index'] = records['index']
+
+		if cache_dir and not os.path.isdir(cache_dir):
+			os.makedirs(cache_dir)
+		temp_filename = '%s.%d.tmp' % (sidecar_filename, os.getpid())
+		with open(temp_filename, 'wb') as f:
+			header.tofile(f)
+			sidecar_records.tofile(f)
+		if os.path.exists(sidecar_filename):
+			os.remove(sidecar_filename)
+		os.rename(temp_filename, sidecar_filename)
+	except:
+		sMsg = 'Error writing the sidecar file: ' + sidecar_filename + ' ' + utilsLib.getExceptionDetails()
+		return utilsLib.Result(False, message=sMsg, item=None)
+
+	return utilsLib.Result(True, message='', item=sidecar_filename)
+
+def _update_sidecar_mtime(sidecar_filename, mtime):
+	'''
+	Private function that overwrites the source_mtime field of the header of the specified sidecar file in place.
+	'''
+	try:
+		with open(sidecar_filename, 'r+b') as f:
+			f.seek(_sidecar_header_dtype.fields['source_mtime'][1])
+			f.write(np.array(mtime, dtype='<f8').tobytes())
+	except:
+		sMsg = 'Error updating the sidecar file: ' + sidecar_filename + ' ' + utilsLib.getExceptionDetails()
+		return utilsLib.Result(False, message=sMsg, item=None)
+	return utilsLib.Result(True, message='', item=None)
+
+def load_text_line_sidecar(mdat_filename, cache_dir=''):
+	'''
+	Loads the records of the specified MDAT file from its sidecar file, with a single fromfile call.
+	The sidecar is only used if the MDAT file still has the size it recorded, and either the same modification
+	time or (if only the time changed, e.g. after a fresh checkout) the same MD5 digest; in the latter case
+	the sidecar is given the new modification time, so the file is not hashed again on the next read.
+	Returns (through a Result object) the structured array of text lines, or None if there is no usable sidecar.
+	'''
+	sidecar_filename = get_sidecar_filename(mdat_filename, cache_dir)
+	if not os.path.exists(sidecar_filename):
+		return utilsLib.Result(True, message='', item=None)
+
+	bmtime_changed = False
+	try:
+		stat = os.stat(mdat_filename)
+		with open(sidecar_filename, 'rb') as f:
+			header = np.fromfile(f, dtype=_sidecar_header_dtype, count=1)
+			if len(header) != 1 or header['magic'][0] != _sidecar_magic or header['version'][0] != _sidecar_version:
+				return utilsLib.Result(True, message='', item=None)
+			if int(header['source_size'][0]) != stat.st_size:
+				return utilsLib.Result(True, message='', item=None)
+
+			if float(header['source_mtime'][0]) != stat.st_mtime:
+				result = _read_mdat_bytes(mdat_filename)
+				if not result.success:
+					return result
+				if hashlib.md5(result.item).digest() != header['source_md5'][0].tobytes():
+					return utilsLib.Result(True, message='', item=None)
+				bmtime_changed = True
+
+			num_records = int(header['num_records'][0])
+			records = np.fromfile(f, dtype=_sidecar_record_dtype(int(header['name_size'][0])), count=num_records)
+	except:
+		sMsg = 'Error loading the sidecar file: ' + sidecar_filename + ' ' + utilsLib.getExceptionDetails()
+		return utilsLib.Result(False, message=sMsg, item=None)
+
+	if len(records) != num_records:
+		return utilsLib.Result(True, message='', item=None)
+
+	if bmtime_changed:
+		result = _update_sidecar_mtime(sidecar_filename, stat.st_mtime)
+		if not result.success:
+			logging.warning(result.message)
+
+	# The names are stored as UTF-8 bytes; under Python 3 the parser gives them as text
+	if sys.version_info[0] >= 3:
+		names = np.char.decode(records['name'], 'utf-8')
+		text_records = np.empty(num_records, dtype=text_line_dtype(names.dtype))
+		text_records['name'] = names
+		for field in ['x', 'y', 'index']:
+			text_records[field] = records[field]
+		records = text_records
+
+	return utilsLib.Result(True, message='', item=records)
+
+def read_text_line_array(mdat_filename, buse_cache=False, cache_dir=''):
+	'''
+	Reads the specified MDAT file with parse_text_line_array. Returns (through a Result object) the
+	structured array of its text lines.
+
+	With buse_cache, the records are loaded from the file's sidecar (see load_text_line_sidecar) when it is
+	up to date; otherwise the file is parsed and the sidecar is (re)written for the next read. Failing to
+	write the sidecar is only logged.
+
+	mdat_filename may also name a member of a zip or tar archive, e.g. bundle.zip!/page001.mdat; such
+	members are read without extracting them, and never cached.
+	'''
+	if mdat_archive.is_member_path(mdat_filename):
+		buse_cache = False
+
+	if buse_cache:
+		result = load_text_line_sidecar(mdat_filename, cache_dir)
+		if not result.success:
+			logging.warning(result.message)
+		elif result.item is not None:
+			return result
+
+	result = _read_mdat_bytes(mdat_filename)
+	if not result.success:
+		return result
+	data = result.item
+
+	result = _parse_mdat_bytes(data, mdat_filename)
+	if not result.success or not buse_cache:
+		return result
+	records = result.item
+
+	result = write_text_line_sidecar(mdat_filename, records, data, cache_dir)
+	if not result.success:
+		logging.warning(result.message)
+	return utilsLib.Result(True, message='', item=records)
+
+def read_page_text_line_arrays(mdat_filename):
+	'''
+	Reads the specified multi-page MDAT file (which may be compressed or an archive member, as for
+	read_text_line_array) with parse_page_text_line_arrays. Returns (through a Result object) the list of
+	the pairs [page_id, records].
+	'''
+	result = _read_mdat_bytes(mdat_filename)
+	if not result.success:
+		return result
+	data = result.item
+	if not isinstance(data, str):
+		data = data.decode('utf-8')
+	return parse_page_text_line_arrays(data, mdat_filename)
+
+def iter_archive_text_line_arrays(archive_filename):
+	'''
+	Generator that parses every MDAT file in the specified zip or tar archive, in archive order and without
+	extracting it (see mdat_archive.iter_members). Yields the pair [member_path, result] for each, where result
+	is the Result of parse_text_line_array, so one malformed member does not stop the others.
+	'''
+	for member_name, data in mdat_archive.iter_members(archive_filename):
+		member_path = mdat_archive.get_member_path(archive_filename, member_name)
+		yield [member_path, _parse_mdat_bytes(data, member_path)]
+
+def convert_directory(directory, cache_dir='', bforce=False):
+	'''
+	Builds the sidecar file of every MDAT file in the specified directory that does not have an up to date
+	one (or of every MDAT file, with bforce). Returns (through a Result object) the pair [converted, skipped].
+	'''
+	num_converted = 0
+	num_skipped = 0
+	for filename in sorted(os.listdir(directory)):
+		if not is_mdat_filename(filename):
+			continue
+		mdat_filename = os.path.join(directory, filename)
+
+		if not bforce:
+			result = load_text_line_sidecar(mdat_filename, cache_dir)
+			if result.success and result.item is not None:
+				num_skipped += 1
+				continue
+
+		result = _read_mdat_bytes(mdat_filename)
+		if not result.success:
+			return result
+		data = result.item
+		result = _parse_mdat_bytes(data, mdat_filename)
+		if not result.success:
+			return result
+		result = write_text_line_sidecar(mdat_filename, result.item, data, cache_dir)
+		if not result.success:
+			return result
+		num_converted += 1
+
+	return utilsLib.Result(True, message='', item=[num_converted, num_skipped])
+
+def convert_main(argv):
+	'''
+	Command-line entry point (text_line.py convert ...). Prebuilds the sidecar files of all MDAT files in a directory.
+	'''
+	usage = 'text_line.py convert -d <mdat_directory> [-c <cache_dir>] [-f]'
+	directory = ''
+	cache_dir = ''
+	bforce = False
+	try:
+		opts, args = getopt.getopt(argv, "d:c:fh", ["dir=", "cache_dir=", "force", "help"])
+	except getopt.GetoptError:
+		print(usage)
+		return 2
+
+	for opt, arg in opts:
+		if opt in ("-h", "--help"):
+			print(usage)
+			return 0
+		elif opt in ("-d", "--dir"):
+			directory = arg
+		elif opt in ("-c", "--cache_dir"):
+			cache_dir = arg
+		elif opt in ("-f", "--force"):
+			bforce = True
+
+	if not directory:
+		print(usage)
+		return 2
+
+	result = convert_directory(directory, cache_dir, bforce)
+	if not result.success:
+		print(result.message)
+		return 2
+	print('%d sidecar files written, %d already up to date' % (result.item[0], result.item[1]))
+	return 0
 
 
 class ctext_line_data(object):
@@ -21,11 +669,14 @@ class ctext_line_data(object):
 	Currently, this class only provides for the location (and an ID or name) for the origin point
 	of the text-line segment.
 	'''
-	def __init__(self, x=-1, y=-1, name='', index=-1):
-		assert type(x)			is IntType, "x is not an integer: %s" % str(x)
-		assert type(y)			is IntType, "y is not an integer: %s" % str(y)
-		assert type(name)		is StringType, "name is not a string: %s" % name
-		assert type(index)		is IntType, "index is not an integer: %s" % str(index)
+	__slots__ = ('_x', '_y', '_name', '_index')
+
+	def __init__(self, x=-1, y=-1, name='', index=-1, bvalidate=True):
+		if bvalidate:
+			assert type(x)			is IntType, "x is not an integer: %s" % str(x)
+			assert type(y)			is IntType, "y is not an integer: %s" % str(y)
+			assert type(name)		is StringType, "name is not a string: %s" % name
+			assert type(index)		is IntType, "index is not an integer: %s" % str(index)
 		self._x = x
 		self._y = y
 		self._name = name
@@ -82,10 +733,11 @@ class ctext_lines_container(object):
 	'''
 	def __init__(self):
 		self._xtext_lines = []
-		self._ztext_lines = {}
-		
 
-	def read(self, mdat_filename):
+		# The name index is only built if get_text_line_data_instance is called
+		self._ztext_lines = None
+
+	def read(self, mdat_filename, buse_cache=False, cache_dir=''):
 		'''
 		Read the specified file containing comma-separated elements - One line corresponds to one ctext_line_data object.
 		Order of the elements: 
@@ -95,49 +747,29 @@ class ctext_lines_container(object):
 
 		This method returns the usual utilsLib.Result object to indicate success or failure. 
 		The ctext_line_data objects can be obtained by calling the get_names() and get_text_line_data() methods.
+		The file is parsed in bulk by read_text_line_array (from its sidecar file, with buse_cache); the index
+		of each ctext_line_data object is its position in the file.
 		'''
-		try:
-			f = open(mdat_filename, 'rt')
-		except:
-			sMsg = 'Error attempting to open: ' + mdat_filename + ' ' + utilsLib.getExceptionDetails()
-			return utilsLib.Result(False, message=sMsg, item=None)
+		result = read_text_line_array(mdat_filename, buse_cache, cache_dir)
+		if not result.success:
+			return result
 
+		return self.read_text_lines(iter_text_line_array(result.item), mdat_filename)
+
+	def read_text_lines(self, text_lines, source_name=''):
+		'''
+		Creates a ctext_line_data object for each of the specified ctext_line_records (e.g. iter_text_lines),
+		consuming them one at a time. source_name is only used in error messages. The records come from the
+		validated parsers, so the ctext_line_data objects are created without their type assertions.
+		'''
+		self._ztext_lines = None
 		try:
-			reader = csv.reader(f)
+			for record in text_lines:
+				self._xtext_lines.append(ctext_line_data(record.x, record.y, record.name, record.index, False))
 		except:
-			sMsg = 'Error reading file: ' + mdat_filename + utilsLib.getExceptionDetails()
-			f.close()
-			return utilsLib.Result(False, message=sMsg, item=None)
-
-		# We read each row in the file and create a dictionary entry for each row, keyed on its name (ID in the MDAT file)
-		index = 0
-		for row in reader:
-			try:
-				numItems = len(row)
-				sname = row[0]
-				sx = row[1]
-				sy = row[2]
-			except:
-				sMsg = 'Error extracting a row from the file: ' + mdat_filename + ' Details: ' + utilsLib.getExceptionDetails()
-				f.close()
-				return utilsLib.Result(False, message=sMsg, item=None)
+			sMsg = 'Error creating a ctext_line_data instance from the values read from: ' + source_name + utilsLib.getExceptionDetails()
+			return utilsLib.Result(False, message=sMsg, item=None) 
 
-			try:
-				one_text_line_data_instance = ctext_line_data(int(sx), int(sy), sname, index)
-			except:
-				sMsg = 'Error creating a ctext_line_data instance from the values read from file: ' + mdat_filename + utilsLib.getExceptionDetails()
-				f.close()
-				return utilsLib.Result(False, message=sMsg, item=None) 
-
-			# Add this ctext_line_data object to our internal list and our internal dictionary
-			self._xtext_lines.append(one_text_line_data_instance)
-			self._ztext_lines[sname] = one_text_line_data_instance
-			
-			# We use this counter to supply an index to the ctext_line_data constructor, just in case we decide we care about its order
-			index += 1
-			 
-		# Close the file and return the Result instance indicating success
-		f.close()
 		return utilsLib.Result(True, message='', item=None)
 
 	def get_names(self):
@@ -153,6 +785,9 @@ class ctext_lines_container(object):
 		'''
 		Returns (using the Result class) the ctext_line_data instance for the specified name.
 		'''
+		if self._ztext_lines is None:
+			self._ztext_lines = dict((text_line_data.name, text_line_data) for text_line_data in self._xtext_lines)
+
 		try:
 			text_line_data = self._ztext_lines[name]
 			return utilsLib.Result(True,message='', item=text_line_data)
@@ -168,6 +803,9 @@ class ctext_lines_container(object):
 
 if __name__ == "__main__":
 
+	if sys.argv[1:2] == ['convert']:
+		sys.exit(convert_main(sys.argv[2:]))
+
 	# Create the container for the ctext_line_data objects we are going to create by reading the MDAT file
 	text_lines = ctext_lines_container()
 	